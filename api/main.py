@@ -1,19 +1,101 @@
-from fastapi import FastAPI, Depends
+import asyncio
+import json
+import threading
+
+from contextlib import asynccontextmanager
+from typing import List, Optional, Tuple
+
+from fastapi import FastAPI, Depends, Header, HTTPException, Query
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.concurrency import iterate_in_threadpool
 
 # Interfaces y servicios
 from domain.interfaces.inference_service_interface import InferenceServiceInterface
-from domain.entities.query_entity import QueryEntity
-from domain.entities.response_entity import InferenceResponse
-from infrastructure.repository.inference_service_impl import InferenceServiceImpl
+from domain.interfaces.passage_admin_interface import PassageAdminInterface
+from domain.entities.passage_entity import PassageEntity, PassageMutationResponse, IndexStatusResponse
+from domain.entities.query_entity import QueryEntity, BatchQueryEntity
+from domain.entities.response_entity import InferenceResponse, BatchInferenceResponse
+from infrastructure.helpers.bounded_executor import BoundedExecutor, ExecutorSaturatedError
+from infrastructure.helpers.metrics import REGISTRY
+from infrastructure.helpers.startup import STARTUP
+from infrastructure.helpers.stub_generator import STUB_BACKEND
+from config.settings import (
+    INFERENCE_WORKERS, INFERENCE_QUEUE_SIZE, RETRY_AFTER_SECONDS, MAX_BATCH_QUERIES, ADMIN_TOKEN, GENERATION_BACKEND
+)
 
 # Caso de uso
 from application.use_cases.handle_inference_use_case import HandleInferenceUseCase
+from application.use_cases.manage_passages_use_case import ManagePassagesUseCase
+
+# Se instancia 1 sola vez, en segundo plano al arrancar (ver lifespan)
+inference_service = None
+
+# Cantidad de procesos que sirven la app; api/prefork.py lo fija antes del fork
+serving_processes = 1
+
+# Pool dedicado para la inferencia, separado del threadpool de FastAPI
+inference_executor = BoundedExecutor(INFERENCE_WORKERS, INFERENCE_QUEUE_SIZE)
+
+
+def collect_executor_metrics():
+    executor = inference_executor.stats()
+    return {
+        "owasp_executor_in_flight": ("Peticiones en curso o en cola del pool de inferencia.", executor["in_flight"]),
+        "owasp_executor_queued": ("Peticiones esperando un worker del pool de inferencia.", executor["queued"]),
+        "owasp_executor_rejected": ("Peticiones rechazadas con 503 por saturación.", executor["rejected"]),
+    }
+
+
+REGISTRY.add_collector(collect_executor_metrics)
+
+
+def collect_startup_metrics():
+    report = STARTUP.report()
+    return {
+        "owasp_ready": ("1 cuando el arranque terminó y el servicio acepta inferencias.", int(STARTUP.ready)),
+        "owasp_startup_seconds": ("Tiempo transcurrido desde el inicio del arranque hasta que terminó.", report["elapsed"]),
+    }
+
+
+REGISTRY.add_collector(collect_startup_metrics)
+
+
+def load_inference_service():
+    """
+    Carga el servicio de inferencia. torch, transformers, faiss y sklearn se
+    importan acá y no al importar este módulo, así uvicorn levanta el socket
+    enseguida y /health/live responde mientras los modelos se cargan.
+    """
+    global inference_service
+    try:
+        with STARTUP.step("imports"):
+            from infrastructure.repository.inference_service_impl import InferenceServiceImpl
+        inference_service = InferenceServiceImpl()
+        STARTUP.finish()
+    except Exception as e:
+        print(f"Error durante el arranque: {str(e)}")
+        STARTUP.finish(error=e)
+    print(STARTUP.summary())
 
-# Instanciamos 1 sola vez
-inference_service = InferenceServiceImpl()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # En modo pre-fork (api/prefork.py) el padre ya cargó el servicio antes del fork
+    if inference_service is None:
+        threading.Thread(target=load_inference_service, name="startup", daemon=True).start()
+    yield
 
 
 def get_inference_service() -> InferenceServiceInterface:
+    """
+    Retorna el servicio cargado, o responde 503 mientras el arranque no terminó.
+    """
+    if inference_service is None:
+        raise HTTPException(
+            status_code=503,
+            detail=f"El servicio está iniciando ({STARTUP.status}).",
+            headers={"Retry-After": str(RETRY_AFTER_SECONDS)}
+        )
     return inference_service
 
 
@@ -21,27 +103,306 @@ def get_inference_use_case(service: InferenceServiceInterface = Depends(get_infe
     return HandleInferenceUseCase(service)
 
 
-app = FastAPI(title="OWASP Inference API")
+def get_passage_admin(service: InferenceServiceInterface = Depends(get_inference_service)) -> PassageAdminInterface:
+    return service
+
+
+def get_manage_passages_use_case(service: PassageAdminInterface = Depends(get_passage_admin)):
+    return ManagePassagesUseCase(service)
+
+
+def require_admin_token(x_admin_token: Optional[str] = Header(None)):
+    """
+    Si ADMIN_TOKEN está configurado, los endpoints /admin exigen el header X-Admin-Token.
+    """
+    if ADMIN_TOKEN and x_admin_token != ADMIN_TOKEN:
+        raise HTTPException(status_code=401, detail="Token de administración inválido.")
+
+
+def require_single_process():
+    """
+    Los cambios sobre el índice se aplican solo en memoria del proceso que
+    atiende la petición: con varios workers (pre-fork) cada uno quedaría con
+    una versión distinta, así que se rechazan con 409.
+    """
+    if serving_processes > 1:
+        raise HTTPException(
+            status_code=409,
+            detail=f"El servidor corre con {serving_processes} procesos y cada uno tiene su copia del índice. "
+                   "Hay que reconstruir el índice y reiniciar el servidor."
+        )
+
+
+def require_corpus(use_case: HandleInferenceUseCase, edition: Optional[str], language: Optional[str]):
+    """
+    Responde 404 si no hay un índice construido para la edición e idioma pedidos.
+    """
+    if not use_case.has_corpus(edition, language):
+        raise HTTPException(
+            status_code=404,
+            detail=f"No hay un corpus para la edición {edition or 'por defecto'} e idioma {language or 'por defecto'}."
+        )
+
+
+def get_corpus_key(
+        edition: Optional[str] = Query(None, pattern=r"^\d{4}$"),
+        language: Optional[str] = Query(None, pattern=r"^[a-z]{2}(?:_[A-Z]{2})?$"),
+        use_case: HandleInferenceUseCase = Depends(get_inference_use_case)
+) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Edición e idioma de los endpoints /admin, tomados de la query string.
+    """
+    require_corpus(use_case, edition, language)
+    return edition, language
+
+
+def run_admin(fn, *args):
+    """
+    Traduce los errores de las operaciones sobre el índice a respuestas HTTP.
+    Los RuntimeError de FAISS (p. ej. un índice mapeado en memoria de solo
+    lectura que no se puede copiar) responden 409: el estado del índice no
+    admite el cambio.
+    """
+    try:
+        return fn(*args)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=e.args[0] if e.args else str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=f"El índice no admite el cambio: {str(e)}")
+
+
+def saturated(error: ExecutorSaturatedError) -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail=str(error),
+        headers={"Retry-After": str(RETRY_AFTER_SECONDS)}
+    )
+
+
+class PooledStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse que ocupa un lugar del pool de inferencia. El lugar se
+    libera cuando termina la respuesta, aunque el cuerpo no se haya llegado a
+    recorrer (el cliente se fue antes del primer envío o falló el arranque).
+    """
+
+    def __init__(self, content, release, **kwargs):
+        super().__init__(content, **kwargs)
+        self.release = release
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.release()
+
+
+async def run_in_inference_pool(fn, *args):
+    """
+    Ejecuta trabajo CPU-bound en el pool de inferencia sin bloquear el event loop.
+    Si el pool y su cola están llenos responde 503 con Retry-After.
+    """
+    try:
+        future = inference_executor.submit(fn, *args)
+    except ExecutorSaturatedError as e:
+        raise saturated(e)
+    return await asyncio.wrap_future(future)
+
+
+app = FastAPI(title="OWASP Inference API", lifespan=lifespan)
 
 
 # ===========
 # ENDPOINTS
 # ===========
 @app.post("/predict", response_model=InferenceResponse)
-def predict(
+async def predict(
         request: QueryEntity,
         use_case: HandleInferenceUseCase = Depends(get_inference_use_case)
 ):
     """
     Llama al caso de uso para realizar una inferencia sobre el texto recibido.
     """
-    # Asumiendo que tu caso de uso tiene un método .predict(), ajusta según tu lógica
-    return use_case.execute(request.query)
+    require_corpus(use_case, request.edition, request.language)
+    return await run_in_inference_pool(
+        use_case.execute, request.query, request.use_cache, request.edition, request.language
+    )
+
+
+@app.post("/predict/batch", response_model=BatchInferenceResponse)
+async def predict_batch(
+        request: BatchQueryEntity,
+        use_case: HandleInferenceUseCase = Depends(get_inference_use_case)
+):
+    """
+    Procesa varias consultas en una sola llamada. Los resultados vienen en el
+    mismo orden que las consultas y cada uno puede traer su propio error.
+    """
+    if len(request.queries) > MAX_BATCH_QUERIES:
+        raise HTTPException(
+            status_code=413,
+            detail=f"El lote supera el máximo de {MAX_BATCH_QUERIES} consultas."
+        )
+    require_corpus(use_case, request.edition, request.language)
+    results = await run_in_inference_pool(
+        use_case.execute_batch, request.queries, request.use_cache, request.edition, request.language
+    )
+    return {"results": results}
+
+
+@app.post("/predict/stream")
+def predict_stream(
+        request: QueryEntity,
+        use_case: HandleInferenceUseCase = Depends(get_inference_use_case)
+):
+    """
+    Igual que /predict, pero envía los tokens como Server-Sent Events a medida
+    que se generan. El evento final `end` trae la respuesta limpia y las métricas.
+    Cada stream ocupa un lugar del pool de inferencia mientras dura (503 si no
+    hay lugar); si el cliente se desconecta se libera y la generación se detiene.
+    El backend stub no tiene modelo con el que generar token a token: responde 501.
+    """
+    if GENERATION_BACKEND == STUB_BACKEND:
+        raise HTTPException(status_code=501, detail="El backend stub no admite streaming; use /predict.")
+    require_corpus(use_case, request.edition, request.language)
+    try:
+        release = inference_executor.reserve()
+    except ExecutorSaturatedError as e:
+        raise saturated(e)
+
+    async def event_stream():
+        events = use_case.execute_stream(request.query, request.edition, request.language)
+        try:
+            async for event in iterate_in_threadpool(events):
+                yield f"event: {event['event']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+        finally:
+            events.close()
+
+    try:
+        return PooledStreamingResponse(event_stream(), release, media_type="text/event-stream")
+    except Exception:
+        release()
+        raise
 
 
 @app.get("/health")
-def health_check():
+@app.get("/health/live")
+async def health_check():
     """
-    Endpoint de salud para verificar que el servicio esté corriendo.
+    Liveness: el proceso está corriendo y atiende peticiones, aunque los modelos sigan cargando.
     """
     return {"status": "OK", "message": "Inference service is up and running."}
+
+
+@app.get("/health/ready")
+async def readiness_check():
+    """
+    Readiness: 200 cuando todos los artefactos están cargados; 503 mientras
+    tanto, con el avance y el tiempo de cada paso del arranque.
+    """
+    report = STARTUP.report()
+    if not STARTUP.ready:
+        return JSONResponse(report, status_code=503, headers={"Retry-After": str(RETRY_AFTER_SECONDS)})
+    return report
+
+
+@app.get("/corpora")
+def list_corpora(use_case: HandleInferenceUseCase = Depends(get_inference_use_case)) -> List[dict]:
+    """
+    Corpus (edición, idioma) disponibles y cuáles están cargados en memoria.
+    """
+    return use_case.list_corpora()
+
+
+@app.get("/metrics/batching")
+def batching_metrics(service: InferenceServiceInterface = Depends(get_inference_service)):
+    """
+    Métricas del micro-batching de generación: profundidad de cola y tamaños de lote.
+    """
+    return {**service.get_batching_stats(), "executor": inference_executor.stats()}
+
+
+@app.get("/metrics/cache")
+def cache_metrics(service: InferenceServiceInterface = Depends(get_inference_service)):
+    """
+    Métricas de la caché de respuestas: aciertos exactos, por similitud y fallos.
+    """
+    return service.get_cache_stats()
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    """
+    Métricas en formato de texto de Prometheus: latencia por etapa y por petición,
+    tokens generados, puntajes de recuperación, errores y tiempos de carga.
+    """
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+
+# ===========
+# ADMINISTRACIÓN DEL ÍNDICE
+# ===========
+@app.get("/admin/index", response_model=IndexStatusResponse, dependencies=[Depends(require_admin_token)])
+def index_status(
+        corpus: tuple = Depends(get_corpus_key),
+        use_case: ManagePassagesUseCase = Depends(get_manage_passages_use_case)
+):
+    """
+    Versión del índice publicado y cantidad de documentos.
+    """
+    return use_case.status(*corpus)
+
+
+@app.post("/admin/index/reload", response_model=IndexStatusResponse,
+          dependencies=[Depends(require_admin_token), Depends(require_single_process)])
+def reload_index(
+        corpus: tuple = Depends(get_corpus_key),
+        use_case: ManagePassagesUseCase = Depends(get_manage_passages_use_case)
+):
+    """
+    Recarga índice y corpus desde disco (p. ej. tras correr build_faiss_index.py)
+    y los publica sin cortar las peticiones en curso.
+    """
+    return run_admin(use_case.reload, *corpus)
+
+
+@app.post("/admin/passages", response_model=PassageMutationResponse,
+          dependencies=[Depends(require_admin_token), Depends(require_single_process)])
+def add_passage(
+        request: PassageEntity,
+        corpus: tuple = Depends(get_corpus_key),
+        use_case: ManagePassagesUseCase = Depends(get_manage_passages_use_case)
+):
+    """
+    Agrega un pasaje al corpus y al índice.
+    """
+    return run_admin(use_case.add, request.content, request.category, *corpus)
+
+
+@app.put("/admin/passages/{passage_id}", response_model=PassageMutationResponse,
+         dependencies=[Depends(require_admin_token), Depends(require_single_process)])
+def update_passage(
+        passage_id: int,
+        request: PassageEntity,
+        corpus: tuple = Depends(get_corpus_key),
+        use_case: ManagePassagesUseCase = Depends(get_manage_passages_use_case)
+):
+    """
+    Reemplaza el texto de un pasaje y su vector.
+    """
+    return run_admin(use_case.update, passage_id, request.content, request.category, *corpus)
+
+
+@app.delete("/admin/passages/{passage_id}", response_model=PassageMutationResponse,
+            dependencies=[Depends(require_admin_token), Depends(require_single_process)])
+def delete_passage(
+        passage_id: int,
+        corpus: tuple = Depends(get_corpus_key),
+        use_case: ManagePassagesUseCase = Depends(get_manage_passages_use_case)
+):
+    """
+    Borra un pasaje del índice.
+    """
+    return run_admin(use_case.delete, passage_id, *corpus)
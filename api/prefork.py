@@ -0,0 +1,130 @@
+import argparse
+import gc
+import os
+import signal
+import socket
+import sys
+import time
+
+# Permite ejecutar el módulo directamente además de con `python -m api.prefork`
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from config.settings import PREFORK_WORKERS
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Sirve la API con varios procesos que comparten el modelo y el índice cargados una sola vez."
+    )
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=PREFORK_WORKERS)
+    parser.add_argument("--backlog", type=int, default=2048)
+    parser.add_argument("--log-level", default="info")
+    return parser.parse_args()
+
+
+def bind_socket(host, port, backlog):
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_worker(sock, args):
+    """
+    Proceso hijo: sirve la app sobre el socket heredado. Los pesos del modelo,
+    el índice y el corpus son las mismas páginas del padre (copy-on-write).
+    """
+    import torch
+    import uvicorn
+    from api.main import app
+
+    # Uvicorn instala sus propios manejadores para el apagado ordenado
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    # Los workers se reparten los núcleos en vez de competir todos por todos
+    torch.set_num_threads(max(1, (os.cpu_count() or 1) // args.workers))
+
+    server = uvicorn.Server(uvicorn.Config(app, log_level=args.log_level, lifespan="on"))
+    server.run(sockets=[sock])
+
+
+def spawn(sock, args):
+    pid = os.fork()
+    if pid == 0:
+        try:
+            run_worker(sock, args)
+        finally:
+            os._exit(0)
+    print(f"Worker {pid} iniciado.")
+    return pid
+
+
+def main():
+    args = parse_args()
+    # Los tokenizers de Rust no toleran un fork después de usar sus hilos
+    os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+
+    # libgomp/MKL no sobreviven a un fork después de crear su pool de hilos, y la
+    # carga ya hace inferencia (el warm-up de embeddings): el padre usa un solo
+    # hilo y cada worker fija los suyos después del fork
+    import torch
+    torch.set_num_threads(1)
+    torch.set_num_interop_threads(1)
+
+    # El padre carga todo una sola vez, de forma síncrona, antes de aceptar conexiones
+    from api import main as api_main
+    from infrastructure.helpers.startup import STARTUP
+
+    api_main.load_inference_service()
+    if not STARTUP.ready:
+        sys.exit(1)
+    # Cada worker tendría su propia copia del índice: /admin no acepta cambios
+    api_main.serving_processes = args.workers
+
+    # Todo lo cargado hasta acá queda fuera del GC: si el recolector recorriera
+    # esos objetos en los hijos, escribiría sus cabeceras y copiaría las páginas.
+    # Desde acá hasta el fork el padre no debe volver a usar torch con más de un
+    # hilo: los pools de OpenMP no son seguros ante fork
+    gc.collect()
+    gc.freeze()
+
+    sock = bind_socket(args.host, args.port, args.backlog)
+    print(f"Sirviendo en {args.host}:{args.port} con {args.workers} workers (pre-fork).")
+
+    workers = {spawn(sock, args) for _ in range(args.workers)}
+    stopping = False
+
+    def _stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, _stop)
+    signal.signal(signal.SIGINT, _stop)
+
+    while workers:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        workers.discard(pid)
+        if not stopping:
+            print(f"Worker {pid} terminó (estado {status}), se reemplaza.")
+            # Evita un ciclo de reinicios si el worker falla al arrancar
+            time.sleep(1)
+            workers.add(spawn(sock, args))
+
+    sock.close()
+    print("Servidor detenido.")
+
+
+if __name__ == "__main__":
+    main()
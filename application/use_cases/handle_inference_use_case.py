@@ -1,3 +1,5 @@
+from typing import Iterator, List, Optional
+
 from domain.entities.response_entity import InferenceResponse
 from domain.interfaces.inference_service_interface import InferenceServiceInterface
 
@@ -6,8 +8,35 @@ class HandleInferenceUseCase:
     def __init__(self, inference_service: InferenceServiceInterface):
         self.inference_service = inference_service
 
-    def execute(self, query: str) -> InferenceResponse:
+    def execute(self, query: str, use_cache: bool = True, edition: Optional[str] = None,
+                language: Optional[str] = None) -> InferenceResponse:
         """
         Invoca la lógica de inferencia y retorna un dict con la respuesta.
         """
-        return self.inference_service.inference(query)
+        return self.inference_service.inference(query, use_cache, edition, language)
+
+    def execute_batch(self, queries: List[str], use_cache: bool = True, edition: Optional[str] = None,
+                      language: Optional[str] = None) -> List[dict]:
+        """
+        Invoca la inferencia por lotes y retorna un resultado por consulta.
+        """
+        return self.inference_service.inference_batch(queries, use_cache, edition, language)
+
+    def execute_stream(self, query: str, edition: Optional[str] = None,
+                       language: Optional[str] = None) -> Iterator[dict]:
+        """
+        Invoca la inferencia en streaming y retorna los eventos generados.
+        """
+        return self.inference_service.inference_stream(query, edition, language)
+
+    def has_corpus(self, edition: Optional[str] = None, language: Optional[str] = None) -> bool:
+        """
+        Indica si hay un corpus para la edición e idioma pedidos.
+        """
+        return self.inference_service.has_corpus(edition, language)
+
+    def list_corpora(self) -> List[dict]:
+        """
+        Retorna los corpus (edición, idioma) disponibles.
+        """
+        return self.inference_service.list_corpora()
@@ -0,0 +1,40 @@
+from typing import Optional
+
+from domain.interfaces.passage_admin_interface import PassageAdminInterface
+
+
+class ManagePassagesUseCase:
+    def __init__(self, passage_admin: PassageAdminInterface):
+        self.passage_admin = passage_admin
+
+    def add(self, content: str, category: Optional[str] = None, edition: Optional[str] = None,
+            language: Optional[str] = None) -> dict:
+        """
+        Agrega un pasaje y retorna su id junto con la nueva versión del índice.
+        """
+        return self.passage_admin.add_passage(content, category, edition, language)
+
+    def update(self, passage_id: int, content: str, category: Optional[str] = None,
+               edition: Optional[str] = None, language: Optional[str] = None) -> dict:
+        """
+        Actualiza un pasaje existente.
+        """
+        return self.passage_admin.update_passage(passage_id, content, category, edition, language)
+
+    def delete(self, passage_id: int, edition: Optional[str] = None, language: Optional[str] = None) -> dict:
+        """
+        Borra un pasaje del índice.
+        """
+        return self.passage_admin.delete_passage(passage_id, edition, language)
+
+    def reload(self, edition: Optional[str] = None, language: Optional[str] = None) -> dict:
+        """
+        Recarga el índice desde disco y lo publica en caliente.
+        """
+        return self.passage_admin.reload_index(edition, language)
+
+    def status(self, edition: Optional[str] = None, language: Optional[str] = None) -> dict:
+        """
+        Retorna el estado del índice vigente.
+        """
+        return self.passage_admin.get_index_stats(edition, language)
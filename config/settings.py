@@ -5,3 +5,98 @@ INDEX_PATH = os.getenv("INDEX_PATH", "./data/model/indice_faiss.index")
 PROCESSED_DATA_PATH = os.getenv("PROCESSED_DATA_PATH", "./data/model/owasp_cleaned_dataset.json")
 EMBEDDING_MODEL_NAME = os.getenv("EMBEDDING_MODEL_NAME", "all-MiniLM-L12-v2")
 TOP_K = int(os.getenv("TOP_K", 3))
+
+# Micro-batching de la generación
+BATCHING_ENABLED = os.getenv("BATCHING_ENABLED", "true").lower() == "true"
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", 8))
+BATCH_MAX_WAIT_MS = float(os.getenv("BATCH_MAX_WAIT_MS", 10))
+
+# Pool de inferencia y control de admisión
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", 4))
+INFERENCE_QUEUE_SIZE = int(os.getenv("INFERENCE_QUEUE_SIZE", 16))
+RETRY_AFTER_SECONDS = int(os.getenv("RETRY_AFTER_SECONDS", 1))
+
+# API por lotes
+MAX_BATCH_QUERIES = int(os.getenv("MAX_BATCH_QUERIES", 256))
+GENERATION_BATCH_SIZE = int(os.getenv("GENERATION_BATCH_SIZE", 8))
+
+# Caché semántica de respuestas (solo con DETERMINISTIC_DECODING: con muestreo no se activa)
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() == "true"
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", 1024))
+RESPONSE_CACHE_MAX_MB = float(os.getenv("RESPONSE_CACHE_MAX_MB", 64))
+RESPONSE_CACHE_TTL_SECONDS = int(os.getenv("RESPONSE_CACHE_TTL_SECONDS", 3600))
+RESPONSE_CACHE_SIMILARITY = float(os.getenv("RESPONSE_CACHE_SIMILARITY", 0.95))
+DETERMINISTIC_DECODING = os.getenv("DETERMINISTIC_DECODING", "false").lower() == "true"
+
+# Caché de embeddings de consultas: LRU en memoria + SQLite en disco (vacío: solo memoria)
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "./data/cache/embeddings.sqlite")
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", 10000))
+
+# Parámetros de búsqueda para índices aproximados (ver scripts/build_faiss_index.py)
+FAISS_NPROBE = int(os.getenv("FAISS_NPROBE", 8))
+FAISS_EF_SEARCH = int(os.getenv("FAISS_EF_SEARCH", 64))
+
+# Carga con memoria mapeada del índice y del corpus (ver scripts/build_corpus_store.py)
+FAISS_MMAP = os.getenv("FAISS_MMAP", "true").lower() == "true"
+# Ahí también se busca el almacén de tokens (.tokens.npy); sus ids solo se usan en /predict/stream y con
+# PREFIX_CACHE_ENABLED: el pipeline de /predict y /predict/batch tokeniza el prompt desde el texto
+CORPUS_STORE_PATH = os.getenv("CORPUS_STORE_PATH", os.path.splitext(PROCESSED_DATA_PATH)[0])
+
+# Truncado de contexto con TF-IDF preconstruido
+TFIDF_INDEX_PATH = os.getenv("TFIDF_INDEX_PATH", "./data/model/tfidf_index.pkl")
+CONTEXT_MAX_TOKENS = int(os.getenv("CONTEXT_MAX_TOKENS", 512))
+# Caché del contexto armado por conjunto de pasajes recuperados
+CONTEXT_CACHE_ENABLED = os.getenv("CONTEXT_CACHE_ENABLED", "true").lower() == "true"
+CONTEXT_CACHE_MAX_ENTRIES = int(os.getenv("CONTEXT_CACHE_MAX_ENTRIES", 2048))
+
+# Recuperación híbrida BM25 + densa con Reciprocal Rank Fusion. Viene desactivada:
+# cambia el ranking con el que se evaluó el modelo y suma la latencia de BM25 y la
+# memoria de su índice; se activa si scripts/evaluate_retrieval.py muestra una mejora
+HYBRID_SEARCH_ENABLED = os.getenv("HYBRID_SEARCH_ENABLED", "false").lower() == "true"
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", 20))
+HYBRID_DENSE_WEIGHT = float(os.getenv("HYBRID_DENSE_WEIGHT", 1.0))
+HYBRID_BM25_WEIGHT = float(os.getenv("HYBRID_BM25_WEIGHT", 1.0))
+RRF_K = int(os.getenv("RRF_K", 60))
+
+# Backend de generación: fp32, int8, bf16 u onnx
+GENERATION_BACKEND = os.getenv("GENERATION_BACKEND", "fp32")
+ONNX_MODEL_DIR = os.getenv("ONNX_MODEL_DIR", "./data/model/onnx")
+# Con GENERATION_BACKEND=stub no se descarga el modelo: se simula la generación (benchmarks)
+STUB_MS_PER_TOKEN = float(os.getenv("STUB_MS_PER_TOKEN", "20"))
+
+# Formato del prompt y caché de key-values para prefijos repetidos
+PROMPT_LAYOUT = os.getenv("PROMPT_LAYOUT", "query_first")
+PREFIX_CACHE_ENABLED = os.getenv("PREFIX_CACHE_ENABLED", "false").lower() == "true"
+PREFIX_CACHE_MAX_ENTRIES = int(os.getenv("PREFIX_CACHE_MAX_ENTRIES", 32))
+PREFIX_CACHE_MAX_MB = float(os.getenv("PREFIX_CACHE_MAX_MB", 512))
+PREFIX_CACHE_MIN_TOKENS = int(os.getenv("PREFIX_CACHE_MIN_TOKENS", 16))
+
+# Trazas por petición (una línea JSON con los spans de cada etapa)
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "false").lower() == "true"
+
+# Actualización incremental del índice (persistir reescribe los archivos de data/)
+INDEX_PERSIST_CHANGES = os.getenv("INDEX_PERSIST_CHANGES", "false").lower() == "true"
+# Token requerido en el header X-Admin-Token por los endpoints /admin (vacío: sin autenticación)
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+# Un corpus por edición e idioma en INDEX_ROOT/{edición}/{idioma}/; el par por defecto usa las rutas de arriba
+DEFAULT_EDITION = os.getenv("DEFAULT_EDITION", "2021")
+DEFAULT_LANGUAGE = os.getenv("DEFAULT_LANGUAGE", "es")
+INDEX_ROOT = os.getenv("INDEX_ROOT", "./data/model/indexes")
+MAX_RESIDENT_INDEXES = int(os.getenv("MAX_RESIDENT_INDEXES", 4))
+
+# Corte temprano de la generación: se detiene si el modelo repite un bloque "Pregunta:".
+# Con decodificación por muestreo además corta en el primer fin de oración tras EARLY_STOP_MIN_TOKENS
+# y limita a SHORT_ANSWER_MAX_TOKENS las preguntas de definición ("¿Qué es...?")
+EARLY_STOP_ENABLED = os.getenv("EARLY_STOP_ENABLED", "true").lower() == "true"
+EARLY_STOP_MIN_TOKENS = int(os.getenv("EARLY_STOP_MIN_TOKENS", 24))
+SHORT_ANSWER_MAX_TOKENS = int(os.getenv("SHORT_ANSWER_MAX_TOKENS", 48))
+# Modelo borrador para decodificación especulativa (assisted generation); vacío: deshabilitada
+DRAFT_MODEL_PATH = os.getenv("DRAFT_MODEL_PATH", "")
+
+# Arranque: hilos para cargar en paralelo modelo, embeddings e índice
+STARTUP_WORKERS = int(os.getenv("STARTUP_WORKERS", 4))
+
+# Servidor pre-fork (api/prefork.py): procesos que comparten el modelo cargado por el padre
+PREFORK_WORKERS = int(os.getenv("PREFORK_WORKERS", 2))
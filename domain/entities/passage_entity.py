@@ -0,0 +1,27 @@
+from typing import Optional
+
+from pydantic import BaseModel, Field
+
+
+class PassageEntity(BaseModel):
+    """
+    Entidad del dominio que representa un pasaje del corpus a agregar o actualizar.
+    """
+    content: str = Field(..., min_length=1)
+    category: Optional[str] = None
+
+
+class PassageMutationResponse(BaseModel):
+    id: int
+    version: int
+
+
+class IndexStatusResponse(BaseModel):
+    edition: str
+    language: str
+    version: int
+    doc_count: int
+    live_count: int
+    index_type: str
+    hybrid: bool
+    embedding_model: Optional[str] = None
@@ -1,4 +1,6 @@
-from pydantic import BaseModel
+from typing import List, Optional
+
+from pydantic import BaseModel, Field
 
 
 class QueryEntity(BaseModel):
@@ -6,3 +8,16 @@ class QueryEntity(BaseModel):
     Entidad del dominio que representa la consulta a procesar.
     """
     query: str
+    use_cache: bool = True
+    edition: Optional[str] = Field(None, pattern=r"^\d{4}$")
+    language: Optional[str] = Field(None, pattern=r"^[a-z]{2}(?:_[A-Z]{2})?$")
+
+
+class BatchQueryEntity(BaseModel):
+    """
+    Entidad del dominio que representa un lote de consultas a procesar juntas.
+    """
+    queries: List[str] = Field(..., min_length=1)
+    use_cache: bool = True
+    edition: Optional[str] = Field(None, pattern=r"^\d{4}$")
+    language: Optional[str] = Field(None, pattern=r"^[a-z]{2}(?:_[A-Z]{2})?$")
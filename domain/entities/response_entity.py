@@ -1,7 +1,21 @@
 # En domain/entities/response_entity.py
+from typing import List, Optional
+
 from pydantic import BaseModel
 
 
 class InferenceResponse(BaseModel):
     response: str
     time: float
+    cached: bool = False
+
+
+class BatchItemResponse(BaseModel):
+    response: Optional[str] = None
+    time: Optional[float] = None
+    error: Optional[str] = None
+    cached: bool = False
+
+
+class BatchInferenceResponse(BaseModel):
+    results: List[BatchItemResponse]
@@ -1,13 +1,66 @@
 from abc import ABC, abstractmethod
+from typing import Iterator, List, Optional
 
 from domain.entities.response_entity import InferenceResponse
 
 
 class InferenceServiceInterface(ABC):
     @abstractmethod
-    def inference(self, query: str) -> InferenceResponse:
+    def inference(self, query: str, use_cache: bool = True, edition: Optional[str] = None,
+                  language: Optional[str] = None) -> InferenceResponse:
         """
         Ejecuta todo el flujo de búsqueda FAISS + generación de respuesta
         con el modelo y retorna un dict con la información generada.
+        Con `use_cache=False` se ignora la caché de respuestas. `edition` y
+        `language` eligen el corpus; si se omiten se usa el corpus por defecto.
+        """
+        pass
+
+    @abstractmethod
+    def inference_batch(self, queries: List[str], use_cache: bool = True, edition: Optional[str] = None,
+                        language: Optional[str] = None) -> List[dict]:
+        """
+        Ejecuta el flujo completo para varias consultas a la vez y retorna
+        un resultado por consulta, en el mismo orden, con su propio error
+        si esa consulta falló.
+        """
+        pass
+
+    @abstractmethod
+    def inference_stream(self, query: str, edition: Optional[str] = None,
+                         language: Optional[str] = None) -> Iterator[dict]:
+        """
+        Ejecuta el mismo flujo que `inference`, pero emite la respuesta
+        generada como una secuencia de eventos a medida que se produce.
+        """
+        pass
+
+    @abstractmethod
+    def has_corpus(self, edition: Optional[str] = None, language: Optional[str] = None) -> bool:
+        """
+        Indica si existe un índice construido para la edición e idioma.
+        """
+        pass
+
+    @abstractmethod
+    def list_corpora(self) -> List[dict]:
+        """
+        Retorna los pares (edición, idioma) disponibles y si están cargados.
+        """
+        pass
+
+    @abstractmethod
+    def get_batching_stats(self) -> dict:
+        """
+        Retorna las estadísticas del micro-batching de generación
+        (profundidad de cola y tamaños de lote), o `enabled: False`.
+        """
+        pass
+
+    @abstractmethod
+    def get_cache_stats(self) -> dict:
+        """
+        Retorna las estadísticas de las cachés (respuestas, embeddings,
+        prefijos KV y contextos), cada una con su indicador `enabled`.
         """
         pass
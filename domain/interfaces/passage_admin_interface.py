@@ -0,0 +1,44 @@
+from abc import ABC, abstractmethod
+from typing import Optional
+
+
+class PassageAdminInterface(ABC):
+    @abstractmethod
+    def add_passage(self, content: str, category: Optional[str] = None, edition: Optional[str] = None,
+                    language: Optional[str] = None) -> dict:
+        """
+        Agrega un pasaje al corpus y al índice de la edición e idioma (por
+        defecto, el corpus por defecto), y retorna su id y la versión del
+        índice que lo incluye.
+        """
+        pass
+
+    @abstractmethod
+    def update_passage(self, passage_id: int, content: str, category: Optional[str] = None,
+                       edition: Optional[str] = None, language: Optional[str] = None) -> dict:
+        """
+        Reemplaza el texto de un pasaje existente y su vector en el índice.
+        """
+        pass
+
+    @abstractmethod
+    def delete_passage(self, passage_id: int, edition: Optional[str] = None, language: Optional[str] = None) -> dict:
+        """
+        Quita un pasaje del índice. Su id no se reutiliza.
+        """
+        pass
+
+    @abstractmethod
+    def reload_index(self, edition: Optional[str] = None, language: Optional[str] = None) -> dict:
+        """
+        Vuelve a cargar el índice y el corpus desde disco y los publica sin
+        interrumpir las peticiones en curso.
+        """
+        pass
+
+    @abstractmethod
+    def get_index_stats(self, edition: Optional[str] = None, language: Optional[str] = None) -> dict:
+        """
+        Retorna la versión vigente del índice y la cantidad de documentos.
+        """
+        pass
@@ -0,0 +1,152 @@
+import os
+import queue
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+
+
+class MicroBatchScheduler:
+    """
+    Agrupa peticiones que llegan casi al mismo tiempo y las ejecuta como un
+    solo lote. Cada llamador recibe un Future con su propio resultado.
+
+    `batch_fn(items, **kwargs)` debe retornar una lista con un resultado por
+    cada item, en el mismo orden. Solo se agrupan peticiones que comparten
+    los mismos kwargs de generación.
+    """
+
+    def __init__(self, batch_fn, max_batch_size=8, max_wait_ms=10, name="generation"):
+        self._batch_fn = batch_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, max_wait_ms / 1000.0)
+        self.name = name
+
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker = None
+        self._worker_pid = None
+        self._stopped = False
+
+        # Métricas
+        self._batch_sizes = Counter()
+        self._requests = 0
+        self._max_queue_depth = 0
+        self._total_wait = 0.0
+        self._total_batch_time = 0.0
+
+    def submit(self, item, **kwargs):
+        """
+        Encola un item y retorna un Future que se resuelve con su resultado.
+        """
+        if self._stopped:
+            raise RuntimeError(f"El scheduler {self.name} está detenido.")
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((item, kwargs, future, time.time()))
+        depth = self._queue.qsize()
+        if depth > self._max_queue_depth:
+            self._max_queue_depth = depth
+        return future
+
+    def __call__(self, item, **kwargs):
+        """
+        Interfaz síncrona compatible con el pipeline de texto de transformers.
+        """
+        return self.submit(item, **kwargs).result()
+
+    def stats(self):
+        batches = sum(self._batch_sizes.values())
+        return {
+            "queue_depth": self._queue.qsize(),
+            "max_queue_depth": self._max_queue_depth,
+            "requests": self._requests,
+            "batches": batches,
+            "avg_batch_size": self._requests / batches if batches else 0.0,
+            "batch_size_histogram": dict(sorted(self._batch_sizes.items())),
+            "avg_queue_wait": self._total_wait / self._requests if self._requests else 0.0,
+            "avg_batch_time": self._total_batch_time / batches if batches else 0.0,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+        }
+
+    def shutdown(self):
+        self._stopped = True
+        self._queue.put(None)
+
+    def _ensure_worker(self):
+        # El hilo no sobrevive a un fork, por eso se (re)crea por proceso
+        if self._worker is not None and self._worker_pid == os.getpid():
+            return
+        with self._lock:
+            if self._worker is None or self._worker_pid != os.getpid():
+                if self._worker_pid != os.getpid():
+                    self._queue = queue.Queue()
+                self._worker_pid = os.getpid()
+                self._worker = threading.Thread(
+                    target=self._run, name=f"{self.name}-batcher", daemon=True
+                )
+                self._worker.start()
+
+    def _collect(self):
+        first = self._queue.get()
+        if first is None:
+            return None
+        batch = [first]
+        deadline = time.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            try:
+                entry = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if entry is None:
+                self._stopped = True
+                break
+            batch.append(entry)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if batch is None:
+                return
+
+            # Solo se ejecutan juntas las peticiones con los mismos kwargs
+            groups = {}
+            for entry in batch:
+                key = repr(sorted(entry[1].items()))
+                groups.setdefault(key, []).append(entry)
+
+            for entries in groups.values():
+                self._execute(entries)
+
+            if self._stopped and self._queue.empty():
+                return
+
+    def _execute(self, entries):
+        start_time = time.time()
+        items = [entry[0] for entry in entries]
+        kwargs = entries[0][1]
+        try:
+            results = self._batch_fn(items, **kwargs)
+            if len(results) != len(items):
+                raise RuntimeError(
+                    f"El lote retornó {len(results)} resultados para {len(items)} peticiones."
+                )
+        except Exception as e:
+            print(f"Error ejecutando lote de {len(items)} peticiones: {str(e)}")
+            for entry in entries:
+                entry[2].set_exception(e)
+            return
+        finally:
+            end_time = time.time()
+            self._batch_sizes[len(items)] += 1
+            self._requests += len(items)
+            self._total_batch_time += end_time - start_time
+            self._total_wait += sum(start_time - entry[3] for entry in entries)
+
+        for entry, result in zip(entries, results):
+            entry[2].set_result(result)
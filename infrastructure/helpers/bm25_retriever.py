@@ -0,0 +1,90 @@
+import re
+import unicodedata
+from collections import Counter, defaultdict
+
+import numpy as np
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def tokenize(text):
+    """
+    Tokenización para BM25: minúsculas, sin tildes y separando por caracteres
+    de palabra, de modo que "Inyección SQL" y "inyeccion sql" coincidan.
+    """
+    text = unicodedata.normalize("NFKD", text.casefold())
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return _TOKEN_RE.findall(text)
+
+
+class BM25Retriever:
+    """
+    Recuperador BM25 en memoria sobre un índice invertido del corpus.
+    Cada término guarda los ids de los documentos donde aparece y su
+    frecuencia, así que una búsqueda solo toca las listas de sus términos.
+    """
+
+    def __init__(self, texts, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.doc_count = len(texts)
+
+        postings = defaultdict(lambda: ([], []))
+        doc_lengths = np.zeros(self.doc_count, dtype=np.float32)
+        for doc_id, text in enumerate(texts):
+            terms = Counter(tokenize(text or ""))
+            doc_lengths[doc_id] = sum(terms.values())
+            for term, frequency in terms.items():
+                postings[term][0].append(doc_id)
+                postings[term][1].append(frequency)
+
+        self.avg_doc_length = float(doc_lengths.mean()) if self.doc_count and doc_lengths.sum() else 1.0
+        self._length_norm = k1 * (1 - b + b * doc_lengths / self.avg_doc_length)
+        self._postings = {}
+        for term, (doc_ids, frequencies) in postings.items():
+            doc_ids = np.asarray(doc_ids, dtype=np.int64)
+            document_frequency = len(doc_ids)
+            idf = np.log(1 + (self.doc_count - document_frequency + 0.5) / (document_frequency + 0.5))
+            self._postings[term] = (doc_ids, np.asarray(frequencies, dtype=np.float32), idf)
+
+    def __len__(self):
+        return self.doc_count
+
+    def scores(self, query):
+        """
+        Puntaje BM25 de cada documento del corpus para la consulta.
+        """
+        scores = np.zeros(self.doc_count, dtype=np.float32)
+        for term in set(tokenize(query)):
+            posting = self._postings.get(term)
+            if posting is None:
+                continue
+            doc_ids, frequencies, idf = posting
+            scores[doc_ids] += idf * frequencies * (self.k1 + 1) / (frequencies + self._length_norm[doc_ids])
+        return scores
+
+    def search(self, query, top_k=3):
+        """
+        Retorna (scores, ids) de los `top_k` documentos con puntaje positivo, de mayor a menor.
+        """
+        scores = self.scores(query)
+        top_k = min(top_k, self.doc_count)
+        if top_k <= 0:
+            return np.zeros(0, dtype=np.float32), np.zeros(0, dtype=np.int64)
+        candidates = np.argpartition(-scores, top_k - 1)[:top_k]
+        candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+        candidates = candidates[scores[candidates] > 0]
+        return scores[candidates], candidates
+
+    def search_batch(self, queries, top_k=3):
+        """
+        Búsqueda para varias consultas con el mismo formato que FAISS:
+        matrices (scores, ids) de forma (len(queries), top_k), rellenas con -1.
+        """
+        scores = np.zeros((len(queries), top_k), dtype=np.float32)
+        ids = np.full((len(queries), top_k), -1, dtype=np.int64)
+        for row, query in enumerate(queries):
+            row_scores, row_ids = self.search(query, top_k)
+            scores[row, :len(row_ids)] = row_scores
+            ids[row, :len(row_ids)] = row_ids
+        return scores, ids
@@ -0,0 +1,79 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class ExecutorSaturatedError(Exception):
+    """
+    Se lanza cuando no quedan hilos libres ni lugar en la cola de admisión.
+    """
+    pass
+
+
+class BoundedExecutor:
+    """
+    Pool de hilos dedicado a la inferencia con una cola de admisión acotada.
+    Admite como máximo `max_workers` tareas en ejecución más `max_queue_size`
+    en espera; a partir de ahí `submit` falla de inmediato en lugar de encolar.
+    """
+
+    def __init__(self, max_workers=4, max_queue_size=16, name="inference"):
+        self.max_workers = max(1, int(max_workers))
+        self.max_queue_size = max(0, int(max_queue_size))
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=name)
+        self._slots = threading.BoundedSemaphore(self.max_workers + self.max_queue_size)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._rejected = 0
+
+    def submit(self, fn, *args, **kwargs):
+        self._acquire()
+        try:
+            future = self._executor.submit(fn, *args, **kwargs)
+        except Exception:
+            self._release()
+            raise
+        future.add_done_callback(lambda _: self._release())
+        return future
+
+    def reserve(self):
+        """
+        Reserva un lugar de la capacidad para trabajo que corre fuera del pool
+        (p. ej. un streaming que genera en su propio hilo). Retorna una función
+        que libera el lugar; llamarla más de una vez no tiene efecto.
+        """
+        self._acquire()
+        released = threading.Lock()
+
+        def release():
+            if released.acquire(blocking=False):
+                self._release()
+
+        return release
+
+    def stats(self):
+        return {
+            "max_workers": self.max_workers,
+            "max_queue_size": self.max_queue_size,
+            "in_flight": self._in_flight,
+            "queued": max(0, self._in_flight - self.max_workers),
+            "rejected": self._rejected,
+        }
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+
+    def _acquire(self):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._rejected += 1
+            raise ExecutorSaturatedError(
+                f"Capacidad de inferencia agotada ({self.max_workers} en ejecución, "
+                f"{self.max_queue_size} en cola)."
+            )
+        with self._lock:
+            self._in_flight += 1
+
+    def _release(self):
+        with self._lock:
+            self._in_flight -= 1
+        self._slots.release()
@@ -0,0 +1,95 @@
+import threading
+from collections import OrderedDict
+
+
+class ContextCache:
+    """
+    Caché LRU del contexto armado para un conjunto de pasajes recuperados.
+    La clave es (namespace, versión del snapshot, ids en orden): para esos
+    ids el contexto no depende de la consulta, así que una recuperación
+    repetida se saltea la concatenación de pasajes y la tokenización del
+    prefijo del prompt. Cada entrada es un dict con "context", "token_ids"
+    (tokens del contexto si salen del almacén de tokens) y "prefix_ids"
+    (ids de tokens del prefijo, calculados la primera vez que se piden).
+    """
+
+    def __init__(self, max_entries=2048):
+        self.max_entries = max_entries
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.tokenizations_saved = 0
+
+    @staticmethod
+    def key(namespace, version, ids):
+        return namespace, version, tuple(int(doc_id) for doc_id in ids if doc_id >= 0)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, context, token_ids=None):
+        """
+        Guarda el contexto y retorna su entrada. Si otra petición ya lo guardó
+        se retorna esa, para no perder los ids de tokens que ya tuviera.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = {"context": context, "token_ids": token_ids, "prefix_ids": None}
+                self._entries[key] = entry
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+            self._entries.move_to_end(key)
+            return entry
+
+    def prefix_ids(self, entry, build):
+        """
+        Ids de tokens del prefijo del prompt, calculados con `build` y guardados
+        en la entrada la primera vez. El prefijo solo depende del contexto, así
+        que es el mismo para todas las consultas que recuperan los mismos pasajes.
+        """
+        with self._lock:
+            if entry["prefix_ids"] is not None:
+                self.tokenizations_saved += 1
+                return entry["prefix_ids"]
+        prefix_ids = build()
+        with self._lock:
+            # Si otra petición lo calculó mientras tanto se conserva el suyo
+            if entry["prefix_ids"] is None:
+                entry["prefix_ids"] = prefix_ids
+            return entry["prefix_ids"]
+
+    def clear(self, namespace=None):
+        """
+        Vacía la caché, o solo las entradas de `namespace` si se indica.
+        """
+        with self._lock:
+            if namespace is None:
+                self._entries.clear()
+                return
+            for key in [key for key in self._entries if key[0] == namespace]:
+                del self._entries[key]
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "tokenizations_saved": self.tokenizations_saved,
+        }
@@ -1,46 +1,68 @@
-from sklearn.feature_extraction.text import TfidfVectorizer
 import numpy as np
 
-def truncate_context_with_tfidf(context, query, max_tokens=512):
+from infrastructure.helpers.tfidf_index import TfidfSectionIndex
+
+
+def truncate_context_with_tfidf(context, query, max_tokens=512, tfidf_index=None, tokenizer=None):
     """
     Trunca el contexto priorizando secciones más relevantes con TF-IDF.
+    Con un `tfidf_index` preconstruido no se reajusta ningún vectorizador; con
+    `tokenizer` el presupuesto se cuenta en tokens reales del modelo.
     """
     if not context.strip():
         print("Contexto vacío proporcionado a TF-IDF.")
         return ""
 
     sections = context.split("\n")
-    corpus = [query] + sections
-    vectorizer = TfidfVectorizer()
-    tfidf_matrix = vectorizer.fit_transform(corpus)
-
-    query_vector = tfidf_matrix[0]
-    section_vectors = tfidf_matrix[1:]
-    similarities = section_vectors.dot(query_vector.T).toarray().flatten()
-
-    sorted_indices = np.argsort(similarities)[::-1]
-    sorted_sections = [sections[i] for i in sorted_indices]
-
-    truncated_context = []
-    token_count = 0
-    for section in sorted_sections:
-        tokens = section.split()
-        if token_count + len(tokens) <= max_tokens:
-            truncated_context.append(section)
-            token_count += len(tokens)
-        else:
-            break
+    if tfidf_index is None:
+        tfidf_index = TfidfSectionIndex.fit([query] + sections, tokenizer)
 
+    truncated_context = tfidf_index.select(sections, query, max_tokens, tokenizer)
     return "\n".join(truncated_context)
 
-def ensure_context(context, query, processed_data, max_tokens=512):
+def ensure_context(context, query, processed_data, max_tokens=512, tfidf_index=None, tokenizer=None):
     """
     Garantiza que el contexto no esté vacío después del truncamiento.
     """
     if not context.strip():
         print("Contexto vacío, utilizando contenido predeterminado.")
         fallback_context = "\n".join(
-            [entry["content"] for entry in processed_data[:3]]
+            [entry["content"] for entry in processed_data[:3] if entry is not None]
+        )
+        return truncate_context_with_tfidf(
+            fallback_context, query, max_tokens=max_tokens, tfidf_index=tfidf_index, tokenizer=tokenizer
         )
-        return truncate_context_with_tfidf(fallback_context, query, max_tokens=max_tokens)
     return context
+
+
+def entry_content(entry):
+    if entry is None:
+        return ""
+    return entry.get("content", "") or entry.get("context", "")
+
+
+def corpus_contents(processed_data):
+    """
+    Arreglo de NumPy con el texto de cada documento, alineado con los ids del índice FAISS.
+    Si el corpus es un CorpusStore se usa su vista perezosa para no materializar los textos.
+    Los documentos borrados (None) quedan como texto vacío.
+    """
+    if hasattr(processed_data, "contents"):
+        return processed_data.contents
+    contents = np.empty(len(processed_data), dtype=object)
+    contents[:] = [entry_content(entry) for entry in processed_data]
+    return contents
+
+
+def build_contexts(indices, contents):
+    """
+    Arma el contexto de cada consulta a partir de la matriz de ids que retorna
+    FAISS, indexando el arreglo de contenidos de una sola vez.
+    Los ids -1 (sin resultado) se descartan.
+    """
+    indices = np.asarray(indices)
+    if not isinstance(contents, np.ndarray):
+        return ["\n".join(contents[idx] for idx in row if idx >= 0) for row in indices]
+    valid = indices >= 0
+    selected = contents[np.where(valid, indices, 0)]
+    return ["\n".join(row[mask]) for row, mask in zip(selected, valid)]
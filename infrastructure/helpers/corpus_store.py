@@ -0,0 +1,102 @@
+import hashlib
+import json
+import mmap
+import os
+
+import numpy as np
+
+OFFSETS_SUFFIX = ".offsets.npy"
+BLOB_SUFFIX = ".blob"
+
+
+def corpus_store_exists(base_path):
+    return os.path.exists(base_path + OFFSETS_SUFFIX) and os.path.exists(base_path + BLOB_SUFFIX)
+
+
+def corpus_fingerprint(texts):
+    """
+    Hash del texto de cada documento, en orden. Los artefactos derivados del
+    corpus (TF-IDF, tokens) lo guardan para detectar al cargarlos que el corpus
+    cambió aunque tenga la misma cantidad de documentos.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for position in range(len(texts)):
+        digest.update((texts[position] or "").encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+
+def write_corpus_store(entries, base_path):
+    """
+    Escribe el corpus en formato compacto: un blob con cada entrada serializada
+    en JSON UTF-8, una detrás de otra, y una tabla de offsets (int64, n + 1)
+    que indica dónde empieza y termina cada entrada.
+    """
+    offsets = np.zeros(len(entries) + 1, dtype=np.int64)
+    with open(base_path + BLOB_SUFFIX, "wb") as blob:
+        for position, entry in enumerate(entries):
+            encoded = json.dumps(entry, ensure_ascii=False).encode("utf-8")
+            blob.write(encoded)
+            offsets[position + 1] = offsets[position] + len(encoded)
+    np.save(base_path + OFFSETS_SUFFIX, offsets)
+    return len(entries)
+
+
+class CorpusStore:
+    """
+    Corpus de solo lectura respaldado por archivos mapeados en memoria.
+    Las entradas se decodifican bajo demanda por id, y varios procesos que
+    abren los mismos archivos comparten las páginas a través de la caché del SO.
+    Se comporta como una lista de dicts: soporta len, índices y slices.
+    """
+
+    def __init__(self, base_path):
+        self.base_path = base_path
+        self._offsets = np.load(base_path + OFFSETS_SUFFIX, mmap_mode="r")
+        self._file = open(base_path + BLOB_SUFFIX, "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        self._blob = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return [self[position] for position in range(*key.indices(len(self)))]
+        position = int(key)
+        if position < 0:
+            position += len(self)
+        if not 0 <= position < len(self):
+            raise IndexError(f"Id de documento fuera de rango: {key}")
+        start, end = int(self._offsets[position]), int(self._offsets[position + 1])
+        return json.loads(self._blob[start:end].decode("utf-8"))
+
+    def __iter__(self):
+        for position in range(len(self)):
+            yield self[position]
+
+    @property
+    def contents(self):
+        """
+        Vista perezosa del texto de cada documento, alineada con los ids del índice.
+        """
+        return _ContentView(self)
+
+    def close(self):
+        if isinstance(self._blob, mmap.mmap):
+            self._blob.close()
+        self._file.close()
+
+
+class _ContentView:
+    def __init__(self, store):
+        self._store = store
+
+    def __len__(self):
+        return len(self._store)
+
+    def __getitem__(self, position):
+        entry = self._store[position]
+        if entry is None:
+            return ""
+        return entry.get("content", "") or entry.get("context", "")
@@ -0,0 +1,172 @@
+import re
+
+import torch
+from transformers import StoppingCriteria, StoppingCriteriaList
+
+from infrastructure.helpers.response_cache import normalize_query
+
+# El modelo a veces sigue generando un bloque nuevo de pregunta y respuesta
+STOP_SEQUENCES = ("Pregunta:",)
+
+# Preguntas de definición: la respuesta suele ser una o dos oraciones
+_SHORT_ANSWER_RE = re.compile(
+    r"^(qu[eé] (es|son|significa)|defin[ae]|definici[oó]n de|what (is|are))\b"
+)
+_SENTENCE_END_RE = re.compile(r"[.!?][\"')\]]?\s")
+
+
+def token_budget(query, max_new_tokens, short_answer_tokens):
+    """
+    Tokens nuevos a generar según el tipo de pregunta: las de definición
+    ("¿Qué es...?") reciben `short_answer_tokens`, el resto `max_new_tokens`.
+    """
+    if query and _SHORT_ANSWER_RE.match(normalize_query(query)):
+        return min(max_new_tokens, short_answer_tokens)
+    return max_new_tokens
+
+
+class _PromptAwareCriteria(StoppingCriteria):
+    """
+    Criterio que necesita saber dónde termina el prompt. Si no se indica
+    `prompt_length`, se toma de `input_ids` en la primera llamada: `generate`
+    la hace con el primer token nuevo ya agregado, así que no hace falta
+    volver a tokenizar los prompts (con padding, es el largo del más largo).
+    No vale con generación asistida, que puede aceptar varios tokens del
+    borrador antes de la primera llamada (ver `with_stopping_criteria`).
+    """
+
+    def __init__(self, prompt_length=None):
+        self.prompt_length = prompt_length
+
+    def _prompt_length(self, input_ids):
+        if self.prompt_length is None:
+            self.prompt_length = input_ids.shape[1] - 1
+        return self.prompt_length
+
+
+class StopOnSequences(_PromptAwareCriteria):
+    """
+    Detiene cada secuencia del lote cuando el texto generado (sin el prompt)
+    contiene alguna de `stop_sequences`. Solo se decodifican los últimos
+    `tail_tokens` tokens en cada paso.
+    """
+
+    def __init__(self, tokenizer, prompt_length=None, stop_sequences=STOP_SEQUENCES, tail_tokens=8):
+        super().__init__(prompt_length)
+        self.tokenizer = tokenizer
+        self.stop_sequences = tuple(stop_sequences)
+        self.tail_tokens = tail_tokens
+
+    def __call__(self, input_ids, scores, **kwargs):
+        start = max(self._prompt_length(input_ids), input_ids.shape[1] - self.tail_tokens)
+        tails = self.tokenizer.batch_decode(input_ids[:, start:], skip_special_tokens=True)
+        return torch.tensor(
+            [any(sequence in tail for sequence in self.stop_sequences) for tail in tails],
+            dtype=torch.bool, device=input_ids.device
+        )
+
+
+class StopAtSentenceEnd(_PromptAwareCriteria):
+    """
+    Detiene cada secuencia en el primer fin de oración (punto seguido de un
+    espacio) después de `min_new_tokens` tokens generados. El token posterior
+    al punto se genera igual y lo descarta `truncate_to_last_sentence`.
+    """
+
+    def __init__(self, tokenizer, prompt_length=None, min_new_tokens=0):
+        super().__init__(prompt_length)
+        self.tokenizer = tokenizer
+        self.min_new_tokens = min_new_tokens
+
+    def __call__(self, input_ids, scores, **kwargs):
+        if input_ids.shape[1] - self._prompt_length(input_ids) < self.min_new_tokens:
+            return torch.zeros(input_ids.shape[0], dtype=torch.bool, device=input_ids.device)
+        tails = self.tokenizer.batch_decode(input_ids[:, -2:], skip_special_tokens=True)
+        return torch.tensor(
+            [_SENTENCE_END_RE.search(tail) is not None for tail in tails],
+            dtype=torch.bool, device=input_ids.device
+        )
+
+
+class TokenCounter(_PromptAwareCriteria):
+    """
+    Criterio que nunca detiene la generación: guarda los ids de la última
+    llamada para contar los tokens generados por cada secuencia del lote (sin
+    el prompt ni el padding que `generate` agrega a las que ya terminaron),
+    así la métrica no vuelve a tokenizar la respuesta.
+    """
+
+    def __init__(self, pad_token_id=None, prompt_length=None):
+        super().__init__(prompt_length)
+        self.pad_token_id = pad_token_id
+        self._input_ids = None
+
+    def __call__(self, input_ids, scores, **kwargs):
+        self._prompt_length(input_ids)
+        self._input_ids = input_ids
+        return torch.zeros(input_ids.shape[0], dtype=torch.bool, device=input_ids.device)
+
+    @property
+    def counts(self):
+        if self._input_ids is None:
+            return []
+        generated = self._input_ids[:, self.prompt_length:]
+        if self.pad_token_id is None:
+            return [generated.shape[1]] * generated.shape[0]
+        return (generated != self.pad_token_id).sum(dim=1).tolist()
+
+
+class StopOnEvent(StoppingCriteria):
+    """
+    Detiene todo el lote cuando se marca `event`, p. ej. porque el cliente
+    del streaming se desconectó y nadie va a leer lo que se genere.
+    """
+
+    def __init__(self, event):
+        self.event = event
+
+    def __call__(self, input_ids, scores, **kwargs):
+        return torch.full((input_ids.shape[0],), self.event.is_set(), dtype=torch.bool, device=input_ids.device)
+
+
+def with_stopping_criteria(generation_kwargs, tokenizer, prompt_length=None):
+    """
+    Convierte las opciones de corte temprano de los kwargs de generación
+    (`stop_sequences` y `sentence_min_tokens`, que son datos simples y se
+    pueden comparar entre peticiones) en `stopping_criteria` para `generate`.
+    `prompt_length` es el largo en tokens del prompt (con el padding del lote);
+    si no se conoce, los criterios lo toman de la primera llamada de `generate`.
+    Con generación asistida (`assistant_model`) ese cálculo no es confiable,
+    así que sin `prompt_length` no se agregan los criterios. Los criterios son
+    de una sola llamada a `generate`.
+    """
+    kwargs = dict(generation_kwargs)
+    stop_sequences = kwargs.pop("stop_sequences", None)
+    sentence_min_tokens = kwargs.pop("sentence_min_tokens", None)
+    if tokenizer is None:
+        return kwargs
+    if prompt_length is None and kwargs.get("assistant_model") is not None:
+        return kwargs
+
+    criteria = []
+    if stop_sequences:
+        criteria.append(StopOnSequences(tokenizer, prompt_length, stop_sequences))
+    if sentence_min_tokens:
+        criteria.append(StopAtSentenceEnd(tokenizer, prompt_length, sentence_min_tokens))
+    if criteria:
+        kwargs["stopping_criteria"] = StoppingCriteriaList(criteria)
+    return kwargs
+
+
+def with_token_counter(generation_kwargs, tokenizer, prompt_length=None):
+    """
+    Igual que `with_stopping_criteria`, y además agrega un `TokenCounter`.
+    Retorna (kwargs, counter); `counter` es None cuando no se puede contar
+    (sin tokenizer, o generación asistida sin `prompt_length`).
+    """
+    kwargs = with_stopping_criteria(generation_kwargs, tokenizer, prompt_length)
+    if tokenizer is None or (prompt_length is None and kwargs.get("assistant_model") is not None):
+        return kwargs, None
+    counter = TokenCounter(tokenizer.pad_token_id, prompt_length)
+    kwargs["stopping_criteria"] = StoppingCriteriaList(list(kwargs.get("stopping_criteria", [])) + [counter])
+    return kwargs, counter
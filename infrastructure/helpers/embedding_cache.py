@@ -0,0 +1,160 @@
+import os
+import re
+import sqlite3
+import threading
+import unicodedata
+from collections import OrderedDict
+
+import numpy as np
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_text(text):
+    """
+    Normaliza un texto para usarlo como clave: forma NFKC y espacios
+    colapsados. No cambia mayúsculas ni puntuación porque el embedding sí
+    puede depender de ellas.
+    """
+    return _WHITESPACE_RE.sub(" ", unicodedata.normalize("NFKC", text)).strip()
+
+
+class EmbeddingCache:
+    """
+    Caché de embeddings por (modelo, texto normalizado): un LRU en memoria
+    respaldado por una base SQLite en disco que sobrevive a los reinicios.
+    Con `path=None` solo se usa la memoria. Es segura entre hilos, y SQLite
+    en modo WAL permite compartir el archivo entre procesos; tras un fork
+    cada proceso abre su propia conexión.
+    """
+
+    def __init__(self, path=None, max_entries=10000):
+        self.path = path
+        self.max_entries = max_entries
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._connection = None
+        self._connection_pid = None
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._connect()
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+        self._encode_seconds = 0.0
+        self._encoded = 0
+
+    def _connect(self):
+        # Una conexión de SQLite no se puede usar en el proceso hijo de un fork
+        if self._connection is not None and self._connection_pid == os.getpid():
+            return self._connection
+        self._connection = sqlite3.connect(self.path, check_same_thread=False)
+        self._connection_pid = os.getpid()
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "model TEXT NOT NULL, text TEXT NOT NULL, vector BLOB NOT NULL, "
+            "PRIMARY KEY (model, text))"
+        )
+        self._connection.commit()
+        return self._connection
+
+    def get_many(self, model_name, texts):
+        """
+        Retorna una lista con el embedding de cada texto, o None si no está.
+        """
+        keys = [normalize_text(text) for text in texts]
+        found = [None] * len(keys)
+        with self._lock:
+            pending = []
+            for position, key in enumerate(keys):
+                vector = self._entries.get((model_name, key))
+                if vector is not None:
+                    self._entries.move_to_end((model_name, key))
+                    found[position] = vector
+                    self.memory_hits += 1
+                else:
+                    pending.append(position)
+
+            if pending and self.path:
+                for position, vector in zip(pending, self._load(model_name, [keys[p] for p in pending])):
+                    if vector is not None:
+                        found[position] = vector
+                        self.disk_hits += 1
+                        self._remember((model_name, keys[position]), vector)
+
+            hits = sum(vector is not None for vector in found)
+            self.misses += len(keys) - hits
+            if self._encoded:
+                # Tiempo que habría costado codificar los aciertos, según el promedio medido
+                self.saved_seconds += hits * self._encode_seconds / self._encoded
+        return found
+
+    def put_many(self, model_name, texts, vectors, encode_seconds=None):
+        """
+        Guarda los embeddings en memoria y en disco. `encode_seconds` es lo
+        que tardó en codificarlos y sirve para estimar el tiempo ahorrado.
+        """
+        rows = []
+        with self._lock:
+            for text, vector in zip(texts, vectors):
+                key = normalize_text(text)
+                vector = np.asarray(vector, dtype=np.float32)
+                self._remember((model_name, key), vector)
+                rows.append((model_name, key, vector.tobytes()))
+            if encode_seconds is not None and len(rows):
+                self._encode_seconds += encode_seconds
+                self._encoded += len(rows)
+            if self.path and rows:
+                connection = self._connect()
+                connection.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?)", rows)
+                connection.commit()
+
+    def _load(self, model_name, keys):
+        vectors = {}
+        # SQLite limita la cantidad de parámetros por consulta
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            cursor = self._connect().execute(
+                f"SELECT text, vector FROM embeddings WHERE model = ? AND text IN ({placeholders})",
+                [model_name, *chunk]
+            )
+            for text, blob in cursor:
+                vectors[text] = np.frombuffer(blob, dtype=np.float32)
+        return [vectors.get(key) for key in keys]
+
+    def _remember(self, key, vector):
+        self._entries[key] = vector
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def disk_entries(self):
+        if not self.path:
+            return 0
+        with self._lock:
+            return self._connect().execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def stats(self):
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "path": self.path,
+            "entries": len(self._entries),
+            "disk_entries": self.disk_entries(),
+            "max_entries": self.max_entries,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+            "saved_seconds": self.saved_seconds,
+        }
+
+    def close(self):
+        if self._connection is not None and self._connection_pid == os.getpid():
+            with self._lock:
+                self._connection.close()
+        self._connection = None
@@ -0,0 +1,91 @@
+import threading
+import time
+
+import numpy as np
+from sentence_transformers import SentenceTransformer
+
+
+class EmbeddingModelRegistry:
+    """
+    Registro de modelos de embeddings cargados una sola vez y compartidos
+    entre peticiones. La carga está protegida con un lock, por lo que el
+    registro se puede usar de forma segura desde varios hilos.
+    Con una `EmbeddingCache` los textos ya codificados no se vuelven a codificar.
+    """
+
+    def __init__(self, cache=None):
+        self._models = {}
+        self._lock = threading.Lock()
+        self.load_times = {}
+        self.cache = cache
+
+    def set_cache(self, cache):
+        """
+        Asigna la caché de embeddings (p. ej. la persistente de los scripts).
+        """
+        self.cache = cache
+
+    def get(self, model_name):
+        """
+        Retorna el modelo solicitado, cargándolo la primera vez que se pide.
+        """
+        model = self._models.get(model_name)
+        if model is not None:
+            return model
+
+        with self._lock:
+            # Otro hilo pudo haberlo cargado mientras esperábamos el lock
+            model = self._models.get(model_name)
+            if model is None:
+                model = self._load(model_name)
+                self._models[model_name] = model
+        return model
+
+    def warm_up(self, model_name, sample_text="¿Qué es OWASP?"):
+        """
+        Carga el modelo y ejecuta una codificación de prueba para que la
+        primera petición real no pague la inicialización de torch.
+        """
+        model = self.get(model_name)
+        start_time = time.time()
+        model.encode([sample_text], convert_to_numpy=True)
+        print(f"Warm-up de {model_name} completado en {time.time() - start_time:.2f}s")
+        return model
+
+    def encode(self, model_name, texts, use_cache=True, **kwargs):
+        """
+        Genera embeddings para una lista de textos con el modelo indicado.
+        Si hay caché solo se codifican los textos que no estén en ella; con
+        argumentos extra para `encode` la caché no se usa, porque podrían
+        cambiar el resultado.
+        """
+        kwargs.setdefault("convert_to_numpy", True)
+        if self.cache is None or not use_cache or set(kwargs) != {"convert_to_numpy"}:
+            return self.get(model_name).encode(texts, **kwargs)
+
+        texts = list(texts)
+        if not texts:
+            return self.get(model_name).encode(texts, **kwargs)
+        vectors = self.cache.get_many(model_name, texts)
+        misses = [position for position, vector in enumerate(vectors) if vector is None]
+        if misses:
+            start_time = time.time()
+            encoded = self.get(model_name).encode([texts[position] for position in misses], **kwargs)
+            self.cache.put_many(
+                model_name, [texts[position] for position in misses], encoded, time.time() - start_time
+            )
+            for row, position in enumerate(misses):
+                vectors[position] = encoded[row]
+        return np.stack(vectors).astype(np.float32, copy=False)
+
+    def _load(self, model_name):
+        print(f"Cargando modelo de embeddings {model_name}...")
+        start_time = time.time()
+        model = SentenceTransformer(model_name)
+        self.load_times[model_name] = time.time() - start_time
+        print(f"Modelo de embeddings {model_name} cargado en {self.load_times[model_name]:.2f}s")
+        return model
+
+
+# Registro compartido para scripts y llamadas que no reciben uno explícito
+default_registry = EmbeddingModelRegistry()
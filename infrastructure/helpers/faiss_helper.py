@@ -1,16 +1,18 @@
-import faiss
-from sentence_transformers import SentenceTransformer
+from infrastructure.helpers.embedding_registry import default_registry
 
 
-def search_with_faiss(query, index, processed_data, embedding_model_name="all-MiniLM-L12-v2", top_k=3):
+def search_with_faiss(query, index, processed_data, embedding_model_name="all-MiniLM-L12-v2", top_k=3,
+                      embedding_registry=None, query_embedding=None):
     """
     Busca en el índice FAISS los documentos más relevantes para una consulta.
+    El modelo de embeddings se obtiene del registro compartido, así que solo
+    se carga la primera vez. Si ya se tiene el embedding de la consulta se
+    puede pasar en `query_embedding` para no volver a codificarla.
     """
     try:
-        model = SentenceTransformer(embedding_model_name)
-        query_embedding = model.encode([query], convert_to_numpy=True)
-
-        distances, indices = index.search(query_embedding, top_k)
+        distances, indices = search_with_faiss_batch(
+            [query], index, embedding_model_name, top_k, embedding_registry, query_embedding
+        )
 
         results = []
         for i in range(len(indices[0])):
@@ -26,3 +28,16 @@ def search_with_faiss(query, index, processed_data, embedding_model_name="all-Mi
     except Exception as e:
         print(f"Error en la búsqueda con FAISS: {str(e)}")
         raise
+
+
+def search_with_faiss_batch(queries, index, embedding_model_name="all-MiniLM-L12-v2", top_k=3,
+                            embedding_registry=None, query_embeddings=None):
+    """
+    Codifica todas las consultas en una sola llamada a `encode` y las busca
+    con una única búsqueda matricial en el índice.
+    Retorna las matrices (distances, indices) de forma (len(queries), top_k).
+    """
+    if query_embeddings is None:
+        registry = embedding_registry or default_registry
+        query_embeddings = registry.encode(embedding_model_name, list(queries))
+    return index.search(query_embeddings, top_k)
@@ -0,0 +1,68 @@
+import os
+
+import torch
+from transformers import AutoModelForCausalLM
+
+GENERATION_BACKENDS = ("fp32", "int8", "bf16", "onnx")
+
+
+def cpu_supports_bf16():
+    """
+    Indica si la CPU tiene instrucciones nativas de bf16 (AVX512-BF16 o AMX).
+    Sin ellas bf16 se emula y resulta más lento que fp32.
+    """
+    try:
+        return bool(torch.ops.mkldnn._is_mkldnn_bf16_supported())
+    except (AttributeError, RuntimeError):
+        pass
+    try:
+        with open("/proc/cpuinfo", "r", encoding="utf-8") as f:
+            flags = f.read()
+        return "avx512_bf16" in flags or "amx_bf16" in flags
+    except OSError:
+        return False
+
+
+def load_generation_model(model_path, backend="fp32", onnx_model_dir=None):
+    """
+    Carga el modelo de generación con el backend indicado:
+    - fp32: pesos completos, comportamiento original.
+    - int8: cuantización dinámica int8 de las capas Linear.
+    - bf16: pesos en bfloat16 si la CPU lo soporta; si no, fp32.
+    - onnx: grafo exportado a ONNX Runtime (requiere `optimum[onnxruntime]`).
+    """
+    if backend not in GENERATION_BACKENDS:
+        raise ValueError(f"Backend de generación no soportado: {backend}. Opciones: {', '.join(GENERATION_BACKENDS)}")
+
+    if backend == "onnx":
+        return _load_onnx_model(model_path, onnx_model_dir)
+
+    if backend == "bf16":
+        if cpu_supports_bf16():
+            return AutoModelForCausalLM.from_pretrained(model_path, torch_dtype=torch.bfloat16).eval()
+        print("La CPU no soporta bf16 de forma nativa, se usa fp32.")
+        backend = "fp32"
+
+    model = AutoModelForCausalLM.from_pretrained(model_path).eval()
+    if backend == "int8":
+        model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    return model
+
+
+def _load_onnx_model(model_path, onnx_model_dir=None):
+    try:
+        from optimum.onnxruntime import ORTModelForCausalLM
+    except ImportError as e:
+        raise ImportError(
+            "El backend 'onnx' requiere optimum con ONNX Runtime: pip install 'optimum[onnxruntime]'"
+        ) from e
+
+    # La exportación es lenta, así que se guarda y se reutiliza en los siguientes arranques
+    if onnx_model_dir and os.path.exists(os.path.join(onnx_model_dir, "config.json")):
+        return ORTModelForCausalLM.from_pretrained(onnx_model_dir)
+
+    print(f"Exportando {model_path} a ONNX...")
+    model = ORTModelForCausalLM.from_pretrained(model_path, export=True)
+    if onnx_model_dir:
+        model.save_pretrained(onnx_model_dir)
+    return model
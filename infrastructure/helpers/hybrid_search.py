@@ -0,0 +1,47 @@
+import numpy as np
+
+from infrastructure.helpers.faiss_helper import search_with_faiss_batch
+
+
+def reciprocal_rank_fusion(rankings, weights=None, k=60, top_k=3):
+    """
+    Fusiona varias listas de ids ordenadas por relevancia con Reciprocal Rank
+    Fusion: cada documento suma peso / (k + rango) por cada lista en la que aparece.
+    Los ids negativos (sin resultado) se ignoran.
+    Retorna (scores, ids) de los `top_k` mejores, de mayor a menor.
+    """
+    weights = weights or [1.0] * len(rankings)
+    fused = {}
+    for ranking, weight in zip(rankings, weights):
+        for rank, doc_id in enumerate(ranking):
+            doc_id = int(doc_id)
+            if doc_id < 0:
+                continue
+            fused[doc_id] = fused.get(doc_id, 0.0) + weight / (k + rank + 1)
+
+    best = sorted(fused.items(), key=lambda item: item[1], reverse=True)[:top_k]
+    return [score for _, score in best], [doc_id for doc_id, _ in best]
+
+
+def hybrid_search_batch(queries, index, bm25_retriever, embedding_model_name="all-MiniLM-L12-v2", top_k=3,
+                        embedding_registry=None, query_embeddings=None, candidates=20,
+                        dense_weight=1.0, bm25_weight=1.0, rrf_k=60):
+    """
+    Búsqueda híbrida: toma `candidates` resultados de FAISS y de BM25 para
+    cada consulta y los fusiona con RRF. Retorna matrices (scores, ids) de
+    forma (len(queries), top_k), rellenas con -1 como las de FAISS.
+    """
+    _, dense_ids = search_with_faiss_batch(
+        queries, index, embedding_model_name, candidates, embedding_registry, query_embeddings
+    )
+    _, sparse_ids = bm25_retriever.search_batch(queries, candidates)
+
+    scores = np.zeros((len(queries), top_k), dtype=np.float32)
+    ids = np.full((len(queries), top_k), -1, dtype=np.int64)
+    for row in range(len(queries)):
+        row_scores, row_ids = reciprocal_rank_fusion(
+            [dense_ids[row], sparse_ids[row]], [dense_weight, bm25_weight], rrf_k, top_k
+        )
+        scores[row, :len(row_ids)] = row_scores
+        ids[row, :len(row_ids)] = row_ids
+    return scores, ids
@@ -0,0 +1,151 @@
+import json
+import math
+import os
+import time
+
+import faiss
+import numpy as np
+
+from infrastructure.helpers.embedding_registry import default_registry
+
+INDEX_TYPES = ("flat", "hnsw", "ivf_flat", "ivf_pq")
+
+
+def metadata_path(index_path):
+    """
+    Ruta del archivo de metadatos que acompaña a un índice FAISS.
+    """
+    return os.path.splitext(index_path)[0] + ".meta.json"
+
+
+def load_index_metadata(index_path):
+    path = metadata_path(index_path)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def write_index_metadata(index_path, metadata):
+    with open(metadata_path(index_path), "w", encoding="utf-8") as f:
+        json.dump(metadata, f, indent=4, ensure_ascii=False)
+
+
+def passage_texts(processed_data):
+    """
+    Texto a indexar de cada entrada, en el mismo orden que los ids del índice.
+    """
+    return [entry.get("content", "") or entry.get("context", "") for entry in processed_data if entry is not None]
+
+
+def live_ids(processed_data):
+    """
+    Ids de las entradas que no fueron borradas (las borradas quedan como null).
+    """
+    return np.asarray([position for position, entry in enumerate(processed_data) if entry is not None], dtype=np.int64)
+
+
+def embed_passages(texts, embedding_model_name, batch_size=64, embedding_registry=None):
+    """
+    Genera los embeddings de los pasajes en lotes de `batch_size`. torch ya
+    usa todos los núcleos en cada lote, así que los lotes van de a uno:
+    codificarlos en hilos en paralelo solo haría competir a los hilos de torch.
+    """
+    registry = embedding_registry or default_registry
+    model = registry.get(embedding_model_name)
+    embeddings = model.encode(list(texts), batch_size=batch_size, convert_to_numpy=True)
+    return np.ascontiguousarray(embeddings, dtype=np.float32)
+
+
+def build_index(embeddings, index_type="flat", nlist=None, hnsw_m=32, ef_construction=200,
+                pq_m=16, pq_nbits=8, ids=None):
+    """
+    Construye un índice FAISS (métrica L2) del tipo pedido a partir de los embeddings.
+    Los parámetros de IVF y PQ se ajustan si el corpus es demasiado pequeño para entrenarlos.
+    Con `ids` el índice se envuelve en IndexIDMap2 y cada vector se agrega con su id.
+    Retorna (index, params) con los parámetros finalmente usados.
+    """
+    count, dimension = embeddings.shape
+    params = {}
+
+    if index_type == "flat":
+        index = faiss.IndexFlatL2(dimension)
+    elif index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dimension, hnsw_m)
+        index.hnsw.efConstruction = ef_construction
+        params.update({"hnsw_m": hnsw_m, "ef_construction": ef_construction})
+    elif index_type in ("ivf_flat", "ivf_pq"):
+        # FAISS recomienda al menos ~39 puntos de entrenamiento por lista
+        max_nlist = max(1, count // 39)
+        nlist = nlist or int(4 * math.sqrt(count))
+        if nlist > max_nlist:
+            print(f"nlist={nlist} es demasiado grande para {count} pasajes, se usa {max_nlist}.")
+            nlist = max_nlist
+        quantizer = faiss.IndexFlatL2(dimension)
+        if index_type == "ivf_flat":
+            index = faiss.IndexIVFFlat(quantizer, dimension, nlist)
+        else:
+            if dimension % pq_m != 0:
+                raise ValueError(f"pq_m={pq_m} debe dividir la dimensión {dimension}.")
+            while pq_nbits > 1 and 2 ** pq_nbits > count:
+                pq_nbits -= 1
+            index = faiss.IndexIVFPQ(quantizer, dimension, nlist, pq_m, pq_nbits)
+            params.update({"pq_m": pq_m, "pq_nbits": pq_nbits})
+        params["nlist"] = nlist
+        index.train(embeddings)
+    else:
+        raise ValueError(f"Tipo de índice no soportado: {index_type}. Opciones: {', '.join(INDEX_TYPES)}")
+
+    if ids is not None:
+        index = faiss.IndexIDMap2(index)
+        index.add_with_ids(embeddings, np.asarray(ids, dtype=np.int64))
+    else:
+        index.add(embeddings)
+    return index, params
+
+
+def is_ivf_index(index):
+    try:
+        faiss.extract_index_ivf(index)
+        return True
+    except RuntimeError:
+        return False
+
+
+def apply_search_params(index, nprobe=None, ef_search=None):
+    """
+    Aplica los parámetros de búsqueda según el tipo de índice (nprobe para IVF, efSearch para HNSW).
+    """
+    if nprobe:
+        try:
+            faiss.extract_index_ivf(index).nprobe = nprobe
+        except RuntimeError:
+            pass
+    base = faiss.downcast_index(index.index) if isinstance(index, (faiss.IndexIDMap, faiss.IndexIDMap2)) else index
+    if ef_search and hasattr(base, "hnsw"):
+        base.hnsw.efSearch = ef_search
+    return index
+
+
+def recall_at_k(index, baseline_index, queries, k=10):
+    """
+    Compara los resultados del índice contra la búsqueda exacta.
+    Retorna recall@k y la latencia media por consulta de ambos índices.
+    """
+    k = min(k, baseline_index.ntotal)
+
+    start_time = time.time()
+    _, exact = baseline_index.search(queries, k)
+    exact_time = time.time() - start_time
+
+    start_time = time.time()
+    _, approx = index.search(queries, k)
+    approx_time = time.time() - start_time
+
+    hits = sum(len(set(row_exact) & set(row_approx)) for row_exact, row_approx in zip(exact, approx))
+    return {
+        "k": k,
+        "recall": hits / (len(queries) * k) if len(queries) else 0.0,
+        "latency_ms": approx_time * 1000 / max(len(queries), 1),
+        "exact_latency_ms": exact_time * 1000 / max(len(queries), 1),
+    }
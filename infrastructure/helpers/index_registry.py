@@ -0,0 +1,119 @@
+import os
+import re
+import threading
+from collections import OrderedDict, namedtuple
+
+EDITION_RE = re.compile(r"^\d{4}$")
+LANGUAGE_RE = re.compile(r"^[a-z]{2}(?:_[A-Z]{2})?$")
+
+# Archivos de un corpus: índice FAISS, corpus JSON, base del corpus compacto e índice TF-IDF
+CorpusPaths = namedtuple("CorpusPaths", ["index_path", "data_path", "corpus_store_path", "tfidf_index_path"])
+
+
+def corpus_paths(root, edition, language):
+    """
+    Rutas del corpus de una edición e idioma dentro de `root`:
+    `{root}/{edition}/{language}/indice_faiss.index`, `owasp_cleaned_dataset.json`, etc.
+    """
+    if not EDITION_RE.match(edition) or not LANGUAGE_RE.match(language):
+        raise ValueError(f"Edición o idioma inválido: {edition}/{language}")
+    base = os.path.join(root, edition, language)
+    return CorpusPaths(
+        os.path.join(base, "indice_faiss.index"),
+        os.path.join(base, "owasp_cleaned_dataset.json"),
+        os.path.join(base, "owasp_cleaned_dataset"),
+        os.path.join(base, "tfidf_index.pkl"),
+    )
+
+
+def discover_corpora(root):
+    """
+    Pares (edición, idioma) que tienen un índice construido dentro de `root`.
+    """
+    corpora = []
+    if not os.path.isdir(root):
+        return corpora
+    for edition in sorted(os.listdir(root)):
+        edition_dir = os.path.join(root, edition)
+        if not EDITION_RE.match(edition) or not os.path.isdir(edition_dir):
+            continue
+        for language in sorted(os.listdir(edition_dir)):
+            if LANGUAGE_RE.match(language) and os.path.exists(corpus_paths(root, edition, language).index_path):
+                corpora.append((edition, language))
+    return corpora
+
+
+class IndexRegistry:
+    """
+    Registro de corpus cargados bajo demanda por clave (edición, idioma).
+    Como mucho `max_resident` quedan en memoria; al superarlo se descarta el
+    usado hace más tiempo, salvo las claves fijadas en `pinned`. Cada clave
+    se carga una sola vez aunque varios hilos la pidan a la vez, sin bloquear
+    las búsquedas sobre los corpus ya cargados.
+    """
+
+    def __init__(self, loader, max_resident=4, pinned=()):
+        self._loader = loader
+        self.max_resident = max(1, int(max_resident))
+        self.pinned = set(pinned)
+
+        self._resident = OrderedDict()
+        self._loading = {}
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.loads = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            value = self._resident.get(key)
+            if value is not None:
+                self._resident.move_to_end(key)
+                self.hits += 1
+                return value
+            key_lock = self._loading.setdefault(key, threading.Lock())
+
+        with key_lock:
+            with self._lock:
+                # Otro hilo pudo haberlo cargado mientras esperábamos el lock
+                value = self._resident.get(key)
+                if value is not None:
+                    self._resident.move_to_end(key)
+                    self.hits += 1
+                    return value
+
+            value = self._loader(key)
+            with self._lock:
+                self._resident[key] = value
+                self._loading.pop(key, None)
+                self.loads += 1
+                self._evict()
+        return value
+
+    def resident(self):
+        with self._lock:
+            return list(self._resident)
+
+    def items(self):
+        with self._lock:
+            return list(self._resident.items())
+
+    def _evict(self):
+        # Las peticiones en curso conservan su referencia, así que descartar es seguro
+        while len(self._resident) > self.max_resident:
+            victim = next((key for key in self._resident if key not in self.pinned), None)
+            if victim is None:
+                return
+            del self._resident[victim]
+            self.evictions += 1
+            print(f"Corpus {'/'.join(victim)} descargado de memoria (LRU).")
+
+    def stats(self):
+        return {
+            "resident": ["/".join(key) for key in self.resident()],
+            "max_resident": self.max_resident,
+            "hits": self.hits,
+            "loads": self.loads,
+            "evictions": self.evictions,
+        }
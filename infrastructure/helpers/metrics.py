@@ -0,0 +1,221 @@
+import bisect
+import contextvars
+import json
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labelnames, values, extra=None):
+    pairs = list(zip(labelnames, values)) + list((extra or {}).items())
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.extend(self._render_sample(key, value))
+        return lines
+
+    def _render_sample(self, key, value):
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {value}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * (len(self.buckets) + 1), 0.0))
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._values[key] = (counts, total + value)
+
+    def _render_sample(self, key, value):
+        counts, total = value
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, {'le': le})} {cumulative}")
+        lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {total}")
+        lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Registro de métricas en memoria con salida en el formato de texto de Prometheus.
+    Los collectors son funciones que retornan {nombre: (descripción, valor)} y se
+    publican como gauges al momento de renderizar (p. ej. estadísticas de cachés).
+    """
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector):
+        """
+        Registra `collector`. Si ya hay uno con el mismo nombre calificado (p. ej.
+        el mismo método de otra instancia del servicio) se reemplaza, para no
+        publicar las mismas muestras dos veces.
+        """
+        name = getattr(collector, "__qualname__", None)
+        self._collectors = [
+            current for current in self._collectors
+            if name is None or getattr(current, "__qualname__", None) != name
+        ] + [collector]
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for collector in self._collectors:
+            try:
+                samples = collector()
+            except Exception as e:
+                print(f"Error en collector de métricas: {str(e)}")
+                continue
+            for name, (documentation, value) in samples.items():
+                lines.extend([f"# HELP {name} {documentation}", f"# TYPE {name} gauge", f"{name} {value}"])
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+STAGE_LATENCY = REGISTRY.register(Histogram(
+    "owasp_inference_stage_seconds", "Latencia de cada etapa del pipeline de inferencia.", ("stage",)
+))
+REQUEST_LATENCY = REGISTRY.register(Histogram(
+    "owasp_inference_request_seconds", "Latencia total de cada petición de inferencia.", ("method", "status")
+))
+GENERATED_TOKENS = REGISTRY.register(Histogram(
+    "owasp_generated_tokens", "Tokens generados por petición.", ("method",),
+    buckets=(5, 10, 20, 40, 60, 80, 100, 150, 200)
+))
+RETRIEVAL_SCORES = REGISTRY.register(Histogram(
+    "owasp_retrieval_score", "Distancia L2 (densa) o puntaje RRF (híbrida) de los documentos recuperados.",
+    ("retriever",), buckets=(0.01, 0.02, 0.03, 0.05, 0.1, 0.25, 0.5, 0.75, 1.0, 1.5, 2.0)
+))
+ERRORS = REGISTRY.register(Counter(
+    "owasp_inference_errors_total", "Errores por etapa del pipeline.", ("stage",)
+))
+MODEL_LOAD_SECONDS = REGISTRY.register(Gauge(
+    "owasp_model_load_seconds", "Tiempo de carga de cada artefacto al iniciar.", ("artifact",)
+))
+
+_current_trace = contextvars.ContextVar("owasp_current_trace", default=None)
+
+
+class Trace:
+    """
+    Spans de una petición: nombre, inicio relativo y duración de cada etapa.
+    """
+
+    def __init__(self, name):
+        self.trace_id = uuid.uuid4().hex
+        self.name = name
+        self.start = time.time()
+        self.spans = []
+
+    def add_span(self, name, start, duration, error=None):
+        span = {"name": name, "start": round(start - self.start, 6), "duration": round(duration, 6)}
+        if error:
+            span["error"] = error
+        self.spans.append(span)
+
+    def to_dict(self):
+        return {
+            "trace_id": self.trace_id,
+            "name": self.name,
+            "duration": round(time.time() - self.start, 6),
+            "spans": self.spans,
+        }
+
+
+@contextmanager
+def trace_request(name, enabled=True):
+    """
+    Abre una traza para la petición actual; al cerrarse se imprime como una línea JSON.
+    """
+    if not enabled:
+        yield None
+        return
+    trace = Trace(name)
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+        print(json.dumps({"trace": trace.to_dict()}, ensure_ascii=False))
+
+
+@contextmanager
+def stage(name):
+    """
+    Mide una etapa del pipeline: registra su latencia, cuenta el error si
+    falla y agrega un span a la traza de la petición si hay una abierta.
+    """
+    start_time = time.time()
+    error = None
+    try:
+        yield
+    except Exception as e:
+        error = str(e)
+        ERRORS.inc(stage=name)
+        raise
+    finally:
+        duration = time.time() - start_time
+        STAGE_LATENCY.observe(duration, stage=name)
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.add_span(name, start_time, duration, error)
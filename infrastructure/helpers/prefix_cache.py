@@ -0,0 +1,99 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+import torch
+
+
+def _nbytes(value):
+    """
+    Bytes ocupados por los tensores de un caché de key-values (DynamicCache o tuplas).
+    """
+    if isinstance(value, torch.Tensor):
+        return value.numel() * value.element_size()
+    if isinstance(value, (tuple, list)):
+        return sum(_nbytes(item) for item in value)
+    if hasattr(value, "key_cache") and hasattr(value, "value_cache"):
+        return _nbytes(value.key_cache) + _nbytes(value.value_cache)
+    return 0
+
+
+class PrefixKVCache:
+    """
+    Caché LRU de past key-values del modelo para prefijos de prompt que se
+    repiten (plantilla + bloques de contexto). Un acierto evita recalcular el
+    prefill de esos tokens; la memoria se acota por cantidad de entradas y bytes.
+    """
+
+    def __init__(self, model, max_entries=32, max_bytes=512 * 1024 * 1024, min_prefix_tokens=16):
+        self.model = model
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.min_prefix_tokens = min_prefix_tokens
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.skipped = 0
+        self.evictions = 0
+        self.prefill_time_saved = 0.0
+
+    def get(self, prefix_ids):
+        """
+        Retorna una copia de los key-values del prefijo, calculándolos si no
+        estaban. Prefijos más cortos que `min_prefix_tokens` no se cachean y
+        retornan None (no compensa el costo de copiar el caché).
+        """
+        if len(prefix_ids) < self.min_prefix_tokens:
+            self.skipped += 1
+            return None
+
+        key = tuple(prefix_ids)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                self.prefill_time_saved += entry["prefill_time"]
+                # generate extiende el caché en el lugar, por eso se entrega una copia
+                return copy.deepcopy(entry["past_key_values"])
+
+        start_time = time.time()
+        with torch.no_grad():
+            output = self.model(input_ids=torch.tensor([prefix_ids]), use_cache=True)
+        prefill_time = time.time() - start_time
+        past_key_values = output.past_key_values
+        size = _nbytes(past_key_values)
+
+        with self._lock:
+            self.misses += 1
+            if size <= self.max_bytes and key not in self._entries:
+                self._entries[key] = {"past_key_values": past_key_values, "prefill_time": prefill_time, "size": size}
+                self._bytes += size
+                while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                    _, evicted = self._entries.popitem(last=False)
+                    self._bytes -= evicted["size"]
+                    self.evictions += 1
+        return copy.deepcopy(past_key_values)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "skipped": self.skipped,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "prefill_time_saved": self.prefill_time_saved,
+        }
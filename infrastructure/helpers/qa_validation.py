@@ -0,0 +1,228 @@
+import hashlib
+import json
+from collections import Counter
+from itertools import islice
+
+import numpy as np
+
+from infrastructure.helpers.embedding_cache import normalize_text
+from infrastructure.helpers.response_cache import normalize_query
+
+# Reglas en el orden en que se aplican; cada registro rechazado cuenta solo en la primera que falla
+REJECTION_RULES = ("invalid_record", "blocked_phrase", "table", "no_answers", "misaligned", "duplicate")
+BLOCKED_PHRASES = ("Next Steps",)
+
+
+def iter_records(path):
+    """
+    Registros de un dataset QA. Los `.jsonl` se leen línea a línea sin cargar
+    el archivo entero; los `.json` (una lista) se cargan completos.
+    """
+    if path.endswith(".jsonl"):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        return
+    with open(path, "r", encoding="utf-8") as f:
+        yield from json.load(f)
+
+
+def batched(records, batch_size):
+    iterator = iter(records)
+    while True:
+        batch = list(islice(iterator, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def _strings(values):
+    return np.array(values, dtype=np.dtypes.StringDType())
+
+
+def _find_nearest(contexts, texts, starts, lengths):
+    """
+    Posición de la aparición de cada texto en su contexto más cercana a
+    `starts` (ante un empate, la de después), o -1 si no aparece.
+    """
+    starts = np.clip(starts, 0, np.strings.str_len(contexts))
+    after = np.strings.find(contexts, texts, starts)
+    # Apariciones que empiezan antes de `starts`: terminan antes de starts + len
+    before = np.strings.rfind(contexts, texts, 0, starts + lengths - 1)
+    use_before = (before >= 0) & ((after < 0) | (starts - before < after - starts))
+    return np.where(use_before, before, after)
+
+
+def align_spans(contexts, texts, starts):
+    """
+    Verifica y repara, de forma vectorizada, las posiciones de inicio de las
+    respuestas. Un span está alineado si `context[start:start + len(text)] == text`.
+    Los desalineados se buscan en el contexto, primero tal cual y luego sin
+    distinguir mayúsculas, quedándose con la aparición más cercana al inicio
+    original. Retorna (starts, status) con status 0 si el span ya estaba
+    alineado, 1 si se reparó y -1 si la respuesta no está en el contexto.
+    """
+    contexts, texts = _strings(contexts), _strings(texts)
+    starts = np.asarray(starts, dtype=np.int64)
+    lengths = np.strings.str_len(texts)
+
+    aligned = (starts >= 0) & (np.strings.find(contexts, texts, starts, starts + lengths) == starts)
+    status = np.where(aligned, 0, -1)
+    pending = ~aligned
+    if not pending.any():
+        return starts, status
+
+    found = _find_nearest(contexts[pending], texts[pending], starts[pending], lengths[pending])
+    # Sin distinguir mayúsculas solo si pasar a minúsculas no cambia las longitudes
+    lower_contexts, lower_texts = np.strings.lower(contexts[pending]), np.strings.lower(texts[pending])
+    same_length = (
+        (np.strings.str_len(lower_contexts) == np.strings.str_len(contexts[pending]))
+        & (np.strings.str_len(lower_texts) == lengths[pending])
+    )
+    found = np.where(
+        found >= 0, found,
+        np.where(same_length, _find_nearest(lower_contexts, lower_texts, starts[pending], lengths[pending]), -1)
+    )
+
+    repaired = np.array(starts)
+    repaired[pending] = np.where(found >= 0, found, starts[pending])
+    status[pending] = np.where(found >= 0, 1, -1)
+    return repaired, status
+
+
+class QADatasetValidator:
+    """
+    Valida y limpia un dataset QA (question, context, answers con text/start)
+    por lotes, sin cargarlo entero: descarta registros inválidos, con frases
+    bloqueadas o tablas, repara los spans desalineados y elimina los pares
+    (pregunta, contexto) repetidos por hash. Cuenta los rechazos por regla.
+    Los hashes vistos se guardan en un arreglo uint64 ordenado (8 bytes por par).
+    """
+
+    def __init__(self, blocked_phrases=BLOCKED_PHRASES, skip_tables=True, deduplicate=True):
+        self.blocked_phrases = tuple(blocked_phrases)
+        self.skip_tables = skip_tables
+        self.deduplicate = deduplicate
+
+        self._seen = np.zeros(0, dtype=np.uint64)
+        self.rejections = Counter({rule: 0 for rule in REJECTION_RULES})
+        self.total = 0
+        self.kept = 0
+        self.repaired_spans = 0
+        self.dropped_answers = 0
+
+    def validate(self, records, batch_size=10000):
+        """
+        Genera los registros válidos, ya limpios, procesando de a `batch_size`.
+        """
+        for batch in batched(records, batch_size):
+            yield from self.validate_batch(batch)
+
+    def validate_batch(self, records):
+        self.total += len(records)
+        candidates = []
+        for record in records:
+            rule = self._record_rule(record)
+            if rule is not None:
+                self.rejections[rule] += 1
+                continue
+            answers = [
+                answer for answer in record["answers"]
+                if isinstance(answer, dict) and answer.get("text") and isinstance(answer.get("start"), int)
+            ]
+            if not answers:
+                self.rejections["no_answers"] += 1
+                continue
+            context = record["context"].strip()
+            # Los inicios se corren lo que se quitó al principio del contexto
+            shift = len(record["context"]) - len(record["context"].lstrip())
+            candidates.append((record, record["question"].strip(), context, shift, answers))
+        if not candidates:
+            return []
+
+        # Todas las respuestas del lote se alinean en una sola pasada
+        rows = np.repeat(np.arange(len(candidates)), [len(answers) for *_, answers in candidates])
+        contexts = [candidates[row][2] for row in rows]
+        flat_answers = [answer for *_, answers in candidates for answer in answers]
+        texts = [answer["text"] for answer in flat_answers]
+        starts, status = align_spans(
+            contexts, texts, [answer["start"] - candidates[row][3] for row, answer in zip(rows, flat_answers)]
+        )
+        self.repaired_spans += int((status == 1).sum())
+        self.dropped_answers += int((status < 0).sum())
+
+        valid_rows = np.zeros(len(candidates), dtype=bool)
+        valid_rows[rows[status >= 0]] = True
+        self.rejections["misaligned"] += int((~valid_rows).sum())
+
+        keep = valid_rows
+        if self.deduplicate:
+            hashes = np.fromiter(
+                (self._pair_hash(question, context) for _, question, context, _, _ in candidates),
+                dtype=np.uint64, count=len(candidates)
+            )
+            unique = np.zeros(len(candidates), dtype=bool)
+            unique[valid_rows] = self._first_seen(hashes[valid_rows])
+            self.rejections["duplicate"] += int((valid_rows & ~unique).sum())
+            keep = valid_rows & unique
+
+        answers_by_row = [[] for _ in candidates]
+        for position, (row, answer) in enumerate(zip(rows, flat_answers)):
+            if status[position] < 0:
+                continue
+            start = int(starts[position])
+            # Una reparación sin distinguir mayúsculas toma el texto tal como está en el contexto
+            text = contexts[position][start:start + len(answer["text"])]
+            answers_by_row[row].append({**answer, "text": text, "start": start})
+
+        cleaned = [
+            {**record, "question": question, "context": context, "answers": answers_by_row[row]}
+            for row, (record, question, context, _, _) in enumerate(candidates) if keep[row]
+        ]
+        self.kept += len(cleaned)
+        return cleaned
+
+    def _record_rule(self, record):
+        if not isinstance(record, dict):
+            return "invalid_record"
+        question, context, answers = record.get("question"), record.get("context"), record.get("answers")
+        if not isinstance(question, str) or not isinstance(context, str) or not isinstance(answers, list):
+            return "invalid_record"
+        if not question.strip() or not context.strip():
+            return "invalid_record"
+        if any(phrase in question or phrase in context for phrase in self.blocked_phrases):
+            return "blocked_phrase"
+        if self.skip_tables and "|" in context:
+            return "table"
+        return None
+
+    @staticmethod
+    def _pair_hash(question, context):
+        key = f"{normalize_query(question)}\x00{normalize_text(context)}".encode("utf-8")
+        return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "little")
+
+    def _first_seen(self, hashes):
+        """
+        Marca los hashes que aparecen por primera vez (en el lote y en los
+        lotes anteriores) y los agrega al arreglo ordenado de vistos.
+        """
+        unique, first = np.unique(hashes, return_index=True)
+        positions = np.searchsorted(self._seen, unique)
+        known = positions < len(self._seen)
+        known[known] = self._seen[positions[known]] == unique[known]
+        self._seen = np.insert(self._seen, positions[~known], unique[~known])
+
+        new = np.zeros(len(hashes), dtype=bool)
+        new[first[~known]] = True
+        return new
+
+    def report(self):
+        return {
+            "total": self.total,
+            "kept": self.kept,
+            "rejected": self.total - self.kept,
+            "rejections": dict(self.rejections),
+            "repaired_spans": self.repaired_spans,
+            "dropped_answers": self.dropped_answers,
+        }
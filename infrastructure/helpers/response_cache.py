@@ -0,0 +1,155 @@
+import re
+import sys
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+import numpy as np
+
+_PUNCTUATION_RE = re.compile(r"[¿?¡!.,;:\"'()]")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_query(query):
+    """
+    Normaliza una consulta para la búsqueda exacta: minúsculas, sin signos
+    de puntuación y con los espacios colapsados.
+    """
+    query = unicodedata.normalize("NFKC", query).casefold()
+    query = _PUNCTUATION_RE.sub(" ", query)
+    return _WHITESPACE_RE.sub(" ", query).strip()
+
+
+class SemanticResponseCache:
+    """
+    Caché de respuestas con aciertos exactos (texto normalizado) y aciertos
+    por cercanía (similitud coseno entre embeddings de la consulta).
+    Expulsa por LRU, por TTL y por un límite aproximado de memoria.
+    `namespace` separa las respuestas de corpus distintos (p. ej. "2021/es"):
+    una consulta solo acierta contra entradas de su mismo namespace.
+    """
+
+    def __init__(self, max_entries=1024, ttl_seconds=3600, similarity_threshold=0.95, max_bytes=64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.max_bytes = max_bytes
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self._matrix = None
+        self._matrix_keys = []
+        self._matrix_namespaces = None
+
+        self.exact_hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_exact(self, query, namespace=""):
+        key = self._key(query, namespace)
+        with self._lock:
+            entry = self._get_entry(key)
+            if entry is not None:
+                self.exact_hits += 1
+                return entry["value"]
+        return None
+
+    def get_similar(self, embedding, namespace=""):
+        """
+        Busca la entrada cuyo embedding sea más parecido a `embedding`. Cuenta
+        un fallo si ninguna supera el umbral de similitud.
+        """
+        query_vector = self._normalize_vector(embedding)
+        with self._lock:
+            if self._entries and self.similarity_threshold < 1.0:
+                if self._matrix is None:
+                    self._matrix_keys = list(self._entries)
+                    self._matrix = np.stack([self._entries[key]["embedding"] for key in self._matrix_keys])
+                    self._matrix_namespaces = np.array(
+                        [self._entries[key]["namespace"] for key in self._matrix_keys], dtype=object
+                    )
+                similarities = np.where(self._matrix_namespaces == namespace, self._matrix @ query_vector, -np.inf)
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.similarity_threshold:
+                    entry = self._get_entry(self._matrix_keys[best])
+                    if entry is not None:
+                        self.similar_hits += 1
+                        return entry["value"]
+            self.misses += 1
+        return None
+
+    def put(self, query, embedding, value, namespace=""):
+        key = self._key(query, namespace)
+        vector = self._normalize_vector(embedding)
+        size = sys.getsizeof(key) + vector.nbytes + sum(sys.getsizeof(v) for v in value.values())
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = {
+                "value": value,
+                "embedding": vector,
+                "namespace": namespace,
+                "created_at": time.time(),
+                "size": size,
+            }
+            self._bytes += size
+            self._matrix = None
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def clear(self, namespace=None):
+        """
+        Vacía la caché, o solo las entradas de `namespace` si se indica.
+        """
+        with self._lock:
+            if namespace is None:
+                self._entries.clear()
+                self._bytes = 0
+                self._matrix = None
+                return
+            for key in [key for key, entry in self._entries.items() if entry["namespace"] == namespace]:
+                self._remove(key)
+
+    def stats(self):
+        hits = self.exact_hits + self.similar_hits
+        lookups = hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "exact_hits": self.exact_hits,
+            "similar_hits": self.similar_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": hits / lookups if lookups else 0.0,
+        }
+
+    @staticmethod
+    def _key(query, namespace):
+        key = normalize_query(query)
+        return f"{namespace}\x00{key}" if namespace else key
+
+    def _get_entry(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if self.ttl_seconds and time.time() - entry["created_at"] > self.ttl_seconds:
+            self._remove(key)
+            self.evictions += 1
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self._bytes -= entry["size"]
+        self._matrix = None
+
+    @staticmethod
+    def _normalize_vector(embedding):
+        vector = np.asarray(embedding, dtype=np.float32).ravel()
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
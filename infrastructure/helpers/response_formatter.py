@@ -1,4 +1,32 @@
 import time
+from threading import Event, Thread
+
+import torch
+from transformers import StoppingCriteriaList, TextIteratorStreamer
+
+from infrastructure.helpers.early_stopping import STOP_SEQUENCES, StopOnEvent, with_stopping_criteria, with_token_counter
+from infrastructure.helpers.metrics import stage
+from infrastructure.helpers.token_store import text_ids
+
+# Parámetros de generación compartidos por todos los caminos de inferencia
+GENERATION_KWARGS = {"max_new_tokens": 80, "do_sample": True, "temperature": 1}
+# Decodificación voraz: la misma consulta y contexto producen siempre la misma respuesta
+DETERMINISTIC_GENERATION_KWARGS = {"max_new_tokens": 80, "do_sample": False}
+
+
+class _CountingStreamer(TextIteratorStreamer):
+    """
+    Streamer que además cuenta los tokens generados (sin contar el prompt).
+    """
+
+    def __init__(self, tokenizer, **kwargs):
+        super().__init__(tokenizer, **kwargs)
+        self.token_count = 0
+
+    def put(self, value):
+        if not (self.skip_prompt and self.next_tokens_are_prompt):
+            self.token_count += value.numel()
+        super().put(value)
 
 
 def truncate_to_last_sentence(text):
@@ -8,35 +36,252 @@ def truncate_to_last_sentence(text):
     return text
 
 
-def generate_response(query, context, text_gen_pipeline):
+def build_prompt_parts(query, context, layout="query_first"):
     """
-    Genera una respuesta usando el modelo fine-tuned.
-    Retorna (response, inference_time).
+    Divide el prompt en (prefijo, sufijo), donde el prefijo no depende de la
+    consulta y por lo tanto se puede reutilizar entre peticiones. El corte
+    nunca deja un espacio al final del prefijo: el tokenizer pega el espacio a
+    la palabra siguiente, así que tokenizar las partes por separado daría otros
+    ids que el prompt entero.
+    - query_first: formato original del fine-tuning; el prefijo es solo "Pregunta:".
+    - context_first: el contexto va primero, así que el prefijo incluye los
+      pasajes recuperados y se repite entre consultas con el mismo contexto.
     """
-    try:
-
-        prompt = (
-            f"Pregunta: {query}\n"
-            f"Contexto: {context}\n\n"
+    if layout == "context_first":
+        return (
+            f"Contexto:\n{context}\n\n",
+            f"Pregunta: {query}\n\n"
             "Respuesta:"
         )
+    return (
+        "Pregunta:",
+        f" {query}\n"
+        f"Contexto: {context}\n\n"
+        "Respuesta:"
+    )
+
+
+def build_prompt(query, context, layout="query_first"):
+    return "".join(build_prompt_parts(query, context, layout))
+
+
+def build_prefix_ids(context_ids, tokenizer, layout="query_first"):
+    """
+    Ids de tokens del prefijo del prompt armados concatenando los ids de la
+    plantilla con los del contexto (ya tokenizado en el almacén de tokens),
+    sin volver a tokenizar el texto del contexto.
+    """
+    marker = "\x00"
+    before, found, after = build_prompt_parts("", marker, layout)[0].partition(marker)
+    if not found:
+        # El prefijo no incluye el contexto (query_first)
+        return list(text_ids(tokenizer, before))
+    return list(text_ids(tokenizer, before)) + [int(token) for token in context_ids] + list(text_ids(tokenizer, after))
+
+
+def extract_response(raw_response, prompt=None):
+    """
+    Se queda con el texto generado después de 'Respuesta:', lo corta donde el
+    modelo empieza a repetir un bloque 'Pregunta:' y luego en la última
+    oración completa. Con `prompt` se toma exactamente lo generado a
+    continuación; así cortar la generación en 'Pregunta:' no cambia el resultado.
+    """
+    if prompt is not None and raw_response.startswith(prompt):
+        response = raw_response[len(prompt):]
+    elif "Respuesta:" in raw_response:
+        response = raw_response.split("Respuesta:")[-1]
+    else:
+        response = raw_response
+
+    for sequence in STOP_SEQUENCES:
+        response = response.split(sequence, 1)[0]
+    return truncate_to_last_sentence(response.strip())
+
+
+def run_pipeline_batch(prompts, text_gen_pipeline, **generation_kwargs):
+    """
+    Ejecuta varios prompts en un solo lote con padding sobre el pipeline de texto.
+    Retorna un resultado por prompt, con el mismo formato que una llamada individual.
+    Las opciones de corte temprano se convierten acá en stopping criteria, y
+    cada resultado lleva en "generated_tokens" los tokens que generó.
+    """
+    tokenizer = getattr(text_gen_pipeline, "tokenizer", None)
+    generation_kwargs, counter = with_token_counter(generation_kwargs, tokenizer)
+    results = text_gen_pipeline(prompts, batch_size=len(prompts), **generation_kwargs)
+    if counter is not None:
+        for result, count in zip(results, counter.counts):
+            result[0]["generated_tokens"] = count
+    return results
+
+
+def generate_response(query, context, text_gen_pipeline, generation_kwargs=None, prompt_layout="query_first"):
+    """
+    Genera una respuesta usando el modelo fine-tuned.
+    Retorna (response, inference_time, tokens_generated); `tokens_generated`
+    es None si el pipeline no lo informa.
+    """
+    try:
+        prompt = build_prompt(query, context, prompt_layout)
+        generation_kwargs = generation_kwargs or GENERATION_KWARGS
+        # El scheduler de micro-batching no tiene tokenizer: los criterios se arman al ejecutar el lote
+        tokenizer = getattr(text_gen_pipeline, "tokenizer", None)
+        counter = None
+        if tokenizer is not None:
+            # La generación asistida acepta varios tokens por paso: el largo del prompt se mide acá
+            length = None
+            if generation_kwargs.get("assistant_model") is not None:
+                length = len(tokenizer(prompt)["input_ids"])
+            generation_kwargs, counter = with_token_counter(generation_kwargs, tokenizer, length)
 
         start_time = time.time()
 
-        result = text_gen_pipeline(prompt, max_new_tokens=80, do_sample=True, temperature=1)
+        result = text_gen_pipeline(prompt, **generation_kwargs)
         raw_response = result[0]["generated_text"]
+        # Detrás del scheduler el conteo viene en el resultado de run_pipeline_batch
+        tokens_generated = result[0].get("generated_tokens")
+        if counter is not None and counter.counts:
+            tokens_generated = counter.counts[0]
 
         end_time = time.time()
         inference_time = end_time - start_time
 
-        if "Respuesta:" in raw_response:
-            response = raw_response.split("Respuesta:")[-1].strip()
-        else:
-            response = raw_response.strip()
-
-        response = truncate_to_last_sentence(response)
-        return response, inference_time
+        with stage("formatting"):
+            response = extract_response(raw_response, prompt)
+        return response, inference_time, tokens_generated
 
     except Exception as e:
         print(f"Error generando la respuesta: {str(e)}")
         raise
+
+
+def generate_response_with_prefix_cache(query, context, model, tokenizer, prefix_cache, generation_kwargs=None,
+                                        prompt_layout="query_first", prefix_ids=None):
+    """
+    Genera la respuesta reutilizando los key-values ya calculados del prefijo
+    del prompt (plantilla + contexto) cuando están en `prefix_cache`, de modo
+    que el modelo solo hace el prefill del sufijo. `prefix_ids` son los ids
+    del prefijo ya tokenizado, si se tienen de antes.
+    Retorna (response, inference_time, tokens_generated).
+    """
+    try:
+        prefix, suffix = build_prompt_parts(query, context, prompt_layout)
+        if prefix_ids is None:
+            prefix_ids = tokenizer(prefix, add_special_tokens=False)["input_ids"]
+        suffix_ids = tokenizer(suffix, add_special_tokens=False)["input_ids"]
+        input_ids = torch.tensor([prefix_ids + suffix_ids])
+
+        start_time = time.time()
+
+        past_key_values = prefix_cache.get(prefix_ids)
+        output = model.generate(
+            input_ids=input_ids,
+            attention_mask=torch.ones_like(input_ids),
+            past_key_values=past_key_values,
+            pad_token_id=tokenizer.pad_token_id,
+            **with_stopping_criteria(generation_kwargs or GENERATION_KWARGS, tokenizer, input_ids.shape[1])
+        )
+        tokens_generated = output.shape[1] - input_ids.shape[1]
+        generated = tokenizer.decode(output[0][input_ids.shape[1]:], skip_special_tokens=True)
+
+        inference_time = time.time() - start_time
+
+        with stage("formatting"):
+            response = extract_response(prefix + suffix + generated, prefix + suffix)
+        return response, inference_time, tokens_generated
+
+    except Exception as e:
+        print(f"Error generando la respuesta con caché de prefijos: {str(e)}")
+        raise
+
+
+def generate_responses_batch(queries, contexts, text_gen_pipeline, batch_size=8, generation_kwargs=None,
+                             prompt_layout="query_first"):
+    """
+    Genera las respuestas de varias consultas en lotes de `batch_size` prompts.
+    Retorna una lista alineada con `queries` donde cada elemento es
+    (response, inference_time, tokens_generated) o la excepción que falló en su lote.
+    """
+    prompts = [build_prompt(query, context, prompt_layout) for query, context in zip(queries, contexts)]
+    generation_kwargs = generation_kwargs or GENERATION_KWARGS
+    outputs = [None] * len(prompts)
+
+    for start in range(0, len(prompts), batch_size):
+        chunk = prompts[start:start + batch_size]
+        start_time = time.time()
+        try:
+            results = run_pipeline_batch(chunk, text_gen_pipeline, **generation_kwargs)
+            inference_time = time.time() - start_time
+            for offset, result in enumerate(results):
+                response = extract_response(result[0]["generated_text"], chunk[offset])
+                outputs[start + offset] = (response, inference_time, result[0].get("generated_tokens"))
+        except Exception as e:
+            print(f"Error generando el lote {start}-{start + len(chunk)}: {str(e)}")
+            for offset in range(len(chunk)):
+                outputs[start + offset] = e
+
+    return outputs
+
+
+def generate_response_stream(query, context, model, tokenizer, generation_kwargs=None, timeout=60,
+                             prompt_layout="query_first", prefix_ids=None):
+    """
+    Genera la respuesta emitiendo los fragmentos de texto a medida que el modelo
+    los produce. Cada evento es un dict: {"event": "token", "text": ...} por
+    fragmento y un evento final "end" con la respuesta ya limpia, el tiempo
+    hasta el primer token y los tokens por segundo. Con `prefix_ids` solo se
+    tokeniza el sufijo del prompt. Si el generador se cierra antes de terminar
+    (el cliente se desconectó), la generación se detiene en el siguiente paso.
+    """
+    prefix, suffix = build_prompt_parts(query, context, prompt_layout)
+    prompt = prefix + suffix
+    if prefix_ids is None:
+        inputs = tokenizer(prompt, return_tensors="pt")
+    else:
+        input_ids = torch.tensor([list(prefix_ids) + tokenizer(suffix, add_special_tokens=False)["input_ids"]])
+        inputs = {"input_ids": input_ids, "attention_mask": torch.ones_like(input_ids)}
+    streamer = _CountingStreamer(tokenizer, skip_prompt=True, skip_special_tokens=True, timeout=timeout)
+    errors = []
+    cancelled = Event()
+    kwargs = with_stopping_criteria(generation_kwargs or GENERATION_KWARGS, tokenizer, inputs["input_ids"].shape[1])
+    kwargs["stopping_criteria"] = StoppingCriteriaList(
+        [*kwargs.get("stopping_criteria", []), StopOnEvent(cancelled)]
+    )
+
+    def _generate():
+        try:
+            model.generate(**inputs, streamer=streamer, pad_token_id=tokenizer.pad_token_id, **kwargs)
+        except Exception as e:
+            errors.append(e)
+            streamer.end()
+
+    start_time = time.time()
+    first_token_time = None
+    generated = []
+
+    thread = Thread(target=_generate, daemon=True)
+    thread.start()
+    try:
+        for text in streamer:
+            if not text:
+                continue
+            if first_token_time is None:
+                first_token_time = time.time() - start_time
+            generated.append(text)
+            yield {"event": "token", "text": text}
+    finally:
+        cancelled.set()
+    thread.join()
+
+    if errors:
+        print(f"Error generando la respuesta en streaming: {str(errors[0])}")
+        raise errors[0]
+
+    inference_time = time.time() - start_time
+    yield {
+        "event": "end",
+        "response": extract_response(prompt + "".join(generated), prompt),
+        "time": inference_time,
+        "time_to_first_token": first_token_time if first_token_time is not None else inference_time,
+        "tokens_generated": streamer.token_count,
+        "tokens_per_second": streamer.token_count / inference_time if inference_time > 0 else 0.0,
+    }
@@ -0,0 +1,50 @@
+import numpy as np
+
+from infrastructure.helpers.bm25_retriever import tokenize
+
+# Palabras vacías frecuentes que no aportan a la coincidencia de contenido
+_STOPWORDS = frozenset("""
+a al como con de del el en es la las lo los o para por que se su sus un una y
+the of to and in is for on with by or an be that this are as
+""".split())
+
+
+def _content_terms(text):
+    return {term for term in tokenize(text) if term not in _STOPWORDS and len(term) > 2}
+
+
+def relevance_matrix(expected_answers, passages, min_overlap=0.3):
+    """
+    Matriz booleana (consultas x pasajes) que marca un pasaje como relevante
+    si contiene al menos `min_overlap` de los términos de contenido de la
+    respuesta esperada. Los conjuntos de prueba no traen ids de pasajes, así
+    que este solapamiento es el criterio de relevancia.
+    """
+    vocabulary = {}
+    expected_terms = [_content_terms(answer) for answer in expected_answers]
+    passage_terms = [_content_terms(passage or "") for passage in passages]
+    for terms in expected_terms + passage_terms:
+        for term in terms:
+            vocabulary.setdefault(term, len(vocabulary))
+
+    def _binary(term_sets):
+        matrix = np.zeros((len(term_sets), max(len(vocabulary), 1)), dtype=np.float32)
+        for row, terms in enumerate(term_sets):
+            matrix[row, [vocabulary[term] for term in terms]] = 1.0
+        return matrix
+
+    expected_matrix = _binary(expected_terms)
+    passage_matrix = _binary(passage_terms)
+    overlap = expected_matrix @ passage_matrix.T
+    sizes = np.maximum(expected_matrix.sum(axis=1, keepdims=True), 1.0)
+    return overlap / sizes >= min_overlap
+
+
+def hit_rate_at_k(indices, relevant, k):
+    """
+    Fracción de consultas con al menos un pasaje relevante entre sus primeros `k` ids.
+    """
+    top = np.asarray(indices)[:, :k]
+    valid = top >= 0
+    hits = np.take_along_axis(relevant, np.where(valid, top, 0), axis=1) & valid
+    return hits.any(axis=1)
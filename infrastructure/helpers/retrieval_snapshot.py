@@ -0,0 +1,150 @@
+import threading
+
+import faiss
+import numpy as np
+
+from infrastructure.helpers.bm25_retriever import BM25Retriever
+from infrastructure.helpers.context_utils import corpus_contents
+
+
+class RetrievalSnapshot:
+    """
+    Versión inmutable de todo lo que usa la recuperación: índice FAISS,
+    corpus, contenidos, BM25 y TF-IDF. Una petición toma el snapshot vigente
+    al empezar y lo usa hasta el final, aunque en el medio se publique otro.
+    Los documentos borrados quedan como None en el corpus para que los ids
+    del índice no cambien. `embedding_model` es el modelo con el que se
+    construyó el índice y con el que hay que codificar las consultas.
+    `token_store` tiene los tokens precalculados de cada documento y
+    `token_overrides` ({id: ids}) los de los documentos que cambiaron después.
+    """
+
+    def __init__(self, version, faiss_index, processed_data, contents=None, bm25_retriever=None, tfidf_index=None,
+                 embedding_model=None, token_store=None, token_overrides=None):
+        self.version = version
+        self.embedding_model = embedding_model
+        self.faiss_index = faiss_index
+        self.processed_data = processed_data
+        self.contents = corpus_contents(processed_data) if contents is None else contents
+        self.bm25_retriever = bm25_retriever
+        self.tfidf_index = tfidf_index
+        self.token_store = token_store
+        self.token_overrides = token_overrides or {}
+
+    @property
+    def doc_count(self):
+        return len(self.processed_data)
+
+    @property
+    def live_count(self):
+        return int(self.faiss_index.ntotal)
+
+    def stats(self):
+        return {
+            "version": self.version,
+            "doc_count": self.doc_count,
+            "live_count": self.live_count,
+            "index_type": type(self.faiss_index).__name__,
+            "hybrid": self.bm25_retriever is not None,
+            "embedding_model": self.embedding_model,
+            "token_store": self.token_store is not None,
+        }
+
+
+class SnapshotReference:
+    """
+    Referencia read-copy-update al snapshot vigente. Los lectores solo leen
+    el atributo (sin lock); los escritores se serializan con `write_lock`,
+    construyen una copia modificada y la publican con `publish`.
+    """
+
+    def __init__(self, snapshot):
+        self._snapshot = snapshot
+        self.write_lock = threading.Lock()
+
+    @property
+    def current(self):
+        return self._snapshot
+
+    def publish(self, snapshot):
+        previous, self._snapshot = self._snapshot, snapshot
+        return previous
+
+
+def _reconstruct_all(index):
+    try:
+        return index.reconstruct_n(0, index.ntotal)
+    except RuntimeError:
+        # Los índices IVF necesitan el mapa directo para reconstruir por id
+        faiss.extract_index_ivf(index).make_direct_map()
+        return index.reconstruct_n(0, index.ntotal)
+
+
+def mutable_index_copy(index):
+    """
+    Copia del índice envuelta en IndexIDMap2, que admite agregar con ids
+    explícitos y borrar por id. Un índice con ids implícitos (0..n-1) se
+    convierte reconstruyendo sus vectores sobre un índice vacío del mismo tipo.
+    """
+    if isinstance(index, (faiss.IndexIDMap, faiss.IndexIDMap2)):
+        return faiss.downcast_index(faiss.clone_index(index))
+
+    vectors = _reconstruct_all(index)
+    base = faiss.downcast_index(faiss.clone_index(index))
+    base.reset()
+    id_map = faiss.IndexIDMap2(base)
+    id_map.add_with_ids(vectors, np.arange(index.ntotal, dtype=np.int64))
+    return id_map
+
+
+def apply_passage_changes(snapshot, upserts=None, upsert_embeddings=None, deletes=(), hybrid=True,
+                          upsert_token_ids=None):
+    """
+    Retorna un snapshot nuevo con los cambios aplicados sobre copias del
+    corpus y del índice; el snapshot original no se modifica.
+    - upserts: {id: entrada}; un id igual a la cantidad de documentos agrega al final.
+    - upsert_embeddings: embeddings de las entradas en el mismo orden que `upserts`.
+    - deletes: ids a borrar (quedan como None en el corpus).
+    - upsert_token_ids: tokens de las entradas en el mismo orden que `upserts`,
+      si el snapshot tiene almacén de tokens.
+    """
+    upserts = upserts or {}
+    index = mutable_index_copy(snapshot.faiss_index)
+    processed_data = [snapshot.processed_data[position] for position in range(snapshot.doc_count)]
+
+    changed_ids = np.asarray(list(upserts) + list(deletes), dtype=np.int64)
+    if changed_ids.size:
+        try:
+            index.remove_ids(changed_ids)
+        except RuntimeError as e:
+            raise ValueError(
+                f"El índice {type(faiss.downcast_index(index.index)).__name__} no admite borrar documentos; "
+                "hay que reconstruirlo con scripts/build_faiss_index.py y recargarlo."
+            ) from e
+
+    for doc_id in deletes:
+        if 0 <= doc_id < len(processed_data):
+            processed_data[doc_id] = None
+    for doc_id, entry in upserts.items():
+        if doc_id == len(processed_data):
+            processed_data.append(entry)
+        else:
+            processed_data[doc_id] = entry
+    if upserts:
+        index.add_with_ids(
+            np.ascontiguousarray(upsert_embeddings, dtype=np.float32), np.asarray(list(upserts), dtype=np.int64)
+        )
+
+    token_overrides = dict(snapshot.token_overrides)
+    if upsert_token_ids is not None:
+        token_overrides.update(
+            (doc_id, np.asarray(ids, dtype=np.int32)) for doc_id, ids in zip(upserts, upsert_token_ids)
+        )
+
+    contents = corpus_contents(processed_data)
+    bm25_retriever = BM25Retriever(list(contents)) if hybrid else None
+    # El índice TF-IDF calcula al vuelo las secciones que no conoce, así que se reutiliza
+    return RetrievalSnapshot(
+        snapshot.version + 1, index, processed_data, contents, bm25_retriever, snapshot.tfidf_index,
+        snapshot.embedding_model, snapshot.token_store, token_overrides
+    )
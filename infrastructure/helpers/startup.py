@@ -0,0 +1,90 @@
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+
+class StartupProgress:
+    """
+    Progreso del arranque del servicio: qué artefactos faltan, cuáles se
+    están cargando y cuánto tardó cada uno. Alimenta `/health/ready` y el
+    reporte de arranque que se imprime al terminar. Una vez terminado el
+    arranque, las cargas posteriores (p. ej. un corpus bajo demanda) ya no se registran.
+    """
+
+    def __init__(self):
+        self.started_at = time.time()
+        self.finished_at = None
+        self.error = None
+        self._steps = OrderedDict()
+        self._lock = threading.Lock()
+
+    def expect(self, names):
+        """
+        Registra como pendientes los pasos que se van a ejecutar, para poder reportar el avance.
+        """
+        with self._lock:
+            for name in names:
+                self._steps.setdefault(name, {"status": "pending", "seconds": None})
+
+    @contextmanager
+    def step(self, name):
+        if self.finished_at is not None:
+            yield
+            return
+        start_time = time.time()
+        with self._lock:
+            self._steps[name] = {"status": "loading", "seconds": None, "started": start_time - self.started_at}
+        try:
+            yield
+        except BaseException:
+            with self._lock:
+                self._steps[name].update(status="failed", seconds=time.time() - start_time)
+            raise
+        with self._lock:
+            self._steps[name].update(status="ready", seconds=time.time() - start_time)
+
+    def finish(self, error=None):
+        self.error = None if error is None else str(error)
+        self.finished_at = time.time()
+
+    @property
+    def ready(self):
+        return self.finished_at is not None and self.error is None
+
+    @property
+    def status(self):
+        if self.finished_at is None:
+            return "loading"
+        return "failed" if self.error is not None else "ready"
+
+    def report(self):
+        with self._lock:
+            steps = {name: dict(step) for name, step in self._steps.items()}
+        done = sum(step["status"] == "ready" for step in steps.values())
+        end = self.finished_at or time.time()
+        return {
+            "status": self.status,
+            "elapsed": end - self.started_at,
+            "completed": done,
+            "total": len(steps),
+            "error": self.error,
+            "steps": steps,
+        }
+
+    def summary(self):
+        """
+        Tabla con el tiempo de cada paso, del más lento al más rápido. Los pasos
+        corren en paralelo, así que la suma puede superar el tiempo total.
+        """
+        report = self.report()
+        lines = [f"Arranque {report['status']} en {report['elapsed']:.2f}s:"]
+        steps = sorted(report["steps"].items(), key=lambda item: -(item[1]["seconds"] or 0.0))
+        for name, step in steps:
+            seconds = f"{step['seconds']:.2f}s" if step["seconds"] is not None else "-"
+            lines.append(f"  {name:<24}{seconds:>10}  {step['status']}")
+        return "\n".join(lines)
+
+
+# Progreso compartido del arranque del proceso
+STARTUP = StartupProgress()
@@ -0,0 +1,56 @@
+import re
+import time
+
+STUB_BACKEND = "stub"
+
+_STUB_SENTENCES = (
+    "Es una vulnerabilidad que permite a un atacante acceder a recursos sin autorización.",
+    "Se mitiga validando las entradas y aplicando el principio de mínimo privilegio.",
+    "Conviene revisar la configuración y registrar los eventos de seguridad relevantes.",
+)
+
+
+class StubTokenizer:
+    """
+    Tokenizer por palabras con la interfaz mínima que usa el servicio
+    (`__call__` con `input_ids`). Sirve para medir sin descargar el modelo.
+    """
+
+    name_or_path = STUB_BACKEND
+    padding_side = "left"
+    pad_token_id = 0
+
+    def __call__(self, texts, add_special_tokens=False, **kwargs):
+        if isinstance(texts, str):
+            return {"input_ids": self._encode(texts)}
+        return {"input_ids": [self._encode(text) for text in texts]}
+
+    @staticmethod
+    def _encode(text):
+        return [hash(token) & 0x7FFFFFFF for token in re.findall(r"\w+|[^\w\s]", text)]
+
+
+class StubTextGenerationPipeline:
+    """
+    Reemplazo del pipeline "text-generation" que responde un texto fijo tras
+    esperar `ms_per_token` por token, sin cargar el modelo. Un lote espera lo
+    mismo que un prompt suelto, como la generación en lote real.
+    """
+
+    def __init__(self, ms_per_token=20.0, max_new_tokens=80):
+        self.ms_per_token = ms_per_token
+        self.max_new_tokens = max_new_tokens
+        self.calls = 0
+
+    def __call__(self, prompts, batch_size=None, **generation_kwargs):
+        self.calls += 1
+        tokens = generation_kwargs.get("max_new_tokens", self.max_new_tokens)
+        time.sleep(tokens * self.ms_per_token / 1000.0)
+
+        if isinstance(prompts, str):
+            return [{"generated_text": prompts + self._completion(), "generated_tokens": tokens}]
+        return [[{"generated_text": prompt + self._completion(), "generated_tokens": tokens}] for prompt in prompts]
+
+    @staticmethod
+    def _completion():
+        return " " + " ".join(_STUB_SENTENCES)
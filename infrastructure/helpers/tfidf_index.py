@@ -0,0 +1,128 @@
+import os
+import pickle
+
+import numpy as np
+from scipy.sparse import vstack
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from infrastructure.helpers.corpus_store import corpus_fingerprint
+
+
+def count_tokens(texts, tokenizer=None):
+    """
+    Cantidad de tokens de cada texto. Con tokenizer se cuentan tokens reales
+    del modelo; sin él, palabras separadas por espacios.
+    """
+    if not texts:
+        return np.zeros(0, dtype=np.int64)
+    if tokenizer is None:
+        return np.array([len(text.split()) for text in texts], dtype=np.int64)
+    encoded = tokenizer(list(texts), add_special_tokens=False)["input_ids"]
+    return np.array([len(ids) for ids in encoded], dtype=np.int64)
+
+
+def split_sections(texts):
+    """
+    Secciones (líneas no vacías) únicas de una lista de textos, en orden de aparición.
+    """
+    return list(dict.fromkeys(
+        section for text in texts for section in text.split("\n") if section.strip()
+    ))
+
+
+class TfidfSectionIndex:
+    """
+    Vocabulario e IDF ajustados una sola vez sobre el corpus, con el vector
+    disperso y la cantidad de tokens de cada sección ya calculados. Truncar
+    un contexto se reduce a un producto disperso y una selección top-k.
+    """
+
+    def __init__(self, vectorizer, sections, section_matrix, token_counts, tokenizer_name=None, corpus_size=None,
+                 content_hash=None):
+        self.vectorizer = vectorizer
+        self.corpus_size = corpus_size
+        self.content_hash = content_hash
+        self.section_matrix = section_matrix
+        self.token_counts = token_counts
+        self.tokenizer_name = tokenizer_name
+        self._positions = {section: position for position, section in enumerate(sections)}
+
+    @classmethod
+    def fit(cls, texts, tokenizer=None):
+        sections = split_sections(texts)
+        vectorizer = TfidfVectorizer()
+        section_matrix = vectorizer.fit_transform(sections).tocsr()
+        token_counts = count_tokens(sections, tokenizer)
+        return cls(
+            vectorizer, sections, section_matrix, token_counts, _tokenizer_name(tokenizer), len(texts),
+            corpus_fingerprint(texts)
+        )
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            return pickle.load(f)
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "wb") as f:
+            pickle.dump(self, f)
+
+    def __len__(self):
+        return len(self._positions)
+
+    def matches(self, texts, tokenizer=None):
+        """
+        Indica si el índice guardado corresponde al corpus (`texts`, comparado
+        por hash del contenido) y al tokenizer actuales.
+        """
+        return (
+            self.corpus_size == len(texts)
+            and self.tokenizer_name == _tokenizer_name(tokenizer)
+            # Los índices guardados antes de registrar el hash se reconstruyen
+            and getattr(self, "content_hash", None) == corpus_fingerprint(texts)
+        )
+
+    def vectors_and_counts(self, sections, tokenizer=None):
+        """
+        Vectores TF-IDF y cantidad de tokens de cada sección. Las secciones
+        que no estaban en el corpus se transforman con el vocabulario ya ajustado.
+        """
+        positions = [self._positions.get(section) for section in sections]
+        unknown = [row for row, position in enumerate(positions) if position is None]
+        if not unknown:
+            return self.section_matrix[positions], self.token_counts[positions]
+
+        unknown_sections = [sections[row] for row in unknown]
+        rows = []
+        counts = np.empty(len(sections), dtype=np.int64)
+        unknown_matrix = self.vectorizer.transform(unknown_sections)
+        unknown_counts = count_tokens(unknown_sections, tokenizer)
+        unknown_rows = {row: offset for offset, row in enumerate(unknown)}
+        for row, position in enumerate(positions):
+            if position is None:
+                rows.append(unknown_matrix[unknown_rows[row]])
+                counts[row] = unknown_counts[unknown_rows[row]]
+            else:
+                rows.append(self.section_matrix[position])
+                counts[row] = self.token_counts[position]
+        return vstack(rows).tocsr(), counts
+
+    def select(self, sections, query, max_tokens=512, tokenizer=None):
+        """
+        Ordena las secciones por similitud con la consulta y se queda con las
+        primeras mientras entren en el presupuesto de tokens.
+        """
+        section_vectors, counts = self.vectors_and_counts(sections, tokenizer)
+        query_vector = self.vectorizer.transform([query])
+        similarities = section_vectors.dot(query_vector.T).toarray().ravel()
+
+        order = np.argsort(similarities)[::-1]
+        within_budget = np.cumsum(counts[order]) <= max_tokens
+        return [sections[position] for position in order[within_budget]]
+
+
+def _tokenizer_name(tokenizer):
+    if tokenizer is None:
+        return None
+    return getattr(tokenizer, "name_or_path", type(tokenizer).__name__)
@@ -0,0 +1,199 @@
+import json
+import os
+import re
+from functools import lru_cache
+
+import numpy as np
+
+from infrastructure.helpers.corpus_store import corpus_fingerprint
+
+TOKENS_SUFFIX = ".tokens.npy"
+TOKEN_OFFSETS_SUFFIX = ".token_offsets.npy"
+TOKEN_META_SUFFIX = ".tokens.json"
+
+# Límites de sección: saltos de línea y fin de oración
+_SECTION_SPLIT_RE = re.compile(r"\n+|(?<=[.!?])\s+")
+
+
+def tokenizer_name(tokenizer):
+    return getattr(tokenizer, "name_or_path", type(tokenizer).__name__)
+
+
+@lru_cache(maxsize=64)
+def text_ids(tokenizer, text):
+    """
+    Ids de tokens de un texto fijo (plantilla del prompt, separadores), calculados una sola vez.
+    """
+    return tuple(tokenizer(text, add_special_tokens=False)["input_ids"])
+
+
+def token_store_exists(base_path):
+    return all(os.path.exists(base_path + suffix) for suffix in (TOKENS_SUFFIX, TOKEN_OFFSETS_SUFFIX, TOKEN_META_SUFFIX))
+
+
+def _section_spans(text):
+    """
+    Posiciones (inicio, fin) de las secciones no vacías de `text`.
+    """
+    spans, start = [], 0
+    for match in _SECTION_SPLIT_RE.finditer(text):
+        spans.append((start, match.start()))
+        start = match.end()
+    spans.append((start, len(text)))
+    return [(start, end) for start, end in spans if text[start:end].strip()]
+
+
+def chunk_text(text, tokenizer, max_tokens):
+    """
+    Divide un texto en fragmentos de como mucho `max_tokens` tokens, juntando
+    oraciones y líneas completas. Cada fragmento es un tramo del texto
+    original, con sus separadores, y su largo se verifica tokenizándolo entero
+    (los tokens de las secciones sueltas no suman lo mismo que los del tramo).
+    Una sección que sola supera el límite se corta en ventanas de `max_tokens` tokens.
+    """
+    spans = _section_spans(text)
+    if not spans:
+        return []
+    counts = [
+        len(ids) for ids in tokenizer([text[start:end] for start, end in spans], add_special_tokens=False)["input_ids"]
+    ]
+
+    def token_count(start, end):
+        return len(tokenizer(text[start:end].strip(), add_special_tokens=False)["input_ids"])
+
+    chunks, current = [], None
+    for (start, end), count in zip(spans, counts):
+        if count > max_tokens:
+            if current:
+                chunks.append(text[current[0]:current[1]].strip())
+                current = None
+            ids = tokenizer(text[start:end], add_special_tokens=False)["input_ids"]
+            chunks.extend(
+                tokenizer.decode(ids[offset:offset + max_tokens]).strip() for offset in range(0, len(ids), max_tokens)
+            )
+            continue
+        if current and token_count(current[0], end) <= max_tokens:
+            current = (current[0], end)
+            continue
+        if current:
+            chunks.append(text[current[0]:current[1]].strip())
+        current = (start, end)
+    if current:
+        chunks.append(text[current[0]:current[1]].strip())
+    return chunks
+
+
+def chunk_corpus(entries, tokenizer, max_tokens):
+    """
+    Divide cada entrada del corpus en fragmentos acotados en tokens. Cada
+    fragmento conserva los campos de su entrada (categoría, idioma, etc.) y
+    agrega `source_id` (posición de la entrada original) y `chunk`.
+    Retorna (fragmentos, ids de tokens de cada fragmento).
+    """
+    chunks = []
+    for source_id, entry in enumerate(entries):
+        if entry is None:
+            continue
+        text = entry.get("content", "") or entry.get("context", "")
+        fields = {key: value for key, value in entry.items() if key not in ("content", "context")}
+        for position, chunk in enumerate(chunk_text(text, tokenizer, max_tokens)):
+            chunks.append({**fields, "content": chunk, "source_id": source_id, "chunk": position})
+    token_ids = tokenizer([chunk["content"] for chunk in chunks], add_special_tokens=False)["input_ids"] if chunks else []
+    return chunks, token_ids
+
+
+def write_token_store(token_ids, base_path, tokenizer_id, content_hash):
+    """
+    Escribe los ids de tokens de cada documento en formato compacto: todos
+    los ids concatenados (int32) y una tabla de offsets (int64, n + 1), igual
+    que el corpus compacto. Un JSON al lado registra el tokenizer usado
+    (`tokenizer_id`, ver `tokenizer_name`) y el hash del texto tokenizado
+    (`content_hash`, ver `corpus_fingerprint`).
+    """
+    offsets = np.zeros(len(token_ids) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(ids) for ids in token_ids])
+    tokens = np.fromiter((token for ids in token_ids for token in ids), dtype=np.int32, count=int(offsets[-1]))
+    np.save(base_path + TOKENS_SUFFIX, tokens)
+    np.save(base_path + TOKEN_OFFSETS_SUFFIX, offsets)
+    with open(base_path + TOKEN_META_SUFFIX, "w", encoding="utf-8") as f:
+        json.dump(
+            {"tokenizer": tokenizer_id, "documents": len(token_ids), "content_hash": content_hash}, f, indent=4
+        )
+    return len(token_ids)
+
+
+class TokenStore:
+    """
+    Ids de tokens de cada documento del corpus, precalculados con el
+    tokenizer del modelo y abiertos con mmap. Permite armar el contexto
+    concatenando ids en vez de volver a tokenizar el texto, con un
+    presupuesto de tokens exacto.
+    """
+
+    def __init__(self, base_path):
+        self.base_path = base_path
+        self._tokens = np.load(base_path + TOKENS_SUFFIX, mmap_mode="r")
+        self._offsets = np.load(base_path + TOKEN_OFFSETS_SUFFIX, mmap_mode="r")
+        with open(base_path + TOKEN_META_SUFFIX, "r", encoding="utf-8") as f:
+            self.metadata = json.load(f)
+        self.lengths = np.diff(self._offsets)
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, position):
+        return self._tokens[int(self._offsets[position]):int(self._offsets[position + 1])]
+
+    def document_ids(self, doc_count, overrides=None):
+        """
+        Tokens de los primeros `doc_count` documentos con los cambios de
+        `overrides` aplicados, para volver a escribir el almacén.
+        """
+        overrides = overrides or {}
+        empty = np.zeros(0, dtype=np.int32)
+        return [
+            overrides.get(doc_id, self[doc_id] if doc_id < len(self) else empty) for doc_id in range(doc_count)
+        ]
+
+    @property
+    def max_length(self):
+        return int(self.lengths.max()) if len(self) else 0
+
+    def matches(self, texts, tokenizer):
+        """
+        Indica si los tokens corresponden al corpus (`texts`, comparado por
+        hash del contenido) y al tokenizer actuales.
+        """
+        return (
+            len(self) == len(texts)
+            and self.metadata.get("tokenizer") == tokenizer_name(tokenizer)
+            and self.metadata.get("content_hash") == corpus_fingerprint(texts)
+        )
+
+    def concat(self, doc_ids, max_tokens, separator_ids=(), overrides=None):
+        """
+        Concatena los tokens de `doc_ids` en orden, con `separator_ids` entre
+        documentos, mientras entren en `max_tokens`. El primer documento se
+        incluye siempre. `overrides` ({id: ids}) reemplaza los tokens de los
+        documentos que cambiaron desde que se escribió el almacén.
+        Retorna (ids de tokens int32, ids de los documentos incluidos).
+        """
+        overrides = overrides or {}
+        separator = np.asarray(separator_ids, dtype=np.int32)
+        parts, kept, total = [], [], 0
+        for doc_id in doc_ids:
+            doc_id = int(doc_id)
+            if doc_id < 0:
+                continue
+            tokens = overrides[doc_id] if doc_id in overrides else self[doc_id]
+            extra = len(tokens) + (len(separator) if parts else 0)
+            if parts and total + extra > max_tokens:
+                break
+            if parts:
+                parts.append(separator)
+            parts.append(tokens)
+            kept.append(doc_id)
+            total += extra
+        if not parts:
+            return np.zeros(0, dtype=np.int32), kept
+        return np.concatenate(parts).astype(np.int32, copy=False), kept
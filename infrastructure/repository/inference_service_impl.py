@@ -1,97 +1,892 @@
 import os
+import time
 import faiss
 import json
-from transformers import AutoTokenizer, AutoModelForCausalLM, pipeline
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Optional
+from transformers import AutoTokenizer, pipeline
 
 from domain.entities.response_entity import InferenceResponse
 from domain.interfaces.inference_service_interface import InferenceServiceInterface
+from domain.interfaces.passage_admin_interface import PassageAdminInterface
 from config.settings import (
     MODEL_PATH, INDEX_PATH, PROCESSED_DATA_PATH,
-    EMBEDDING_MODEL_NAME, TOP_K
+    EMBEDDING_MODEL_NAME, TOP_K,
+    BATCHING_ENABLED, BATCH_MAX_SIZE, BATCH_MAX_WAIT_MS,
+    GENERATION_BATCH_SIZE,
+    RESPONSE_CACHE_ENABLED, RESPONSE_CACHE_MAX_ENTRIES, RESPONSE_CACHE_MAX_MB,
+    RESPONSE_CACHE_TTL_SECONDS, RESPONSE_CACHE_SIMILARITY, DETERMINISTIC_DECODING,
+    FAISS_NPROBE, FAISS_EF_SEARCH, FAISS_MMAP, CORPUS_STORE_PATH,
+    TFIDF_INDEX_PATH, CONTEXT_MAX_TOKENS, CONTEXT_CACHE_ENABLED, CONTEXT_CACHE_MAX_ENTRIES,
+    HYBRID_SEARCH_ENABLED, HYBRID_CANDIDATES, HYBRID_DENSE_WEIGHT, HYBRID_BM25_WEIGHT, RRF_K,
+    GENERATION_BACKEND, ONNX_MODEL_DIR,
+    STUB_MS_PER_TOKEN,
+    PROMPT_LAYOUT, PREFIX_CACHE_ENABLED, PREFIX_CACHE_MAX_ENTRIES, PREFIX_CACHE_MAX_MB, PREFIX_CACHE_MIN_TOKENS,
+    TRACING_ENABLED, INDEX_PERSIST_CHANGES,
+    DEFAULT_EDITION, DEFAULT_LANGUAGE, INDEX_ROOT, MAX_RESIDENT_INDEXES,
+    EMBEDDING_CACHE_ENABLED, EMBEDDING_CACHE_PATH, EMBEDDING_CACHE_MAX_ENTRIES,
+    EARLY_STOP_ENABLED, EARLY_STOP_MIN_TOKENS, SHORT_ANSWER_MAX_TOKENS, DRAFT_MODEL_PATH,
+    STARTUP_WORKERS
+)
+from infrastructure.helpers.batch_scheduler import MicroBatchScheduler
+from infrastructure.helpers.bm25_retriever import BM25Retriever
+from infrastructure.helpers.context_cache import ContextCache
+from infrastructure.helpers.corpus_store import CorpusStore, corpus_fingerprint, corpus_store_exists, write_corpus_store
+from infrastructure.helpers.early_stopping import STOP_SEQUENCES, token_budget
+from infrastructure.helpers.embedding_cache import EmbeddingCache
+from infrastructure.helpers.embedding_registry import EmbeddingModelRegistry
+from infrastructure.helpers.generation_backends import load_generation_model
+from infrastructure.helpers.index_builder import (
+    apply_search_params, is_ivf_index, load_index_metadata, write_index_metadata
+)
+from infrastructure.helpers.index_registry import CorpusPaths, IndexRegistry, corpus_paths, discover_corpora
+from infrastructure.helpers.faiss_helper import search_with_faiss_batch
+from infrastructure.helpers.hybrid_search import hybrid_search_batch
+from infrastructure.helpers.context_utils import ensure_context, corpus_contents, build_contexts
+from infrastructure.helpers.metrics import (
+    REGISTRY, REQUEST_LATENCY, GENERATED_TOKENS, RETRIEVAL_SCORES, MODEL_LOAD_SECONDS,
+    stage, trace_request
+)
+from infrastructure.helpers.prefix_cache import PrefixKVCache
+from infrastructure.helpers.retrieval_snapshot import RetrievalSnapshot, SnapshotReference, apply_passage_changes
+from infrastructure.helpers.startup import STARTUP
+from infrastructure.helpers.stub_generator import STUB_BACKEND, StubTextGenerationPipeline, StubTokenizer
+from infrastructure.helpers.tfidf_index import TfidfSectionIndex
+from infrastructure.helpers.token_store import (
+    TokenStore, text_ids, token_store_exists, write_token_store
+)
+from infrastructure.helpers.response_cache import SemanticResponseCache
+from infrastructure.helpers.response_formatter import (
+    GENERATION_KWARGS, DETERMINISTIC_GENERATION_KWARGS, build_prefix_ids, build_prompt_parts,
+    generate_response, generate_response_stream, generate_response_with_prefix_cache,
+    generate_responses_batch, run_pipeline_batch
 )
-from infrastructure.helpers.faiss_helper import search_with_faiss
-from infrastructure.helpers.context_utils import ensure_context
-from infrastructure.helpers.response_formatter import generate_response
 
 
-class InferenceServiceImpl(InferenceServiceInterface):
+class InferenceServiceImpl(InferenceServiceInterface, PassageAdminInterface):
     """
     Implementación concreta del servicio de inferencia
     que combina FAISS + modelo Fine-Tuned Bloom + helpers de truncado.
+    El índice y el corpus viven en un snapshot versionado que se reemplaza
+    en caliente al agregar, actualizar o borrar pasajes, o al recargar. Hay
+    un corpus por (edición, idioma), cargado bajo demanda desde un registro LRU.
     """
 
     # Variables estáticas o de clase para que se carguen 1 sola vez
-    _faiss_index = None
-    _processed_data = None
+    _indexes = None
     _tokenizer = None
     _model = None
+    _draft_model = None
     _text_gen_pipeline = None
+    _embedding_registry = None
+    _batch_scheduler = None
+    _response_cache = None
+    _prefix_cache = None
+    _context_cache = None
+    _generation_kwargs = DETERMINISTIC_GENERATION_KWARGS if DETERMINISTIC_DECODING else GENERATION_KWARGS
 
     def __init__(self):
-        # Aseguramos que se inicialicen (lazy loading)
-        if self._faiss_index is None:
-            self._faiss_index = self._load_faiss_index(INDEX_PATH)
-        if self._processed_data is None:
-            self._processed_data = self._load_processed_data(PROCESSED_DATA_PATH)
-        if self._tokenizer is None:
-            self._tokenizer = self._load_tokenizer(MODEL_PATH)
-        if self._model is None:
-            self._model = self._load_model(MODEL_PATH)
-        if self._text_gen_pipeline is None:
-            self._text_gen_pipeline = self._load_text_gen_pipeline(self._model, self._tokenizer)
-
-    def inference(self, query: str) -> InferenceResponse:
+        # Aseguramos que se inicialicen (lazy loading). Los artefactos que no
+        # dependen entre sí se cargan en paralelo: modelo, embeddings e índice.
+        STARTUP.expect(
+            ["tokenizer", "model", "embedding_model", "faiss_index", "processed_data", "tfidf_index"]
+            + (["bm25_index"] if HYBRID_SEARCH_ENABLED else []) + ["text_gen_pipeline"]
+        )
+        with ThreadPoolExecutor(max_workers=STARTUP_WORKERS, thread_name_prefix="startup") as executor:
+            model = embedding_registry = draft_model = None
+            if self._model is None:
+                model = executor.submit(self._timed_load, "model", self._load_model, MODEL_PATH)
+            if self._embedding_registry is None:
+                embedding_registry = executor.submit(
+                    self._timed_load, "embedding_model", self._load_embedding_registry, EMBEDDING_MODEL_NAME
+                )
+            if self._draft_model is None and DRAFT_MODEL_PATH:
+                draft_model = executor.submit(self._timed_load, "draft_model", self._load_draft_model, DRAFT_MODEL_PATH)
+            if self._tokenizer is None:
+                self._tokenizer = self._timed_load("tokenizer", self._load_tokenizer, MODEL_PATH)
+
+            # El índice TF-IDF cuenta tokens con el tokenizer, por eso el corpus espera a que esté
+            indexes = executor.submit(self._load_index_registry) if self._indexes is None else None
+            if model is not None:
+                self._model = model.result()
+            if self._text_gen_pipeline is None:
+                self._text_gen_pipeline = self._timed_load(
+                    "text_gen_pipeline", self._load_text_gen_pipeline, self._model, self._tokenizer
+                )
+            if draft_model is not None:
+                self._draft_model = draft_model.result()
+            if embedding_registry is not None:
+                self._embedding_registry = embedding_registry.result()
+            if indexes is not None:
+                self._indexes = indexes.result()
+        if self._batch_scheduler is None and BATCHING_ENABLED:
+            self._batch_scheduler = self._load_batch_scheduler(self._text_gen_pipeline)
+        if self._response_cache is None and RESPONSE_CACHE_ENABLED:
+            self._response_cache = self._load_response_cache()
+        if self._prefix_cache is None and PREFIX_CACHE_ENABLED:
+            self._prefix_cache = self._load_prefix_cache(self._model)
+        if self._context_cache is None and CONTEXT_CACHE_ENABLED:
+            self._context_cache = self._load_context_cache()
+        REGISTRY.add_collector(self._collect_metrics)
+
+    def inference(self, query: str, use_cache: bool = True, edition: Optional[str] = None,
+                  language: Optional[str] = None) -> InferenceResponse:
         """
         Implementa todo el flujo:
-        1) FAISS search,
-        2) ensure_context,
-        3) generar respuesta.
+        1) caché de respuestas (exacta y por similitud),
+        2) FAISS search,
+        3) contexto (caché de contextos o ensure_context),
+        4) generar respuesta.
+        Cada etapa se mide en las métricas y, si está activo, en la traza de la petición.
         """
+        start_time = time.time()
+        with trace_request("inference", TRACING_ENABLED):
+            result = self._inference(query, use_cache, self._corpus_key(edition, language))
+        REQUEST_LATENCY.observe(time.time() - start_time, method="inference", status=self._status(result))
+        return result
+
+    def _inference(self, query: str, use_cache: bool, corpus_key) -> InferenceResponse:
         try:
-            search_results = search_with_faiss(
-                query,
-                self._faiss_index,
-                self._processed_data,
-                EMBEDDING_MODEL_NAME,
-                TOP_K
-            )
-            full_context = "\n".join([result["content"] for result in search_results])
-            full_context = ensure_context(full_context, query, self._processed_data)
+            retrieval = self._indexes.get(corpus_key)
+            namespace = "/".join(corpus_key)
+            use_cache = use_cache and self._response_cache is not None
+            if use_cache:
+                with stage("cache_lookup"):
+                    cached = self._response_cache.get_exact(query, namespace)
+                if cached is not None:
+                    return {**cached, "cached": True}
 
-            response, inference_time = generate_response(query, full_context, self._text_gen_pipeline)
+            with stage("embedding"):
+                query_embedding = self._embedding_registry.encode(EMBEDDING_MODEL_NAME, [query])
+            if use_cache:
+                with stage("cache_lookup"):
+                    cached = self._response_cache.get_similar(query_embedding[0], namespace)
+                if cached is not None:
+                    return {**cached, "cached": True}
 
-            return {
+            context = self._build_context(retrieval, query, query_embedding, namespace)
+            full_context = context["context"]
+
+            with stage("generation"):
+                if self._prefix_cache is not None:
+                    response, inference_time, tokens_generated = generate_response_with_prefix_cache(
+                        query, full_context, self._model, self._tokenizer, self._prefix_cache,
+                        self._generation_kwargs_for(query), PROMPT_LAYOUT, self._prefix_ids(query, context)
+                    )
+                else:
+                    # La generación asistida solo admite lotes de 1: no se usa con micro-batching
+                    response, inference_time, tokens_generated = generate_response(
+                        query, full_context, self._generator,
+                        self._generation_kwargs_for(query, assisted=self._batch_scheduler is None), PROMPT_LAYOUT
+                    )
+            self._observe_tokens(tokens_generated, "inference")
+
+            result = {
                 "response": response,
                 "time": inference_time
             }
+            if self._response_cache is not None:
+                self._response_cache.put(query, query_embedding[0], result, namespace)
+            return result
         except Exception as e:
             print(f"Error durante la inferencia: {str(e)}")
             return {"error": str(e)}
 
+    def inference_batch(self, queries, use_cache: bool = True, edition: Optional[str] = None,
+                        language: Optional[str] = None):
+        """
+        Flujo por lotes: una sola codificación de todas las consultas, una
+        sola búsqueda FAISS y generación en lotes de GENERATION_BATCH_SIZE.
+        Los resultados respetan el orden de entrada y cada uno lleva su error.
+        """
+        start_time = time.time()
+        with trace_request("inference_batch", TRACING_ENABLED):
+            results = self._inference_batch(queries, use_cache, self._corpus_key(edition, language))
+        REQUEST_LATENCY.observe(
+            time.time() - start_time,
+            method="inference_batch",
+            status="error" if any("error" in result for result in results) else "ok"
+        )
+        return results
+
+    def _inference_batch(self, queries, use_cache: bool, corpus_key):
+        results = [None] * len(queries)
+        pending = []
+        for position, query in enumerate(queries):
+            if query.strip():
+                pending.append(position)
+            else:
+                results[position] = {"error": "La consulta está vacía."}
+
+        if not pending:
+            return results
+
+        use_cache = use_cache and self._response_cache is not None
+        namespace = "/".join(corpus_key)
+        try:
+            retrieval = self._indexes.get(corpus_key)
+            pending_queries = [queries[position] for position in pending]
+            with stage("embedding"):
+                embeddings = self._embedding_registry.encode(EMBEDDING_MODEL_NAME, pending_queries)
+
+            misses = []
+            with stage("cache_lookup"):
+                for row, position in enumerate(pending):
+                    cached = None
+                    if use_cache:
+                        cached = self._response_cache.get_exact(queries[position], namespace)
+                        if cached is None:
+                            cached = self._response_cache.get_similar(embeddings[row], namespace)
+                    if cached is not None:
+                        results[position] = {**cached, "cached": True}
+                    else:
+                        misses.append(row)
+
+            if not misses:
+                return results
+
+            miss_queries = [pending_queries[row] for row in misses]
+            contexts = [
+                context["context"]
+                for context in self._build_contexts(retrieval, miss_queries, embeddings[misses], namespace)
+            ]
+        except Exception as e:
+            print(f"Error durante la búsqueda por lotes: {str(e)}")
+            for position in pending:
+                if results[position] is None:
+                    results[position] = {"error": str(e)}
+            return results
+
+        with stage("generation"):
+            generated = generate_responses_batch(
+                miss_queries, contexts, self._text_gen_pipeline, GENERATION_BATCH_SIZE, self._generation_kwargs_for(),
+                PROMPT_LAYOUT
+            )
+        for row, output in zip(misses, generated):
+            position = pending[row]
+            if isinstance(output, Exception):
+                results[position] = {"error": str(output)}
+            else:
+                response, inference_time, tokens_generated = output
+                self._observe_tokens(tokens_generated, "inference_batch")
+                results[position] = {"response": response, "time": inference_time}
+                if self._response_cache is not None:
+                    self._response_cache.put(queries[position], embeddings[row], results[position], namespace)
+        return results
+
+    def inference_stream(self, query: str, edition: Optional[str] = None, language: Optional[str] = None):
+        """
+        Mismo flujo que `inference`, pero la generación se emite token a token.
+        """
+        start_time = time.time()
+        status = "ok"
+        events = None
+        try:
+            corpus_key = self._corpus_key(edition, language)
+            retrieval = self._indexes.get(corpus_key)
+            with stage("embedding"):
+                query_embedding = self._embedding_registry.encode(EMBEDDING_MODEL_NAME, [query])
+            context = self._build_context(retrieval, query, query_embedding, "/".join(corpus_key))
+            # Con el almacén de tokens el prefijo se arma con ids; si no, se tokeniza el prompt entero como antes
+            prefix_ids = self._prefix_ids(query, context) if context["token_ids"] is not None else None
+            events = generate_response_stream(
+                query, context["context"], self._model, self._tokenizer,
+                self._generation_kwargs_for(query, assisted=True), prompt_layout=PROMPT_LAYOUT, prefix_ids=prefix_ids
+            )
+            for event in events:
+                if event["event"] == "end":
+                    GENERATED_TOKENS.observe(event["tokens_generated"], method="inference_stream")
+                yield event
+        except Exception as e:
+            status = "error"
+            print(f"Error durante la inferencia en streaming: {str(e)}")
+            yield {"event": "error", "error": str(e)}
+        finally:
+            # Si el cliente se fue, cerrar el generador detiene la generación
+            if events is not None:
+                events.close()
+            REQUEST_LATENCY.observe(time.time() - start_time, method="inference_stream", status=status)
+
+    def _build_context(self, retrieval, query: str, query_embedding=None, namespace="") -> dict:
+        return self._build_contexts(retrieval, [query], query_embedding, namespace)[0]
+
+    def _build_contexts(self, retrieval, queries, query_embeddings=None, namespace=""):
+        """
+        Retorna, por consulta, un dict con el contexto armado ("context"), sus
+        tokens si el corpus tiene almacén de tokens ("token_ids") y los ids de
+        tokens del prefijo si ya se calcularon ("prefix_ids"). Los contextos de
+        un mismo conjunto de pasajes salen de la caché de contextos, que solo se
+        usa cuando la generación aprovecha sus ids: con almacén de tokens o con
+        la caché de prefijos KV. Si no, concatenar los pasajes cuesta menos que
+        la búsqueda en la caché y el pipeline tokeniza el prompt igual.
+        """
+        # Se toma el snapshot una sola vez: búsqueda y contexto usan la misma versión
+        snapshot = retrieval.current
+        if os.path.basename(snapshot.embedding_model) != os.path.basename(EMBEDDING_MODEL_NAME):
+            # El índice se construyó con otro modelo: las consultas se codifican con ese
+            query_embeddings = None
+        with stage("retrieval"):
+            scores, indices = self._retrieve(snapshot, queries, query_embeddings)
+        retriever = "hybrid" if snapshot.bm25_retriever is not None else "dense"
+        for score in scores[indices >= 0]:
+            RETRIEVAL_SCORES.observe(float(score), retriever=retriever)
+
+        with stage("context"):
+            entries = [None] * len(queries)
+            keys = [ContextCache.key(namespace, snapshot.version, row) for row in indices]
+            context_cache = self._context_cache
+            if snapshot.token_store is None and self._prefix_cache is None:
+                context_cache = None
+            if context_cache is not None:
+                entries = [context_cache.get(key) for key in keys]
+            missing = [position for position, entry in enumerate(entries) if entry is None]
+            if not missing:
+                return entries
+
+            token_ids = [None] * len(missing)
+            if snapshot.token_store is not None:
+                built = [self._token_context(snapshot, indices[position]) for position in missing]
+                contexts = [context for context, _ in built]
+                token_ids = [ids for _, ids in built]
+            else:
+                contexts = build_contexts(indices[missing], snapshot.contents)
+
+            for position, context, ids in zip(missing, contexts, token_ids):
+                if not context.strip():
+                    # El contexto de respaldo depende de la consulta: no se cachea
+                    context = ensure_context(
+                        context, queries[position], snapshot.processed_data, CONTEXT_MAX_TOKENS,
+                        snapshot.tfidf_index, self._tokenizer
+                    )
+                    entries[position] = {"context": context, "token_ids": None, "prefix_ids": None}
+                elif context_cache is not None:
+                    entries[position] = context_cache.put(keys[position], context, ids)
+                else:
+                    entries[position] = {"context": context, "token_ids": ids, "prefix_ids": None}
+            return entries
+
+    def _token_context(self, snapshot, doc_ids):
+        """
+        Contexto armado con el almacén de tokens: los pasajes entran en orden
+        mientras sus tokens quepan en CONTEXT_MAX_TOKENS (cuenta exacta, sin
+        volver a tokenizar). Retorna (texto, ids de tokens).
+        """
+        token_ids, kept = snapshot.token_store.concat(
+            doc_ids, CONTEXT_MAX_TOKENS, text_ids(self._tokenizer, "\n"), snapshot.token_overrides
+        )
+        return "\n".join(snapshot.contents[doc_id] for doc_id in kept), token_ids
+
+    def _prefix_ids(self, query, context):
+        """
+        Ids de tokens del prefijo del prompt. Si el contexto viene del almacén
+        de tokens se arman concatenando ids; si no, se tokeniza el prefijo. La
+        caché de contextos los guarda para la próxima consulta con los mismos pasajes.
+        """
+        if context["token_ids"] is not None:
+            build = partial(build_prefix_ids, context["token_ids"], self._tokenizer, PROMPT_LAYOUT)
+        else:
+            prefix, _ = build_prompt_parts(query, context["context"], PROMPT_LAYOUT)
+            build = lambda: self._tokenizer(prefix, add_special_tokens=False)["input_ids"]
+        if self._context_cache is None:
+            return build()
+        return self._context_cache.prefix_ids(context, build)
+
+    def _retrieve(self, snapshot, queries, query_embeddings=None):
+        """
+        Retorna las matrices (scores, ids) de los TOP_K documentos de cada consulta,
+        con búsqueda híbrida BM25 + FAISS si está activa o solo densa si no.
+        """
+        if snapshot.bm25_retriever is not None:
+            return hybrid_search_batch(
+                queries,
+                snapshot.faiss_index,
+                snapshot.bm25_retriever,
+                snapshot.embedding_model,
+                TOP_K,
+                self._embedding_registry,
+                query_embeddings,
+                candidates=HYBRID_CANDIDATES,
+                dense_weight=HYBRID_DENSE_WEIGHT,
+                bm25_weight=HYBRID_BM25_WEIGHT,
+                rrf_k=RRF_K
+            )
+        return search_with_faiss_batch(
+            queries,
+            snapshot.faiss_index,
+            snapshot.embedding_model,
+            TOP_K,
+            self._embedding_registry,
+            query_embeddings
+        )
+
+    def add_passage(self, content: str, category: Optional[str] = None, edition: Optional[str] = None,
+                    language: Optional[str] = None) -> dict:
+        corpus_key = self._corpus_key(edition, language)
+        retrieval = self._indexes.get(corpus_key)
+        with retrieval.write_lock:
+            doc_id = retrieval.current.doc_count
+            return self._apply_changes(
+                corpus_key, retrieval, upserts={doc_id: self._passage_entry(content, category)}, passage_id=doc_id
+            )
+
+    def update_passage(self, passage_id: int, content: str, category: Optional[str] = None,
+                       edition: Optional[str] = None, language: Optional[str] = None) -> dict:
+        corpus_key = self._corpus_key(edition, language)
+        retrieval = self._indexes.get(corpus_key)
+        with retrieval.write_lock:
+            self._check_passage(retrieval.current, passage_id)
+            return self._apply_changes(
+                corpus_key, retrieval, upserts={passage_id: self._passage_entry(content, category)},
+                passage_id=passage_id
+            )
+
+    def delete_passage(self, passage_id: int, edition: Optional[str] = None, language: Optional[str] = None) -> dict:
+        corpus_key = self._corpus_key(edition, language)
+        retrieval = self._indexes.get(corpus_key)
+        with retrieval.write_lock:
+            self._check_passage(retrieval.current, passage_id)
+            return self._apply_changes(corpus_key, retrieval, deletes=[passage_id], passage_id=passage_id)
+
+    def reload_index(self, edition: Optional[str] = None, language: Optional[str] = None) -> dict:
+        corpus_key = self._corpus_key(edition, language)
+        retrieval = self._indexes.get(corpus_key)
+        with retrieval.write_lock:
+            snapshot = self._load_snapshot(self._corpus_paths(corpus_key), retrieval.current.version + 1)
+            self._publish(corpus_key, retrieval, snapshot)
+            return self._index_stats(corpus_key, snapshot)
+
+    def get_index_stats(self, edition: Optional[str] = None, language: Optional[str] = None) -> dict:
+        corpus_key = self._corpus_key(edition, language)
+        return self._index_stats(corpus_key, self._indexes.get(corpus_key).current)
+
+    def has_corpus(self, edition: Optional[str] = None, language: Optional[str] = None) -> bool:
+        try:
+            corpus_key = self._corpus_key(edition, language)
+            return corpus_key in self._indexes.resident() or os.path.exists(self._corpus_paths(corpus_key).index_path)
+        except ValueError:
+            return False
+
+    def list_corpora(self):
+        default_key = self._corpus_key(None, None)
+        corpora = set(discover_corpora(INDEX_ROOT)) | {default_key}
+        resident = set(self._indexes.resident())
+        return [
+            {"edition": edition, "language": language, "default": (edition, language) == default_key,
+             "loaded": (edition, language) in resident}
+            for edition, language in sorted(corpora)
+        ]
+
+    @staticmethod
+    def _corpus_key(edition, language):
+        return (edition or DEFAULT_EDITION, language or DEFAULT_LANGUAGE)
+
+    @staticmethod
+    def _corpus_paths(corpus_key):
+        """
+        El corpus por defecto usa las rutas de siempre (INDEX_PATH, PROCESSED_DATA_PATH...);
+        el resto vive en INDEX_ROOT/{edición}/{idioma}/.
+        """
+        if corpus_key == (DEFAULT_EDITION, DEFAULT_LANGUAGE):
+            return CorpusPaths(INDEX_PATH, PROCESSED_DATA_PATH, CORPUS_STORE_PATH, TFIDF_INDEX_PATH)
+        return corpus_paths(INDEX_ROOT, *corpus_key)
+
+    @staticmethod
+    def _index_stats(corpus_key, snapshot):
+        edition, language = corpus_key
+        return {"edition": edition, "language": language, **snapshot.stats()}
+
+    @staticmethod
+    def _passage_entry(content, category):
+        return {"content": content, "category": category or "Unknown"}
+
+    @staticmethod
+    def _check_passage(snapshot, passage_id):
+        if not 0 <= passage_id < snapshot.doc_count or snapshot.processed_data[passage_id] is None:
+            raise KeyError(f"El pasaje {passage_id} no existe.")
+
+    def _apply_changes(self, corpus_key, retrieval, upserts=None, deletes=(), passage_id=None):
+        """
+        Construye el snapshot siguiente sobre copias del corpus y del índice,
+        lo persiste y lo publica. Debe llamarse con el write_lock tomado.
+        """
+        current = retrieval.current
+        embeddings = None
+        if upserts:
+            # Los pasajes no se repiten: no se guardan en la caché de embeddings de consultas
+            embeddings = self._embedding_registry.encode(
+                current.embedding_model, [entry["content"] for entry in upserts.values()], use_cache=False
+            )
+        token_ids = None
+        if upserts and current.token_store is not None:
+            token_ids = self._tokenizer(
+                [entry["content"] for entry in upserts.values()], add_special_tokens=False
+            )["input_ids"]
+        snapshot = apply_passage_changes(
+            current, upserts, embeddings, deletes, hybrid=HYBRID_SEARCH_ENABLED, upsert_token_ids=token_ids
+        )
+        if INDEX_PERSIST_CHANGES:
+            self._persist_snapshot(snapshot, self._corpus_paths(corpus_key))
+        self._publish(corpus_key, retrieval, snapshot)
+        return {"id": passage_id, "version": snapshot.version}
+
+    def _publish(self, corpus_key, retrieval, snapshot):
+        retrieval.publish(snapshot)
+        # Las respuestas cacheadas pueden depender de pasajes que cambiaron
+        if self._response_cache is not None:
+            self._response_cache.clear("/".join(corpus_key))
+        if self._prefix_cache is not None:
+            self._prefix_cache.clear()
+        if self._context_cache is not None:
+            self._context_cache.clear("/".join(corpus_key))
+        print(f"Índice {'/'.join(corpus_key)} versión {snapshot.version} publicado ({snapshot.live_count} documentos).")
+
+    @staticmethod
+    def _persist_snapshot(snapshot, paths):
+        """
+        Escribe índice y corpus en archivos temporales y los reemplaza con
+        os.replace, así los procesos que tienen mapeados los anteriores no se ven afectados.
+        """
+        index_tmp = f"{paths.index_path}.tmp"
+        faiss.write_index(snapshot.faiss_index, index_tmp)
+        os.replace(index_tmp, paths.index_path)
+        metadata = load_index_metadata(paths.index_path)
+        if metadata is not None:
+            metadata.update({"doc_count": snapshot.live_count, "id_map": True, "version": snapshot.version})
+            write_index_metadata(paths.index_path, metadata)
+
+        entries = list(snapshot.processed_data)
+        data_tmp = f"{paths.data_path}.tmp"
+        with open(data_tmp, "w", encoding="utf-8") as f:
+            json.dump(entries, f, indent=4, ensure_ascii=False)
+        os.replace(data_tmp, paths.data_path)
+
+        if paths.corpus_store_path and corpus_store_exists(paths.corpus_store_path):
+            store_tmp = f"{paths.corpus_store_path}.tmp"
+            write_corpus_store(entries, store_tmp)
+            for suffix in (".blob", ".offsets.npy"):
+                os.replace(store_tmp + suffix, paths.corpus_store_path + suffix)
+
+        # Se reescribe en cada cambio (también en los borrados) para que su hash siga al corpus
+        if paths.corpus_store_path and snapshot.token_store is not None:
+            tokens_tmp = f"{paths.corpus_store_path}.tmp"
+            write_token_store(
+                snapshot.token_store.document_ids(snapshot.doc_count, snapshot.token_overrides), tokens_tmp,
+                snapshot.token_store.metadata["tokenizer"], corpus_fingerprint(snapshot.contents)
+            )
+            for suffix in (".tokens.npy", ".token_offsets.npy", ".tokens.json"):
+                os.replace(tokens_tmp + suffix, paths.corpus_store_path + suffix)
+
+    def _generation_kwargs_for(self, query=None, assisted=False):
+        """
+        Kwargs de generación de una petición. El corte en "Pregunta:" no cambia
+        la respuesta final (extract_response corta en el mismo lugar); el corte
+        por oración y el presupuesto por tipo de pregunta sí pueden acortarla,
+        por eso solo se aplican con decodificación por muestreo.
+        """
+        kwargs = dict(self._generation_kwargs)
+        if EARLY_STOP_ENABLED:
+            kwargs["stop_sequences"] = STOP_SEQUENCES
+            if not DETERMINISTIC_DECODING:
+                kwargs["sentence_min_tokens"] = EARLY_STOP_MIN_TOKENS
+                kwargs["max_new_tokens"] = token_budget(query, kwargs["max_new_tokens"], SHORT_ANSWER_MAX_TOKENS)
+        if assisted and self._draft_model is not None:
+            kwargs["assistant_model"] = self._draft_model
+        return kwargs
+
+    @property
+    def _generator(self):
+        """
+        Con micro-batching activo las peticiones pasan por el scheduler,
+        que expone la misma interfaz que el pipeline de texto.
+        """
+        return self._batch_scheduler or self._text_gen_pipeline
+
+    def get_batching_stats(self):
+        if self._batch_scheduler is None:
+            return {"enabled": False}
+        return {"enabled": True, **self._batch_scheduler.stats()}
+
+    def get_cache_stats(self):
+        stats = {"enabled": False}
+        if self._response_cache is not None:
+            stats = {"enabled": True, "deterministic": DETERMINISTIC_DECODING, **self._response_cache.stats()}
+        stats["embeddings"] = {"enabled": False}
+        if self._embedding_registry.cache is not None:
+            stats["embeddings"] = {"enabled": True, **self._embedding_registry.cache.stats()}
+        stats["prefix_kv"] = {"enabled": False}
+        if self._prefix_cache is not None:
+            stats["prefix_kv"] = {"enabled": True, "layout": PROMPT_LAYOUT, **self._prefix_cache.stats()}
+        stats["contexts"] = {"enabled": False}
+        if self._context_cache is not None:
+            stats["contexts"] = {"enabled": True, **self._context_cache.stats()}
+        return stats
+
+    @staticmethod
+    def _observe_tokens(tokens_generated, method):
+        # El conteo sale de la generación; si el pipeline no lo informa no se observa
+        if tokens_generated is not None:
+            GENERATED_TOKENS.observe(tokens_generated, method=method)
+
+    @staticmethod
+    def _status(result):
+        if "error" in result:
+            return "error"
+        return "cached" if result.get("cached") else "ok"
+
+    def _collect_metrics(self):
+        """
+        Estadísticas del scheduler y de las cachés publicadas como gauges en /metrics.
+        """
+        default_snapshot = self._indexes.get(self._corpus_key(None, None)).current
+        indexes = self._indexes.stats()
+        samples = {
+            "owasp_index_version": ("Versión del snapshot publicado del corpus por defecto.", default_snapshot.version),
+            "owasp_index_documents": ("Documentos vigentes en el corpus por defecto.", default_snapshot.live_count),
+            "owasp_index_resident": ("Corpus (edición, idioma) cargados en memoria.", len(indexes["resident"])),
+            "owasp_index_evictions": ("Corpus descargados de memoria por el LRU.", indexes["evictions"]),
+        }
+        if self._batch_scheduler is not None:
+            batching = self._batch_scheduler.stats()
+            samples["owasp_batch_queue_depth"] = ("Peticiones esperando lote de generación.", batching["queue_depth"])
+            samples["owasp_batch_avg_size"] = ("Tamaño medio de los lotes de generación.", batching["avg_batch_size"])
+            samples["owasp_batch_count"] = ("Lotes de generación ejecutados.", batching["batches"])
+        if self._response_cache is not None:
+            cache = self._response_cache.stats()
+            samples["owasp_response_cache_exact_hits"] = ("Aciertos exactos de la caché de respuestas.", cache["exact_hits"])
+            samples["owasp_response_cache_similar_hits"] = ("Aciertos por similitud de la caché de respuestas.", cache["similar_hits"])
+            samples["owasp_response_cache_misses"] = ("Fallos de la caché de respuestas.", cache["misses"])
+            samples["owasp_response_cache_entries"] = ("Entradas en la caché de respuestas.", cache["entries"])
+        if self._embedding_registry.cache is not None:
+            embeddings = self._embedding_registry.cache
+            hits = embeddings.memory_hits + embeddings.disk_hits
+            samples["owasp_embedding_cache_hits"] = ("Embeddings de consultas leídos de la caché.", hits)
+            samples["owasp_embedding_cache_misses"] = ("Embeddings de consultas calculados con el modelo.", embeddings.misses)
+            samples["owasp_embedding_cache_saved_seconds"] = (
+                "Tiempo de codificación estimado que ahorró la caché de embeddings.", embeddings.saved_seconds
+            )
+        if self._prefix_cache is not None:
+            prefix = self._prefix_cache.stats()
+            samples["owasp_prefix_cache_hits"] = ("Aciertos de la caché de prefijos KV.", prefix["hits"])
+            samples["owasp_prefix_cache_misses"] = ("Fallos de la caché de prefijos KV.", prefix["misses"])
+            samples["owasp_prefix_cache_bytes"] = ("Memoria usada por la caché de prefijos KV.", prefix["bytes"])
+        if self._context_cache is not None:
+            contexts = self._context_cache.stats()
+            samples["owasp_context_cache_hits"] = ("Contextos reutilizados de la caché de contextos.", contexts["hits"])
+            samples["owasp_context_cache_misses"] = ("Contextos armados a partir de los pasajes.", contexts["misses"])
+            samples["owasp_context_cache_entries"] = ("Entradas en la caché de contextos.", contexts["entries"])
+        return samples
+
+    def _load_index_registry(self):
+        default_key = self._corpus_key(None, None)
+        print(f"Registro de índices en {INDEX_ROOT} (máx. {MAX_RESIDENT_INDEXES} en memoria, "
+              f"por defecto {'/'.join(default_key)})...")
+        registry = IndexRegistry(
+            self._open_corpus,
+            max_resident=MAX_RESIDENT_INDEXES,
+            pinned=[default_key]
+        )
+        # El corpus por defecto se carga al iniciar, como antes
+        registry.get(default_key)
+        return registry
+
+    def _open_corpus(self, corpus_key):
+        # Un corpus descargado por el LRU vuelve a empezar en la versión 1: sus
+        # contextos cacheados de antes podrían no coincidir con lo que hay en disco
+        if self._context_cache is not None:
+            self._context_cache.clear("/".join(corpus_key))
+        return SnapshotReference(self._load_snapshot(self._corpus_paths(corpus_key), version=1))
+
+    def _load_snapshot(self, paths, version):
+        faiss_index = self._timed_load("faiss_index", self._load_faiss_index, paths.index_path)
+        processed_data = self._timed_load(
+            "processed_data", self._load_processed_data, paths.data_path, paths.corpus_store_path
+        )
+        if faiss_index.ntotal > len(processed_data):
+            raise ValueError(
+                f"El índice tiene {faiss_index.ntotal} vectores pero el corpus solo {len(processed_data)} documentos."
+            )
+        contents = corpus_contents(processed_data)
+        tfidf_index = self._timed_load(
+            "tfidf_index", self._load_tfidf_index, paths.tfidf_index_path, contents, self._tokenizer
+        )
+        bm25_retriever = None
+        if HYBRID_SEARCH_ENABLED:
+            bm25_retriever = self._timed_load("bm25_index", self._load_bm25_retriever, contents)
+        token_store = None
+        if paths.corpus_store_path and token_store_exists(paths.corpus_store_path):
+            token_store = self._timed_load(
+                "token_store", self._load_token_store, paths.corpus_store_path, contents, self._tokenizer
+            )
+        metadata = load_index_metadata(paths.index_path) or {}
+        return RetrievalSnapshot(
+            version, faiss_index, processed_data, contents, bm25_retriever, tfidf_index,
+            metadata.get("embedding_model", EMBEDDING_MODEL_NAME), token_store
+        )
+
+    @staticmethod
+    def _timed_load(artifact, loader, *args):
+        start_time = time.time()
+        with STARTUP.step(artifact):
+            loaded = loader(*args)
+        MODEL_LOAD_SECONDS.set(time.time() - start_time, artifact=artifact)
+        return loaded
+
     @staticmethod
     def _load_tokenizer(model_path: str):
+        if GENERATION_BACKEND == STUB_BACKEND:
+            return StubTokenizer()
         print(f"Cargando tokenizer desde {model_path}...")
-        return AutoTokenizer.from_pretrained(model_path)
+        tokenizer = AutoTokenizer.from_pretrained(model_path)
+        # Bloom es un modelo causal: para generar en lote el padding va a la izquierda
+        tokenizer.padding_side = "left"
+        return tokenizer
 
     @staticmethod
     def _load_model(model_path: str):
-        print(f"Cargando modelo desde {model_path}...")
-        return AutoModelForCausalLM.from_pretrained(model_path)
+        if GENERATION_BACKEND == STUB_BACKEND:
+            print("Backend stub: no se carga el modelo de generación.")
+            return None
+        print(f"Cargando modelo desde {model_path} (backend {GENERATION_BACKEND})...")
+        return load_generation_model(model_path, GENERATION_BACKEND, ONNX_MODEL_DIR)
+
+    @staticmethod
+    def _load_draft_model(draft_model_path: str):
+        if GENERATION_BACKEND in (STUB_BACKEND, "onnx"):
+            print(f"Backend {GENERATION_BACKEND}: no se usa el modelo borrador.")
+            return None
+        # Debe compartir el tokenizer con el modelo principal (p. ej. un Bloom más chico)
+        print(f"Cargando modelo borrador desde {draft_model_path}...")
+        return load_generation_model(draft_model_path, GENERATION_BACKEND)
 
     @staticmethod
     def _load_text_gen_pipeline(model, tokenizer):
+        if GENERATION_BACKEND == STUB_BACKEND:
+            return StubTextGenerationPipeline(STUB_MS_PER_TOKEN)
         print("Cargando pipeline de texto...")
         return pipeline("text-generation", model=model, tokenizer=tokenizer)
 
+    @staticmethod
+    def _load_embedding_registry(embedding_model_name: str):
+        cache = None
+        if EMBEDDING_CACHE_ENABLED:
+            print(f"Iniciando caché de embeddings en {EMBEDDING_CACHE_PATH or 'memoria'}...")
+            cache = EmbeddingCache(EMBEDDING_CACHE_PATH or None, max_entries=EMBEDDING_CACHE_MAX_ENTRIES)
+        registry = EmbeddingModelRegistry(cache)
+        registry.warm_up(embedding_model_name)
+        return registry
+
+    @staticmethod
+    def _load_batch_scheduler(text_gen_pipeline):
+        print(f"Iniciando micro-batching (lote máx. {BATCH_MAX_SIZE}, espera máx. {BATCH_MAX_WAIT_MS}ms)...")
+        return MicroBatchScheduler(
+            partial(run_pipeline_batch, text_gen_pipeline=text_gen_pipeline),
+            max_batch_size=BATCH_MAX_SIZE,
+            max_wait_ms=BATCH_MAX_WAIT_MS
+        )
+
+    @staticmethod
+    def _load_response_cache():
+        if not DETERMINISTIC_DECODING:
+            # Con muestreo la misma consulta da otra respuesta: la cacheada no sería la que se generaría
+            print("La caché de respuestas requiere DETERMINISTIC_DECODING=true, se desactiva.")
+            return None
+        print(f"Iniciando caché de respuestas (umbral de similitud {RESPONSE_CACHE_SIMILARITY})...")
+        return SemanticResponseCache(
+            max_entries=RESPONSE_CACHE_MAX_ENTRIES,
+            ttl_seconds=RESPONSE_CACHE_TTL_SECONDS,
+            similarity_threshold=RESPONSE_CACHE_SIMILARITY,
+            max_bytes=int(RESPONSE_CACHE_MAX_MB * 1024 * 1024)
+        )
+
+    @staticmethod
+    def _load_context_cache():
+        print(f"Iniciando caché de contextos (máx. {CONTEXT_CACHE_MAX_ENTRIES} entradas)...")
+        return ContextCache(max_entries=CONTEXT_CACHE_MAX_ENTRIES)
+
+    @staticmethod
+    def _load_tfidf_index(tfidf_index_path: str, contents, tokenizer):
+        if os.path.exists(tfidf_index_path):
+            print(f"Cargando índice TF-IDF desde {tfidf_index_path}...")
+            tfidf_index = TfidfSectionIndex.load(tfidf_index_path)
+            if tfidf_index.matches(contents, tokenizer):
+                return tfidf_index
+            print("El índice TF-IDF no corresponde al corpus o tokenizer actual, se reconstruye.")
+
+        print("Ajustando índice TF-IDF sobre el corpus...")
+        tfidf_index = TfidfSectionIndex.fit([contents[i] for i in range(len(contents))], tokenizer)
+        tfidf_index.save(tfidf_index_path)
+        print(f"Índice TF-IDF con {len(tfidf_index)} secciones guardado en {tfidf_index_path}")
+        return tfidf_index
+
+    @staticmethod
+    def _load_token_store(base_path: str, contents, tokenizer):
+        print(f"Abriendo almacén de tokens desde {base_path}...")
+        token_store = TokenStore(base_path)
+        if not token_store.matches(contents, tokenizer):
+            print("El almacén de tokens no corresponde al corpus o tokenizer actual, se arma el contexto desde el texto. "
+                  "Hay que regenerarlo con scripts/build_chunked_corpus.py.")
+            return None
+        if token_store.max_length > CONTEXT_MAX_TOKENS:
+            print(f"Advertencia: hay pasajes de {token_store.max_length} tokens, más que CONTEXT_MAX_TOKENS "
+                  f"({CONTEXT_MAX_TOKENS}); el primer pasaje de cada contexto se incluye igual.")
+        return token_store
+
+    @staticmethod
+    def _load_bm25_retriever(contents):
+        print("Construyendo índice invertido BM25...")
+        return BM25Retriever([contents[i] for i in range(len(contents))])
+
+    @staticmethod
+    def _load_prefix_cache(model):
+        if GENERATION_BACKEND in ("onnx", STUB_BACKEND):
+            print(f"La caché de prefijos no está disponible con el backend {GENERATION_BACKEND}, se desactiva.")
+            return None
+        if PROMPT_LAYOUT != "context_first":
+            # El prefijo sería solo "Pregunta:", más corto que PREFIX_CACHE_MIN_TOKENS: nunca se cachearía
+            print("La caché de prefijos requiere PROMPT_LAYOUT=context_first, se desactiva.")
+            return None
+        print(f"Iniciando caché de prefijos KV (máx. {PREFIX_CACHE_MAX_ENTRIES} entradas, {PREFIX_CACHE_MAX_MB}MB)...")
+        return PrefixKVCache(
+            model,
+            max_entries=PREFIX_CACHE_MAX_ENTRIES,
+            max_bytes=int(PREFIX_CACHE_MAX_MB * 1024 * 1024),
+            min_prefix_tokens=PREFIX_CACHE_MIN_TOKENS
+        )
+
     @staticmethod
     def _load_faiss_index(index_path: str):
         if not os.path.exists(index_path):
             raise FileNotFoundError(f"Índice FAISS no encontrado en {index_path}")
         print(f"Cargando índice FAISS desde {index_path}...")
-        return faiss.read_index(index_path)
+        index = None
+        if FAISS_MMAP:
+            try:
+                # Solo lectura y mapeado en memoria: los workers comparten las páginas
+                index = faiss.read_index(index_path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+            except RuntimeError as e:
+                print(f"No se pudo mapear el índice en memoria ({str(e)}), se carga completo.")
+            if index is not None and not is_ivf_index(index):
+                # FAISS solo mapea las listas invertidas; Flat y HNSW se leen igual al heap
+                print(f"Advertencia: el índice {type(faiss.downcast_index(index)).__name__} no es IVF y FAISS_MMAP "
+                      "no lo mapea: se cargó completo en la memoria del proceso.")
+        if index is None:
+            index = faiss.read_index(index_path)
+
+        metadata = load_index_metadata(index_path)
+        if metadata is not None:
+            print(f"Índice {metadata['index_type']} con {metadata['doc_count']} documentos "
+                  f"(modelo {metadata['embedding_model']})")
+            if os.path.basename(metadata["embedding_model"]) != os.path.basename(EMBEDDING_MODEL_NAME):
+                print(f"El índice se construyó con {metadata['embedding_model']} y no con "
+                      f"{EMBEDDING_MODEL_NAME}: sus consultas se codificarán con ese modelo.")
+        return apply_search_params(index, nprobe=FAISS_NPROBE, ef_search=FAISS_EF_SEARCH)
 
     @staticmethod
-    def _load_processed_data(processed_data_path: str):
+    def _load_processed_data(processed_data_path: str, corpus_store_path: str = None):
+        if corpus_store_path and corpus_store_exists(corpus_store_path):
+            print(f"Abriendo corpus compacto desde {corpus_store_path}...")
+            return CorpusStore(corpus_store_path)
         if not os.path.exists(processed_data_path):
             raise FileNotFoundError(f"Datos procesados no encontrados en {processed_data_path}")
         print(f"Cargando datos procesados desde {processed_data_path}...")
@@ -0,0 +1,152 @@
+import argparse
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+# Permite importar los helpers del proyecto al ejecutar el script directamente
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from scripts.benchmark.results import compare_with_baseline, latency_summary, peak_rss_mb, save_results
+from scripts.question_sets import load_question_set
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Generador de carga contra /predict con concurrencia configurable."
+    )
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--questions", nargs="*",
+                        default=["./data/test_questions.json", "./data/test_questions_categories.json"])
+    parser.add_argument("--concurrency", type=int, nargs="*", default=[1, 4, 8],
+                        help="Niveles de concurrencia a medir, uno tras otro.")
+    parser.add_argument("--requests", type=int, default=50, help="Peticiones por nivel de concurrencia.")
+    parser.add_argument("--no-cache", action="store_true", help="Envía use_cache=false en cada petición.")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--start-server", action="store_true",
+                        help="Levanta uvicorn con el generador stub y mide su RSS pico.")
+    parser.add_argument("--server-pid", type=int, default=None, help="Pid del servidor para medir su RSS pico.")
+    parser.add_argument("--stub-ms-per-token", type=float, default=20.0)
+    parser.add_argument("--output-dir", default="./scripts/reports/benchmarks")
+    parser.add_argument("--baseline", default=None, help="Reporte anterior contra el que comparar.")
+    return parser.parse_args()
+
+
+def start_server(url, stub_ms_per_token, timeout=600):
+    """
+    Levanta la API con GENERATION_BACKEND=stub y espera a que /health/ready responda.
+    """
+    port = url.rsplit(":", 1)[-1].rstrip("/")
+    env = {**os.environ, "GENERATION_BACKEND": "stub", "STUB_MS_PER_TOKEN": str(stub_ms_per_token)}
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "api.main:app", "--port", port],
+        env=env
+    )
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError("El servidor terminó antes de quedar disponible.")
+        try:
+            if requests.get(f"{url}/health/ready", timeout=1).ok:
+                return server
+        except requests.RequestException:
+            pass
+        time.sleep(1)
+    server.terminate()
+    raise RuntimeError(f"El servidor no respondió en {timeout}s.")
+
+
+def run_level(url, queries, concurrency, total_requests, use_cache, timeout):
+    """
+    Envía `total_requests` peticiones con `concurrency` clientes en paralelo.
+    Cada cliente manda la siguiente apenas recibe la respuesta anterior.
+    """
+    latencies, statuses = [], {}
+    lock = threading.Lock()
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=concurrency, pool_maxsize=concurrency)
+    session.mount("http://", adapter)
+
+    def send(query):
+        start_time = time.time()
+        try:
+            status = session.post(
+                f"{url}/predict", json={"query": query, "use_cache": use_cache}, timeout=timeout
+            ).status_code
+        except requests.RequestException:
+            status = "error"
+        elapsed = time.time() - start_time
+        with lock:
+            statuses[status] = statuses.get(status, 0) + 1
+            if status == 200:
+                latencies.append(elapsed)
+
+    start_time = time.time()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(send, (queries[i % len(queries)] for i in range(total_requests))))
+    elapsed = time.time() - start_time
+
+    return {
+        "concurrency": concurrency,
+        "requests": total_requests,
+        "statuses": {str(status): count for status, count in statuses.items()},
+        "latency": latency_summary(latencies),
+        "rps": len(latencies) / elapsed if elapsed else 0.0,
+    }
+
+
+def main():
+    args = parse_args()
+
+    queries = []
+    for path in args.questions:
+        queries.extend(item["question"] for item in load_question_set(path))
+    random.Random(args.seed).shuffle(queries)
+    print(f"{len(queries)} preguntas en la mezcla")
+
+    server, server_pid = None, args.server_pid
+    if args.start_server:
+        print("Levantando servidor con el generador stub...")
+        server = start_server(args.url, args.stub_ms_per_token)
+        server_pid = server.pid
+
+    results = {}
+    try:
+        for concurrency in args.concurrency:
+            print(f"Concurrencia {concurrency}: {args.requests} peticiones...")
+            results[f"c{concurrency}"] = run_level(
+                args.url, queries, concurrency, args.requests, not args.no_cache, args.timeout
+            )
+        results["server_peak_rss_mb"] = peak_rss_mb(server_pid) if server_pid else None
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    print(f"\n{'nivel':<8}{'p50(ms)':>10}{'p95(ms)':>10}{'p99(ms)':>10}{'RPS':>8}  estados")
+    for concurrency in args.concurrency:
+        result = results[f"c{concurrency}"]
+        latency = result["latency"]
+        if not latency["count"]:
+            print(f"c{concurrency:<7} sin respuestas exitosas {result['statuses']}")
+            continue
+        print(
+            f"c{concurrency:<7}{latency['p50'] * 1000:>10.1f}{latency['p95'] * 1000:>10.1f}"
+            f"{latency['p99'] * 1000:>10.1f}{result['rps']:>8.2f}  {result['statuses']}"
+        )
+    if results["server_peak_rss_mb"] is not None:
+        print(f"RSS pico del servidor: {results['server_peak_rss_mb']:.0f}MB")
+
+    save_results(results, args.output_dir, "load")
+    if args.baseline:
+        compare_with_baseline(results, args.baseline)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+import faiss
+
+# Permite importar los helpers del proyecto al ejecutar el script directamente
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from infrastructure.helpers.context_utils import build_contexts, corpus_contents, truncate_context_with_tfidf
+from infrastructure.helpers.embedding_cache import EmbeddingCache
+from infrastructure.helpers.embedding_registry import default_registry
+from infrastructure.helpers.faiss_helper import search_with_faiss, search_with_faiss_batch
+from infrastructure.helpers.response_formatter import GENERATION_KWARGS, generate_response
+from infrastructure.helpers.stub_generator import StubTextGenerationPipeline, StubTokenizer
+from infrastructure.helpers.tfidf_index import TfidfSectionIndex
+from scripts.benchmark.results import compare_with_baseline, latency_summary, peak_rss_mb, save_results
+from scripts.question_sets import load_question_set
+
+CASES = (
+    "search_with_faiss", "search_with_faiss_cached", "truncate_context_with_tfidf",
+    "truncate_context_prebuilt_index", "generate_response"
+)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Micro-benchmarks de las etapas del pipeline: búsqueda FAISS, truncamiento TF-IDF y generación."
+    )
+    parser.add_argument("--cases", nargs="*", default=list(CASES), choices=CASES)
+    parser.add_argument("--questions", nargs="*",
+                        default=["./data/test_questions.json", "./data/test_questions_categories.json"])
+    parser.add_argument("--data", default="./data/model/owasp_cleaned_dataset.json")
+    parser.add_argument("--index", default="./data/model/indice_faiss.index")
+    parser.add_argument("--embedding-model", default="all-MiniLM-L12-v2")
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--max-tokens", type=int, default=512)
+    parser.add_argument("--repeat", type=int, default=3, help="Pasadas sobre el conjunto de preguntas.")
+    parser.add_argument("--warmup", type=int, default=3, help="Llamadas no medidas antes de cada caso.")
+    parser.add_argument("--model", default=None,
+                        help="Modelo de generación real; sin este argumento se usa el generador stub.")
+    parser.add_argument("--stub-ms-per-token", type=float, default=20.0)
+    parser.add_argument("--output-dir", default="./scripts/reports/benchmarks")
+    parser.add_argument("--baseline", default=None, help="Reporte anterior contra el que comparar.")
+    return parser.parse_args()
+
+
+def run_case(fn, inputs, repeat, warmup):
+    """
+    Ejecuta `fn` sobre cada input `repeat` veces y mide la latencia de cada llamada.
+    """
+    for item in inputs[:warmup]:
+        fn(item)
+
+    latencies = []
+    start_time = time.time()
+    for _ in range(repeat):
+        for item in inputs:
+            call_start = time.time()
+            fn(item)
+            latencies.append(time.time() - call_start)
+    elapsed = time.time() - start_time
+    return {
+        "latency": latency_summary(latencies),
+        "rps": len(latencies) / elapsed if elapsed else 0.0,
+    }
+
+
+def load_generator(args):
+    if args.model is None:
+        print(f"Usando generador stub ({args.stub_ms_per_token}ms por token)")
+        return StubTextGenerationPipeline(args.stub_ms_per_token), StubTokenizer()
+
+    from transformers import AutoTokenizer, pipeline
+    print(f"Cargando modelo {args.model}...")
+    tokenizer = AutoTokenizer.from_pretrained(args.model)
+    return pipeline("text-generation", model=args.model, tokenizer=tokenizer), tokenizer
+
+
+def main():
+    args = parse_args()
+
+    questions = []
+    for path in args.questions:
+        questions.extend(item["question"] for item in load_question_set(path))
+    print(f"{len(questions)} preguntas en la mezcla")
+
+    with open(args.data, "r", encoding="utf-8") as f:
+        processed_data = json.load(f)
+    contents = corpus_contents(processed_data)
+    index = faiss.read_index(args.index)
+    default_registry.warm_up(args.embedding_model)
+
+    # Contextos reales de cada pregunta, como los que arma la API
+    _, indices = search_with_faiss_batch(questions, index, args.embedding_model, args.top_k)
+    pairs = list(zip(questions, build_contexts(indices, contents)))
+
+    text_gen_pipeline, tokenizer = None, None
+    if "generate_response" in args.cases or "truncate_context_prebuilt_index" in args.cases:
+        text_gen_pipeline, tokenizer = load_generator(args)
+
+    results = {}
+    for case in args.cases:
+        print(f"Midiendo {case}...")
+        if case == "search_with_faiss":
+            results[case] = run_case(
+                lambda query: search_with_faiss(query, index, processed_data, args.embedding_model, args.top_k),
+                questions, args.repeat, args.warmup
+            )
+        elif case == "search_with_faiss_cached":
+            # Caché solo en memoria: después del warm-up todas las consultas aciertan
+            default_registry.set_cache(EmbeddingCache())
+            results[case] = run_case(
+                lambda query: search_with_faiss(query, index, processed_data, args.embedding_model, args.top_k),
+                questions, args.repeat, len(questions)
+            )
+            results[case]["embedding_cache"] = default_registry.cache.stats()
+            default_registry.set_cache(None)
+        elif case == "truncate_context_with_tfidf":
+            results[case] = run_case(
+                lambda pair: truncate_context_with_tfidf(pair[1], pair[0], args.max_tokens),
+                pairs, args.repeat, args.warmup
+            )
+        elif case == "truncate_context_prebuilt_index":
+            tfidf_index = TfidfSectionIndex.fit(list(contents), tokenizer)
+            results[case] = run_case(
+                lambda pair: truncate_context_with_tfidf(pair[1], pair[0], args.max_tokens, tfidf_index, tokenizer),
+                pairs, args.repeat, args.warmup
+            )
+        elif case == "generate_response":
+            results[case] = run_case(
+                lambda pair: generate_response(pair[0], pair[1], text_gen_pipeline, GENERATION_KWARGS),
+                pairs, args.repeat, args.warmup
+            )
+    results["peak_rss_mb"] = peak_rss_mb()
+    results["generator"] = args.model or "stub"
+
+    print(f"\n{'caso':<34}{'p50(ms)':>10}{'p95(ms)':>10}{'p99(ms)':>10}{'ops/s':>10}")
+    for case in args.cases:
+        latency = results[case]["latency"]
+        print(
+            f"{case:<34}{latency['p50'] * 1000:>10.2f}{latency['p95'] * 1000:>10.2f}"
+            f"{latency['p99'] * 1000:>10.2f}{results[case]['rps']:>10.1f}"
+        )
+    print(f"RSS pico: {results['peak_rss_mb']:.0f}MB")
+
+    save_results(results, args.output_dir, "micro")
+    if args.baseline:
+        compare_with_baseline(results, args.baseline)
+
+
+if __name__ == "__main__":
+    main()
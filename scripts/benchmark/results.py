@@ -0,0 +1,100 @@
+import json
+import os
+import platform
+import resource
+import subprocess
+import time
+
+import numpy as np
+
+
+def latency_summary(latencies):
+    """
+    Resume una lista de latencias (segundos) en media, p50, p95, p99 y máximo.
+    """
+    if not latencies:
+        return {"count": 0}
+    values = np.asarray(latencies, dtype=np.float64)
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {
+        "count": int(values.size),
+        "mean": float(values.mean()),
+        "p50": float(p50),
+        "p95": float(p95),
+        "p99": float(p99),
+        "max": float(values.max()),
+    }
+
+
+def peak_rss_mb(pid=None):
+    """
+    RSS pico en MB del proceso actual o, en Linux, de otro proceso por su pid (VmHWM).
+    """
+    if pid is None:
+        # En Linux ru_maxrss viene en KB
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    try:
+        with open(f"/proc/{pid}/status", "r", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def save_results(results, output_dir, name):
+    """
+    Guarda los resultados como `<name>-<commit>.json` junto con el commit, la
+    fecha y la máquina, para poder comparar corridas entre commits.
+    """
+    commit = git_commit()
+    report = {
+        "benchmark": name,
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "machine": {"python": platform.python_version(), "cpu_count": os.cpu_count(), "platform": platform.platform()},
+        "results": results,
+    }
+    os.makedirs(output_dir, exist_ok=True)
+    output_path = os.path.join(output_dir, f"{name}-{commit}.json")
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=4, ensure_ascii=False)
+    print(f"\nResultados guardados en {output_path}")
+    return output_path
+
+
+def compare_with_baseline(results, baseline_path, metrics=("p50", "p95", "p99", "rps")):
+    """
+    Imprime la variación porcentual de cada métrica contra un reporte anterior.
+    """
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    print(f"\nComparación contra {baseline.get('commit', '?')} ({baseline_path}):")
+    for case, current in results.items():
+        previous = baseline.get("results", {}).get(case)
+        if not isinstance(current, dict) or not isinstance(previous, dict):
+            continue
+        deltas = []
+        for metric in metrics:
+            now, before = _lookup(current, metric), _lookup(previous, metric)
+            if now is None or not before:
+                continue
+            deltas.append(f"{metric} {(now - before) / before * 100:+.1f}%")
+        if deltas:
+            print(f"  {case}: " + ", ".join(deltas))
+
+
+def _lookup(result, metric):
+    if metric in result:
+        return result[metric]
+    return result.get("latency", {}).get(metric)
@@ -0,0 +1,57 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+# Permite importar los helpers del proyecto al ejecutar el script directamente
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from infrastructure.helpers.corpus_store import corpus_fingerprint, write_corpus_store
+from infrastructure.helpers.token_store import chunk_corpus, tokenizer_name, write_token_store
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Divide el corpus en fragmentos acotados en tokens y guarda los tokens de cada fragmento."
+    )
+    parser.add_argument("--data", default="./data/model/owasp_cleaned_dataset.json", help="Corpus JSON de entrada.")
+    parser.add_argument("--output", default="./data/model/owasp_chunked_dataset.json",
+                        help="Corpus fragmentado de salida; el corpus compacto y los tokens van al lado, sin '.json'.")
+    parser.add_argument("--model", default="pdazad/fine_tuned_bloom_owasp", help="Modelo cuyo tokenizer se usa.")
+    parser.add_argument("--max-tokens", type=int, default=128, help="Tokens como máximo por fragmento.")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    from transformers import AutoTokenizer
+
+    start_time = time.time()
+    with open(args.data, "r", encoding="utf-8") as f:
+        entries = json.load(f)
+    tokenizer = AutoTokenizer.from_pretrained(args.model)
+    chunks, token_ids = chunk_corpus(entries, tokenizer, args.max_tokens)
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(chunks, f, indent=4, ensure_ascii=False)
+    base_path = os.path.splitext(args.output)[0]
+    write_corpus_store(chunks, base_path)
+    write_token_store(
+        token_ids, base_path, tokenizer_name(tokenizer), corpus_fingerprint([chunk["content"] for chunk in chunks])
+    )
+
+    lengths = np.asarray([len(ids) for ids in token_ids], dtype=np.int64)
+    print(f"{sum(entry is not None for entry in entries)} documentos -> {len(chunks)} fragmentos "
+          f"en {time.time() - start_time:.2f}s")
+    if len(lengths):
+        print(f"Tokens por fragmento: media {lengths.mean():.1f}, máx. {lengths.max()}, total {lengths.sum()}")
+    print(f"Corpus en {args.output}, tokens en {base_path}.tokens.npy / {base_path}.token_offsets.npy")
+    print(f"Siguiente paso: python scripts/build_faiss_index.py --data {args.output} --output <índice>")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+# Permite importar los helpers del proyecto al ejecutar el script directamente
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from infrastructure.helpers.corpus_store import write_corpus_store
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Convierte el corpus JSON al formato compacto (offsets + blob UTF-8) que la API abre con mmap."
+    )
+    parser.add_argument("--data", default="./data/model/owasp_cleaned_dataset.json", help="Corpus JSON de entrada.")
+    parser.add_argument("--output", default=None,
+                        help="Ruta base de salida (sin extensión). Por defecto, la del JSON sin '.json'.")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    output = args.output or os.path.splitext(args.data)[0]
+
+    start_time = time.time()
+    with open(args.data, "r", encoding="utf-8") as f:
+        entries = json.load(f)
+    count = write_corpus_store(entries, output)
+    print(f"{count} documentos escritos en {output}.blob / {output}.offsets.npy en {time.time() - start_time:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
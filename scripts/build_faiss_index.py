@@ -0,0 +1,106 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+import faiss
+
+# Permite importar los helpers del proyecto al ejecutar el script directamente
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from infrastructure.helpers.index_builder import (
+    INDEX_TYPES, apply_search_params, build_index, embed_passages, live_ids, passage_texts,
+    recall_at_k, write_index_metadata
+)
+from scripts.question_sets import load_question_set
+
+DEFAULT_QUESTION_SETS = ["./data/test_questions.json", "./data/test_questions_categories.json"]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Construye el índice FAISS del corpus OWASP.")
+    parser.add_argument("--data", default="./data/model/owasp_cleaned_dataset.json",
+                        help="Corpus a indexar (owasp_cleaned_dataset.json u owasp_pretrained_dataset_faiss.json).")
+    parser.add_argument("--output", default="./data/model/indice_faiss.index", help="Ruta del índice a escribir.")
+    parser.add_argument("--index-type", choices=INDEX_TYPES, default="flat")
+    parser.add_argument("--embedding-model", default="all-MiniLM-L12-v2")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--nlist", type=int, default=None, help="Listas invertidas (IVF).")
+    parser.add_argument("--nprobe", type=int, default=8, help="Listas a visitar en la evaluación (IVF).")
+    parser.add_argument("--hnsw-m", type=int, default=32)
+    parser.add_argument("--ef-construction", type=int, default=200)
+    parser.add_argument("--ef-search", type=int, default=64)
+    parser.add_argument("--pq-m", type=int, default=16, help="Subcuantizadores de PQ (debe dividir la dimensión).")
+    parser.add_argument("--pq-nbits", type=int, default=8)
+    parser.add_argument("--k", type=int, default=10, help="k para recall@k.")
+    parser.add_argument("--questions", nargs="*", default=DEFAULT_QUESTION_SETS,
+                        help="Conjuntos de preguntas usados como consultas para medir recall.")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    with open(args.data, "r", encoding="utf-8") as f:
+        processed_data = json.load(f)
+    texts = passage_texts(processed_data)
+    print(f"Corpus cargado: {len(texts)} pasajes desde {args.data}")
+    # Si hay entradas borradas desde la API los ids se conservan con un IndexIDMap2
+    ids = live_ids(processed_data) if len(texts) < len(processed_data) else None
+
+    start_time = time.time()
+    embeddings = embed_passages(texts, args.embedding_model, args.batch_size)
+    embedding_time = time.time() - start_time
+    print(f"Embeddings generados en {embedding_time:.2f}s (dimensión {embeddings.shape[1]})")
+
+    start_time = time.time()
+    index, params = build_index(
+        embeddings,
+        args.index_type,
+        nlist=args.nlist,
+        hnsw_m=args.hnsw_m,
+        ef_construction=args.ef_construction,
+        pq_m=args.pq_m,
+        pq_nbits=args.pq_nbits,
+        ids=ids
+    )
+    build_time = time.time() - start_time
+    print(f"Índice {args.index_type} construido en {build_time:.2f}s {params}")
+
+    # Recall contra la búsqueda exacta usando solo las preguntas de prueba: los
+    # propios pasajes se encuentran a sí mismos y inflarían el resultado
+    questions = [item["question"] for path in args.questions if os.path.exists(path)
+                 for item in load_question_set(path)]
+    apply_search_params(index, nprobe=args.nprobe, ef_search=args.ef_search)
+    recall = None
+    if questions:
+        queries = embed_passages(questions, args.embedding_model, args.batch_size)
+        baseline, _ = build_index(embeddings, "flat", ids=ids)
+        recall = recall_at_k(index, baseline, queries, args.k)
+        print(
+            f"recall@{recall['k']}: {recall['recall']:.4f} sobre {len(questions)} preguntas | "
+            f"latencia {recall['latency_ms']:.3f}ms vs exacta {recall['exact_latency_ms']:.3f}ms por consulta"
+        )
+    else:
+        print("No se encontraron preguntas de prueba: no se mide el recall.")
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    faiss.write_index(index, args.output)
+    write_index_metadata(args.output, {
+        "embedding_model": args.embedding_model,
+        "dimension": int(embeddings.shape[1]),
+        "doc_count": int(index.ntotal),
+        "id_map": ids is not None,
+        "index_type": args.index_type,
+        "params": {**params, "nprobe": args.nprobe, "ef_search": args.ef_search},
+        "source": args.data,
+        "recall": recall,
+        "embedding_time": embedding_time,
+        "build_time": build_time,
+    })
+    print(f"Índice guardado en {args.output}")
+
+
+if __name__ == "__main__":
+    main()
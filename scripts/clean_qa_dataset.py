@@ -1,4 +1,28 @@
+import argparse
 import json
+import os
+import sys
+import time
+
+# Permite importar los helpers del proyecto al ejecutar el script directamente
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from infrastructure.helpers.qa_validation import QADatasetValidator, iter_records
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Valida y limpia un dataset QA por lotes: spans, duplicados y reglas de filtrado."
+    )
+    parser.add_argument("--input", default="./data/owasp_qa_dataset.jsonl", help="Dataset QA (.jsonl o .json).")
+    parser.add_argument("--output", default="./data/owasp_qa_dataset_cleaned.jsonl",
+                        help="Dataset limpio; en .jsonl se escribe a medida que se valida.")
+    parser.add_argument("--batch-size", type=int, default=10000)
+    parser.add_argument("--keep-tables", action="store_true", help="No descarta los contextos con tablas ('|').")
+    parser.add_argument("--keep-duplicates", action="store_true", help="No elimina los pares pregunta-contexto repetidos.")
+    parser.add_argument("--report", default=None, help="Ruta donde guardar el reporte de rechazos en JSON.")
+    return parser.parse_args()
+
 
 def clean_qa_dataset(data):
     """
@@ -10,58 +34,51 @@ def clean_qa_dataset(data):
     Returns:
         list: Lista de ejemplos limpios y válidos.
     """
-    cleaned_data = []
-
-    for entry in data:
-        question = entry["question"]
-        context = entry["context"]
-        answers = entry["answers"]
-
-        # Filtrar categorías irrelevantes como "Next Steps"
-        if "Next Steps" in question or "Next Steps" in context:
-            continue
-
-        # Limpiar contextos que contienen tablas o datos inútiles
-        if "|" in context:
-            continue
-
-        # Validar respuestas
-        valid_answers = [
-            ans for ans in answers if "text" in ans and "start" in ans and ans["text"]
-        ]
-        if not valid_answers:
-            continue
-
-        # Validar que las posiciones de inicio estén alineadas con el contexto
-        for ans in valid_answers:
-            start = ans["start"]
-            if start < 0 or start >= len(context):
-                continue
-            end = start + len(ans["text"])
-            if context[start:end] != ans["text"]:
-                continue
-
-        # Agregar entrada limpia
-        cleaned_data.append({
-            "question": question.strip(),
-            "context": context.strip(),
-            "answers": valid_answers
-        })
-
+    validator = QADatasetValidator()
+    cleaned_data = list(validator.validate(data))
     print(f"Ejemplos válidos tras limpieza: {len(cleaned_data)}")
     return cleaned_data
 
-# Ajuste en la preparación del dataset de QA
-qa_data_file = "../data/owasp_qa_dataset_es.json"
-with open(qa_data_file, "r", encoding="utf-8") as f:
-    qa_data = json.load(f)
 
-# Limpiar el dataset
-qa_data_cleaned = clean_qa_dataset(qa_data)
+def write_records(records, output_file):
+    """
+    Escribe los registros uno a uno: JSONL o, para `.json`, una lista con el
+    mismo formato que el resto de los datasets, sin armarla en memoria.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(output_file)), exist_ok=True)
+    with open(output_file, "w", encoding="utf-8") as output:
+        if output_file.endswith(".jsonl"):
+            for record in records:
+                output.write(json.dumps(record, ensure_ascii=False) + "\n")
+            return
+        output.write("[")
+        for position, record in enumerate(records):
+            output.write(",\n" if position else "\n")
+            output.write(json.dumps(record, indent=4, ensure_ascii=False))
+        output.write("\n]\n")
+
+
+def main():
+    args = parse_args()
+    validator = QADatasetValidator(skip_tables=not args.keep_tables, deduplicate=not args.keep_duplicates)
+
+    start_time = time.time()
+    write_records(validator.validate(iter_records(args.input), args.batch_size), args.output)
+    report = validator.report()
+    elapsed = time.time() - start_time
+
+    print(f"{report['kept']} de {report['total']} ejemplos válidos en {elapsed:.2f}s "
+          f"({report['total'] / elapsed if elapsed else 0.0:.0f} ejemplos/s)")
+    print(f"{'regla':<18}{'rechazos':>10}")
+    for rule, count in report["rejections"].items():
+        print(f"{rule:<18}{count:>10}")
+    print(f"Spans reparados: {report['repaired_spans']}, respuestas descartadas: {report['dropped_answers']}")
+    print(f"Dataset limpio guardado en {args.output}")
+
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump({"input": args.input, "output": args.output, "time": elapsed, **report}, f, indent=4)
 
-# Guardar el dataset limpio
-qa_cleaned_file = "owasp_qa_dataset_es_cleaned.json"
-with open(qa_cleaned_file, "w", encoding="utf-8") as f:
-    json.dump(qa_data_cleaned, f, indent=4, ensure_ascii=False)
 
-print(f"Dataset limpio guardado en {qa_cleaned_file}")
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+import argparse
+import json
+import os
+import sys
+
+import faiss
+
+# Permite importar los helpers del proyecto al ejecutar el script directamente
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from infrastructure.helpers.bm25_retriever import BM25Retriever
+from infrastructure.helpers.context_utils import corpus_contents
+from infrastructure.helpers.embedding_cache import EmbeddingCache
+from infrastructure.helpers.embedding_registry import default_registry
+from infrastructure.helpers.faiss_helper import search_with_faiss_batch
+from infrastructure.helpers.hybrid_search import hybrid_search_batch
+from infrastructure.helpers.retrieval_metrics import hit_rate_at_k, relevance_matrix
+from scripts.question_sets import load_question_set
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Compara hit-rate@k de la búsqueda densa, BM25 e híbrida.")
+    parser.add_argument("--questions", default="./data/test_questions_categories.json")
+    parser.add_argument("--index", default="./data/model/indice_faiss.index")
+    parser.add_argument("--data", default="./data/model/owasp_cleaned_dataset.json")
+    parser.add_argument("--embedding-model", default="all-MiniLM-L12-v2")
+    parser.add_argument("--k", type=int, nargs="*", default=[1, 3, 5])
+    parser.add_argument("--candidates", type=int, default=20)
+    parser.add_argument("--dense-weight", type=float, default=1.0)
+    parser.add_argument("--bm25-weight", type=float, default=1.0)
+    parser.add_argument("--rrf-k", type=int, default=60)
+    parser.add_argument("--min-overlap", type=float, default=0.3,
+                        help="Fracción de términos de la respuesta esperada que debe contener un pasaje relevante.")
+    parser.add_argument("--embedding-cache", default="./data/cache/embeddings.sqlite",
+                        help="Caché persistente de embeddings de las preguntas (vacío: sin caché).")
+    parser.add_argument("--output", default="./scripts/reports/retrieval_evaluation.json")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.embedding_cache:
+        default_registry.set_cache(EmbeddingCache(args.embedding_cache))
+
+    with open(args.data, "r", encoding="utf-8") as f:
+        processed_data = json.load(f)
+    contents = list(corpus_contents(processed_data))
+    index = faiss.read_index(args.index)
+    bm25 = BM25Retriever(contents)
+
+    questions = load_question_set(args.questions)
+    queries = [item["question"] for item in questions]
+    relevant = relevance_matrix([item["expected"] for item in questions], contents, args.min_overlap)
+    max_k = max(args.k)
+
+    embeddings = default_registry.encode(args.embedding_model, queries)
+    _, dense_ids = search_with_faiss_batch(queries, index, args.embedding_model, max_k, query_embeddings=embeddings)
+    _, bm25_ids = bm25.search_batch(queries, max_k)
+    _, hybrid_ids = hybrid_search_batch(
+        queries, index, bm25, args.embedding_model, max_k,
+        query_embeddings=embeddings,
+        candidates=max(args.candidates, max_k),
+        dense_weight=args.dense_weight,
+        bm25_weight=args.bm25_weight,
+        rrf_k=args.rrf_k
+    )
+
+    categories = sorted({item["category"] for item in questions})
+    report = {"questions": len(queries), "min_overlap": args.min_overlap, "results": {}}
+    for name, ids in (("dense", dense_ids), ("bm25", bm25_ids), ("hybrid", hybrid_ids)):
+        report["results"][name] = {}
+        for k in args.k:
+            hits = hit_rate_at_k(ids, relevant, k)
+            per_category = {
+                category: float(hits[[item["category"] == category for item in questions]].mean())
+                for category in categories
+            }
+            report["results"][name][f"hit_rate@{k}"] = {"overall": float(hits.mean()), "by_category": per_category}
+
+    print(f"{'retriever':<10}" + "".join(f"{f'hit@{k}':>10}" for k in args.k))
+    for name, scores in report["results"].items():
+        print(f"{name:<10}" + "".join(f"{scores[f'hit_rate@{k}']['overall']:>10.3f}" for k in args.k))
+
+    if default_registry.cache is not None:
+        cache = default_registry.cache.stats()
+        report["embedding_cache"] = cache
+        print(f"Caché de embeddings: {cache['hit_rate']:.0%} de aciertos, {cache['saved_seconds']:.2f}s ahorrados")
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=4, ensure_ascii=False)
+    print(f"Reporte guardado en {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,25 +1,180 @@
+import argparse
+import hashlib
+import json
 import os
 import re
-import json
+from concurrent.futures import ProcessPoolExecutor
+
 from markdown import markdown
 
-def extract_data_from_md(md_file):
+# Cambiar este valor invalida la caché cuando cambia la forma de extraer los pares QA
+PARSER_VERSION = "4"
+
+# Expresiones compiladas una sola vez por proceso
+LINK_RE = re.compile(r"\[.*?\]\(.*?\)")
+HTML_TAG_RE = re.compile(r"<.*?>")
+WHITESPACE_RE = re.compile(r"\s+")
+H2_SPLIT_RE = re.compile(r"<h2.*?>")
+H2_TITLE_RE = re.compile(r"^(.*?)</h2>", re.DOTALL)
+TITLE_RE = re.compile(r"^#\s+(?:A\d{2}:\d{4}\s+–\s+)?(.+?)(?:\s+!\[.*)?\s*$", re.MULTILINE)
+FILE_NAME_RE = re.compile(r"^(?P<stem>.+?)(?:\.(?P<language>[a-z]{2}(?:_[A-Z]{2})?))?\.md$")
+CATEGORY_FILE_RE = re.compile(r"^A(?:0[1-9]|10)_2021-")
+CATEGORY_PREFIX_RE = re.compile(r"A\d{2} 2021 ")
+CATEGORY_SEPARATOR_RE = re.compile(r"[-_]")
+# Título con el otro idioma entre paréntesis: "弱點描述(Description)", "Description (說明)"
+HEADING_PARENTHETICAL_RE = re.compile(r"^(?P<main>.*?)\s*[(（](?P<inner>[^()（）]*)[)）]$")
+
+# Títulos de las secciones de interés en cada idioma del Top 10 2021. Hay
+# variantes porque cada traducción no siempre usa el mismo título en los 10 archivos.
+SECTION_TITLES = {
+    "en": {"Description": "description", "How to Prevent": "prevention", "Example Attack Scenarios": "examples"},
+    "es": {"Descripción": "description", "Cómo se previene": "prevention", "Ejemplos de escenarios de ataque": "examples"},
+    "fr": {"Description": "description", "Comment s'en prémunir": "prevention", "Exemple de scénarios d'attaque": "examples"},
+    "it": {
+        "Descrizione": "description", "Come prevenire": "prevention", "Come prevenirla": "prevention",
+        "Esempi di scenari d'attacco": "examples",
+    },
+    "pt_BR": {
+        "Descrição": "description", "Como Prevenir": "prevention", "Como Previnir": "prevention",
+        "Exemplos de Cenários de Ataque": "examples", "Cenário de exemplo de um ataque": "examples",
+    },
+    "id": {
+        "Deskripsi": "description",
+        "Bagaimana Cara Mencegahnya": "prevention", "Bagaimana cara mencegah": "prevention",
+        "Cara Mencegah": "prevention", "Cara untuk mencegah": "prevention", "Cara Mengatasi": "prevention",
+        "Contoh Skenario Penyerangan": "examples", "Contoh Skenario Serangan": "examples",
+        "Contoh Skenario Penyerang": "examples",
+    },
+    "ja": {"説明": "description", "防止方法": "prevention", "攻撃シナリオの例": "examples"},
+    "zh_CN": {
+        "弱点描述": "description", "描述": "description", "如何预防": "prevention",
+        "攻击情境范例": "examples", "攻击情景范例": "examples",
+    },
+    "zh_TW": {
+        "弱點描述": "description", "描述": "description", "說明": "description", "如何預防": "prevention",
+        "攻擊情境範例": "examples",
+    },
+    "ar": {"الوصف": "description", "كيفية الحماية منها": "prevention", "أمثلة على سيناريوهات الهجوم": "examples"},
+}
+
+# Plantillas de preguntas por idioma: (sección que sirve de contexto, pregunta)
+QUESTION_TEMPLATES = {
+    "es": [
+        ("description", "¿Qué es {category}?"),
+        ("prevention", "¿Cómo prevenir {category}?"),
+        ("description", "¿Qué impacto tiene {category} en la seguridad?"),
+        ("examples", "Dame un ejemplo de {category}."),
+        ("description", "¿Qué causas tiene {category}?"),
+    ],
+    "en": [
+        ("description", "What is {category}?"),
+        ("prevention", "How to prevent {category}?"),
+        ("description", "What is the impact of {category} on security?"),
+        ("examples", "Give me an example of {category}."),
+        ("description", "What causes {category}?"),
+    ],
+    "fr": [
+        ("description", "Qu'est-ce que {category} ?"),
+        ("prevention", "Comment prévenir {category} ?"),
+        ("description", "Quel est l'impact de {category} sur la sécurité ?"),
+        ("examples", "Donne-moi un exemple de {category}."),
+        ("description", "Quelles sont les causes de {category} ?"),
+    ],
+    "it": [
+        ("description", "Che cos'è {category}?"),
+        ("prevention", "Come prevenire {category}?"),
+        ("description", "Che impatto ha {category} sulla sicurezza?"),
+        ("examples", "Fammi un esempio di {category}."),
+        ("description", "Quali sono le cause di {category}?"),
+    ],
+    "pt_BR": [
+        ("description", "O que é {category}?"),
+        ("prevention", "Como prevenir {category}?"),
+        ("description", "Qual é o impacto de {category} na segurança?"),
+        ("examples", "Dê um exemplo de {category}."),
+        ("description", "Quais são as causas de {category}?"),
+    ],
+    "id": [
+        ("description", "Apa itu {category}?"),
+        ("prevention", "Bagaimana cara mencegah {category}?"),
+        ("description", "Apa dampak {category} terhadap keamanan?"),
+        ("examples", "Berikan contoh {category}."),
+        ("description", "Apa penyebab {category}?"),
+    ],
+    "ja": [
+        ("description", "{category}とは何ですか？"),
+        ("prevention", "{category}を防ぐにはどうすればよいですか？"),
+        ("description", "{category}はセキュリティにどのような影響がありますか？"),
+        ("examples", "{category}の例を挙げてください。"),
+        ("description", "{category}の原因は何ですか？"),
+    ],
+    "zh_CN": [
+        ("description", "什么是{category}？"),
+        ("prevention", "如何预防{category}？"),
+        ("description", "{category}对安全有什么影响？"),
+        ("examples", "请举一个{category}的例子。"),
+        ("description", "{category}的成因是什么？"),
+    ],
+    "zh_TW": [
+        ("description", "什麼是{category}？"),
+        ("prevention", "如何預防{category}？"),
+        ("description", "{category}對安全有什麼影響？"),
+        ("examples", "請舉一個{category}的例子。"),
+        ("description", "{category}的成因是什麼？"),
+    ],
+    "ar": [
+        ("description", "ما هو {category}؟"),
+        ("prevention", "كيف يمكن الوقاية من {category}؟"),
+        ("description", "ما تأثير {category} على الأمان؟"),
+        ("examples", "أعطني مثالاً على {category}."),
+        ("description", "ما أسباب {category}؟"),
+    ],
+}
+
+# Nombres en español que ya usa el dataset generado con las versiones anteriores
+SPANISH_CATEGORY_NAMES = [
+    (re.compile(r"Broken Access Control", re.IGNORECASE), "el Control de Acceso Roto"),
+    (re.compile(r"Cryptographic Failures", re.IGNORECASE), "Fallos Criptográficos"),
+    (re.compile(r"Injection", re.IGNORECASE), "Inyección"),
+    (re.compile(r"Insecure Design", re.IGNORECASE), " el Diseño Inseguro"),
+    (re.compile(r"Security Misconfiguration", re.IGNORECASE), "la Mala Configuración de Seguridad"),
+]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Genera el dataset QA a partir de los markdown del OWASP Top 10, en paralelo y con caché por archivo."
+    )
+    parser.add_argument("--docs", default="./data/OWASP/2021/docs")
+    parser.add_argument("--languages", nargs="*", default=None,
+                        help="Idiomas a procesar (es, en, fr, pt_BR...). Por defecto todos los del directorio.")
+    parser.add_argument("--output", default="./data/owasp_qa_dataset.jsonl")
+    parser.add_argument("--cache-dir", default="./data/cache/ingestion")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    return parser.parse_args()
+
+
+def parse_file_name(file_name):
     """
-    Convierte el contenido Markdown a HTML para facilitar el procesamiento.
+    Retorna (nombre base, idioma) de un markdown del Top 10. Los archivos sin
+    sufijo de idioma son la versión original en inglés.
     """
-    with open(md_file, "r", encoding="utf-8") as file:
-        content = file.read()
-    return markdown(content)
+    match = FILE_NAME_RE.match(file_name)
+    if not match:
+        return None, None
+    return match.group("stem"), match.group("language") or "en"
+
 
 def preprocess_text(text):
     """
     Limpia texto eliminando enlaces, etiquetas HTML y caracteres innecesarios.
     """
-    text = re.sub(r"\[.*?\]\(.*?\)", "", text)  # Eliminar enlaces
-    text = re.sub(r"<.*?>", "", text)          # Eliminar etiquetas HTML
-    text = re.sub(r"\s+", " ", text)           # Reducir espacios múltiples
+    text = LINK_RE.sub("", text)         # Eliminar enlaces
+    text = HTML_TAG_RE.sub("", text)     # Eliminar etiquetas HTML
+    text = WHITESPACE_RE.sub(" ", text)  # Reducir espacios múltiples
     return text.strip()
 
+
 def extend_to_complete_sentence(text, limit=512):
     """
     Extiende el texto al próximo punto para completar la oración si el límite corta una palabra.
@@ -32,169 +187,241 @@ def extend_to_complete_sentence(text, limit=512):
         return text[:last_period + 1].strip()
     return text[:limit].strip()
 
-def extract_sections(html_content):
+
+def normalize_heading(text):
+    return text.strip(" :").casefold()
+
+
+def heading_candidates(heading):
+    """
+    Formas normalizadas de un título para buscarlo en SECTION_TITLES: el
+    título completo y, si trae otro idioma entre paréntesis, cada una de las partes.
+    """
+    candidates = [normalize_heading(heading)]
+    match = HEADING_PARENTHETICAL_RE.match(heading.strip())
+    if match:
+        candidates.extend(normalize_heading(match.group(part)) for part in ("main", "inner"))
+    return [candidate for candidate in candidates if candidate]
+
+
+def section_lookup(language):
+    """
+    Título normalizado -> sección para un idioma. Los títulos en inglés quedan
+    de respaldo: varias traducciones dejan secciones sin traducir o ponen el
+    original entre paréntesis.
+    """
+    lookup = {normalize_heading(title): key for title, key in SECTION_TITLES["en"].items()}
+    lookup.update((normalize_heading(title), key) for title, key in SECTION_TITLES.get(language, {}).items())
+    return lookup
+
+
+def extract_sections(html_content, language):
     """
-    Extrae secciones clave como Descripción, Cómo se previene, y Ejemplos.
+    Extrae secciones clave como Descripción, Cómo se previene, y Ejemplos,
+    reconociendo el título de cada sección en el idioma del archivo. Si un
+    título se repite (p. ej. traducción seguida del original) gana el primero.
     """
     sections = {"description": "", "prevention": "", "examples": ""}
-    section_titles = {
-        "Descripción": "description",
-        "Cómo se previene": "prevention",
-        "Ejemplos de escenarios de ataque": "examples"
-    }
+    lookup = section_lookup(language)
 
-    split_content = re.split(r"<h2.*?>", html_content)
-    for section in split_content:
-        for title, key in section_titles.items():
-            if title.lower() in section.lower():
-                sections[key] = preprocess_text(section)
+    for section in H2_SPLIT_RE.split(html_content)[1:]:
+        heading = H2_TITLE_RE.match(section)
+        if not heading:
+            continue
+        candidates = heading_candidates(preprocess_text(heading.group(1)))
+        key = next((lookup[candidate] for candidate in candidates if candidate in lookup), None)
+        if key and not sections[key]:
+            sections[key] = preprocess_text(section)
     return sections
 
-def find_relevant_answer(context, category):
+
+def find_relevant_answer(context, category, section_titles=()):
     """
     Encuentra una respuesta relevante en el contexto basada en la categoría.
-    Elimina títulos como 'Descripción' o 'Cómo se previene' de la respuesta.
+    Salta títulos como 'Descripción' o 'Cómo se previene' al buscar la
+    respuesta; `start` es siempre la posición en el contexto completo.
     """
-    context = re.sub(r"^(Descripción|Cómo se previene|Ejemplos de escenarios de ataque):?", "", context, flags=re.IGNORECASE).strip()
-    answer_start = context.lower().find(category.lower())
+    lowered = context.lower()
+    offset = 0
+    # Primero los títulos más largos: "Cara Mencegahnya" antes que "Cara Mencegah"
+    for title in sorted(section_titles, key=len, reverse=True):
+        if lowered.startswith(title.lower()):
+            offset = len(title)
+            while offset < len(context) and (context[offset] == ":" or context[offset].isspace()):
+                offset += 1
+            # El título en el otro idioma entre paréntesis también se salta
+            if offset < len(context) and context[offset] in "(（":
+                closing = min(
+                    (position for position in (context.find(")", offset), context.find("）", offset)) if position != -1),
+                    default=-1
+                )
+                if closing != -1:
+                    offset = closing + 1
+                    while offset < len(context) and (context[offset] == ":" or context[offset].isspace()):
+                        offset += 1
+            break
+    answer_start = lowered.find(category.lower(), offset)
     if answer_start != -1:
         end = context.find(".", answer_start)
         if end == -1:
             end = len(context)
         return {
-            "text": context[answer_start:end].strip(),
+            "text": context[answer_start:end].rstrip(),
             "start": answer_start
         }
-    first_sentence = context.split(".")[0]
+    end = context.find(".", offset)
     return {
-        "text": first_sentence.strip(),
-        "start": context.find(first_sentence)
+        "text": context[offset:end if end != -1 else len(context)].rstrip(),
+        "start": offset
     }
 
-def generate_questions(category, sections, language):
+
+def category_name(stem, title, language):
     """
-    Genera preguntas diversificadas para cada categoría y sección.
+    Nombre de la categoría usado en las preguntas. En español se mantiene el
+    nombre derivado del archivo (como en las versiones anteriores del dataset);
+    en el resto de idiomas se usa el título traducido del documento.
     """
-    # Eliminar prefijos y sufijos no deseados
-    category = re.sub(r"A\\d{2} 2021 ", "", category)  # Eliminar prefijo "A## 2021"
-    category = re.sub(r"\\.es$", "", category)  # Eliminar sufijo .es
-
+    if language not in ("es", "en") and title:
+        return title.strip()
+    category = CATEGORY_SEPARATOR_RE.sub(" ", stem)
+    category = CATEGORY_PREFIX_RE.sub("", category)
+    if language == "es":
+        for pattern, replacement in SPANISH_CATEGORY_NAMES:
+            category = pattern.sub(replacement, category)
+    return category.strip()
 
-    category = re.sub(r"Broken Access Control", "el Control de Acceso Roto", category, flags=re.IGNORECASE)
-    category = re.sub(r"Cryptographic Failures", "Fallos Criptográficos", category, flags=re.IGNORECASE)
-    category = re.sub(r"Injection", "Inyección", category, flags=re.IGNORECASE)
-    category = re.sub(r"Insecure Design", " el Diseño Inseguro", category, flags=re.IGNORECASE)
-    category = re.sub(r"Security Misconfiguration", "la Mala Configuración de Seguridad", category, flags=re.IGNORECASE)
 
-    if language == "es":
-        questions = [
-            f"¿Qué es {category}?",
-            f"¿Cómo prevenir {category}?",
-            f"¿Qué impacto tiene {category} en la seguridad?",
-            f"Dame un ejemplo de {category}.",
-            f"¿Qué causas tiene {category}?"
-        ]
-    else:
-        questions = [
-            f"What is {category}?",
-            f"How to prevent {category}?",
-            f"What is the impact of {category} on security?",
-            f"Give me an example of {category}.",
-            f"What causes {category}?"
-        ]
-
-    # Asociar preguntas con contextos adecuados
+def generate_questions(category, sections, language):
+    """
+    Genera preguntas diversificadas para cada categoría y sección.
+    """
+    section_titles = list(SECTION_TITLES.get(language, {})) + list(SECTION_TITLES["en"])
     qa_pairs = []
-    for question in questions:
-        if "prevenir" in question or "prevent" in question:
-            context = sections.get("prevention", "")
-        elif "ejemplo" in question or "example" in question:
-            context = sections.get("examples", "")
-        else:
-            context = sections.get("description", "")
+    for section_key, template in QUESTION_TEMPLATES.get(language, QUESTION_TEMPLATES["en"]):
+        context = sections.get(section_key, "")
         if context:
-            context = extend_to_complete_sentence(context, 512) 
-            answer = find_relevant_answer(context, category)
+            context = extend_to_complete_sentence(context, 512)
+            answer = find_relevant_answer(context, category, section_titles)
             qa_pairs.append({
-                "question": question,
+                "question": template.format(category=category).strip(),
                 "context": context,
                 "answers": [answer]
             })
     return qa_pairs
 
 
-def is_valid_file(file_name, language):
+def process_file(md_path):
     """
-    Verifica si un archivo cumple con los criterios de idioma y formato.
+    Convierte un markdown a HTML y extrae sus pares QA. Se ejecuta en un
+    proceso del pool, así que solo recibe la ruta y retorna datos serializables.
     """
-    excluded_extensions = (".ar.md", ".fr.md", ".id.md", ".it.md", ".ja.md", "pt_BR.md", "zh_CN.md", "zh_TW.md")
-    if file_name.endswith(excluded_extensions):
-        return False
-    if language == "es" and file_name.endswith(".es.md"):
-        return True
-    if language == "en" and file_name.endswith(".md") and not file_name.endswith(".es.md"):
-        return True
-    return False
+    file_name = os.path.basename(md_path)
+    stem, language = parse_file_name(file_name)
+    with open(md_path, "r", encoding="utf-8") as file:
+        content = file.read()
 
-def build_dataset(md_folder, language):
-    """
-    Construye un dataset QA a partir de archivos Markdown relevantes.
-    """
-    dataset = []
-    for md_file in os.listdir(md_folder):
-        if is_valid_file(md_file, language):
-            print(f"Procesando archivo: {md_file}")
-            html_content = extract_data_from_md(os.path.join(md_folder, md_file))
-            sections = extract_sections(html_content)
+    title = TITLE_RE.search(content)
+    sections = extract_sections(markdown(content), language)
+    if CATEGORY_FILE_RE.match(file_name):
+        missing = [key for key, text in sections.items() if not text]
+        if missing:
+            # Sin la sección no hay contexto para sus preguntas: se pierden esos pares
+            print(f"Advertencia: {file_name} sin sección {', '.join(missing)}; se omiten sus preguntas.")
+    category = category_name(stem, title.group(1) if title else "", language)
+
+    records = generate_questions(category, sections, language)
+    for record in records:
+        record["language"] = language
+        record["source"] = file_name
+    return records
+
+
+def file_hash(md_path):
+    hasher = hashlib.sha256(PARSER_VERSION.encode("utf-8"))
+    hasher.update(os.path.basename(md_path).encode("utf-8"))
+    with open(md_path, "rb") as file:
+        hasher.update(file.read())
+    return hasher.hexdigest()
 
-            # Extraer y limpiar la categoría
-            category = os.path.splitext(md_file)[0]  # Nombre del archivo sin extensión
-            category = re.sub(r"[-_]", " ", category)  # Reemplazar guiones y subrayados por espacios
-            category = re.sub(r"\\.es$", "", category)  # Eliminar el sufijo .es
 
-            qa_pairs = generate_questions(category, sections, language)
-            dataset.extend(qa_pairs)
-    return dataset
+def load_cached(cache_dir, digest):
+    cache_path = os.path.join(cache_dir, f"{digest}.json")
+    if not os.path.exists(cache_path):
+        return None
+    with open(cache_path, "r", encoding="utf-8") as f:
+        return json.load(f)
 
 
-def clean_and_refine_dataset(dataset):
+def store_cached(cache_dir, digest, records):
+    os.makedirs(cache_dir, exist_ok=True)
+    cache_path = os.path.join(cache_dir, f"{digest}.json")
+    tmp_path = f"{cache_path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(records, f, ensure_ascii=False)
+    os.replace(tmp_path, cache_path)
+
+
+def list_markdown_files(docs_folder, languages=None):
     """
-    Limpia y mejora el dataset eliminando redundancias y alineando preguntas, respuestas y contextos.
+    Markdown del directorio ordenados por nombre, filtrados por idioma si se indica.
     """
-    refined_dataset = []
-    for entry in dataset:
-        # Limpiar la pregunta
-        question = re.sub(r"A\d{2} 2021 ", "", entry["question"])  # Eliminar prefijo A## 2021
-        question = re.sub(r"\.es$", "", question).strip()  # Eliminar sufijo .es
-        
-        # Añadir la entrada refinada al dataset
-        refined_dataset.append({
-            "question": question,
-            "context": entry["context"],
-            "answers": entry["answers"]
-        })
-    return refined_dataset
-
-# Configuración inicial
-md_folder = "../data/OWASP/2021/docs"  
-language = "es"
+    files = []
+    for file_name in sorted(os.listdir(docs_folder)):
+        path = os.path.join(docs_folder, file_name)
+        _, language = parse_file_name(file_name)
+        if not os.path.isfile(path) or language is None:
+            continue
+        if languages and language not in languages:
+            continue
+        files.append(path)
+    return files
 
-# Generar dataset inicial
-raw_dataset = build_dataset(md_folder, language)
 
-# Limpiar y refinar dataset
-final_dataset = clean_and_refine_dataset(raw_dataset)
+def build_dataset(docs_folder, output_file, languages=None, cache_dir=None, workers=None):
+    """
+    Construye el dataset QA y lo escribe en JSONL a medida que se obtiene cada
+    archivo. Solo se vuelven a procesar los archivos cuyo contenido cambió
+    desde la última ejecución; el resto se toma de la caché.
+    Retorna (registros escritos, archivos procesados, archivos desde caché).
+    """
+    files = list_markdown_files(docs_folder, languages)
+    digests = {path: file_hash(path) for path in files}
 
-import os
+    cached = {}
+    if cache_dir:
+        for path, digest in digests.items():
+            records = load_cached(cache_dir, digest)
+            if records is not None:
+                cached[path] = records
+    pending = [path for path in files if path not in cached]
+    print(f"{len(files)} archivos: {len(pending)} por procesar, {len(cached)} desde caché")
 
-output_folder = "../data"
-os.makedirs(output_folder, exist_ok=True)
+    os.makedirs(os.path.dirname(os.path.abspath(output_file)), exist_ok=True)
+    written = 0
+    with ProcessPoolExecutor(max_workers=workers) as executor, open(output_file, "w", encoding="utf-8") as output:
+        futures = {path: executor.submit(process_file, path) for path in pending}
+        for path in files:
+            if path in cached:
+                records = cached[path]
+            else:
+                records = futures[path].result()
+                print(f"Procesado: {os.path.basename(path)} ({len(records)} pares)")
+                if cache_dir:
+                    store_cached(cache_dir, digests[path], records)
+            for record in records:
+                output.write(json.dumps(record, ensure_ascii=False) + "\n")
+            written += len(records)
+    return written, len(pending), len(cached)
 
-# Guardar el archivo en la carpeta 'data'
-output_file = os.path.join(output_folder, "owasp_qa_dataset_es.json")
 
-with open(output_file, "w", encoding="utf-8") as f:
-    json.dump(final_dataset, f, indent=4, ensure_ascii=False)
+def main():
+    args = parse_args()
+    written, parsed, from_cache = build_dataset(
+        args.docs, args.output, args.languages, args.cache_dir, args.workers
+    )
+    print(f"{written} pares QA guardados en {args.output} ({parsed} archivos procesados, {from_cache} desde caché)")
 
-print(f"Dataset refinado guardado en {output_file}")
 
+if __name__ == "__main__":
+    main()
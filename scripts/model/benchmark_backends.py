@@ -0,0 +1,141 @@
+import argparse
+import difflib
+import json
+import multiprocessing
+import os
+import resource
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+# Permite importar los helpers del proyecto al ejecutar el script directamente
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from infrastructure.helpers.generation_backends import GENERATION_BACKENDS
+from infrastructure.helpers.response_formatter import DETERMINISTIC_GENERATION_KWARGS, build_prompt, extract_response
+from scripts.question_sets import load_question_set
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Compara latencia, memoria y calidad de cada backend de generación contra fp32."
+    )
+    parser.add_argument("--model", default="pdazad/fine_tuned_bloom_owasp")
+    parser.add_argument("--backends", nargs="*", default=list(GENERATION_BACKENDS), choices=GENERATION_BACKENDS)
+    parser.add_argument("--questions", default="./data/test_questions_categories.json")
+    parser.add_argument("--data", default="./data/model/owasp_cleaned_dataset.json",
+                        help="Corpus del que se toma el contexto de cada pregunta.")
+    parser.add_argument("--index", default="./data/model/indice_faiss.index")
+    parser.add_argument("--embedding-model", default="all-MiniLM-L12-v2")
+    parser.add_argument("--onnx-dir", default="./data/model/onnx")
+    parser.add_argument("--output", default="./scripts/reports/backend_benchmark.json")
+    return parser.parse_args()
+
+
+def build_prompts(args):
+    """
+    Arma los prompts con el mismo contexto FAISS que usaría la API para cada pregunta.
+    """
+    import faiss
+    from infrastructure.helpers.context_utils import build_contexts, corpus_contents
+    from infrastructure.helpers.faiss_helper import search_with_faiss_batch
+
+    with open(args.data, "r", encoding="utf-8") as f:
+        processed_data = json.load(f)
+    questions = [item["question"] for item in load_question_set(args.questions)]
+    index = faiss.read_index(args.index)
+    _, indices = search_with_faiss_batch(questions, index, args.embedding_model, 3)
+    contexts = build_contexts(indices, corpus_contents(processed_data))
+    return [build_prompt(question, context) for question, context in zip(questions, contexts)]
+
+
+def run_backend(model_path, backend, prompts, onnx_dir):
+    """
+    Se ejecuta en un proceso propio para que la memoria medida sea solo la de este backend.
+    """
+    from transformers import AutoTokenizer, pipeline
+    from infrastructure.helpers.generation_backends import load_generation_model
+
+    start_time = time.time()
+    tokenizer = AutoTokenizer.from_pretrained(model_path)
+    model = load_generation_model(model_path, backend, onnx_dir)
+    text_gen_pipeline = pipeline("text-generation", model=model, tokenizer=tokenizer)
+    load_time = time.time() - start_time
+
+    # Una llamada de calentamiento que no se mide
+    text_gen_pipeline(prompts[0], **DETERMINISTIC_GENERATION_KWARGS)
+
+    outputs, latencies, tokens = [], [], 0
+    for prompt in prompts:
+        start_time = time.time()
+        result = text_gen_pipeline(prompt, **DETERMINISTIC_GENERATION_KWARGS)
+        latencies.append(time.time() - start_time)
+        generated = result[0]["generated_text"]
+        tokens += len(tokenizer(generated[len(prompt):], add_special_tokens=False)["input_ids"])
+        outputs.append(extract_response(generated, prompt))
+
+    return {
+        "backend": backend,
+        "load_time": load_time,
+        "avg_latency": sum(latencies) / len(latencies),
+        "max_latency": max(latencies),
+        "tokens_per_second": tokens / sum(latencies) if sum(latencies) else 0.0,
+        # En Linux ru_maxrss viene en KB
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "outputs": outputs,
+    }
+
+
+def parity(reference_outputs, outputs):
+    """
+    Calidad respecto de fp32 con decodificación voraz: coincidencia exacta y similitud de texto.
+    """
+    exact = sum(ref == out for ref, out in zip(reference_outputs, outputs))
+    similarity = [difflib.SequenceMatcher(None, ref, out).ratio() for ref, out in zip(reference_outputs, outputs)]
+    return {
+        "exact_match": exact / len(outputs),
+        "avg_similarity": sum(similarity) / len(similarity),
+        "min_similarity": min(similarity),
+    }
+
+
+def main():
+    args = parse_args()
+    prompts = build_prompts(args)
+    print(f"{len(prompts)} prompts preparados")
+
+    backends = ["fp32"] + [backend for backend in args.backends if backend != "fp32"]
+    results = {}
+    context = multiprocessing.get_context("spawn")
+    for backend in backends:
+        print(f"Midiendo backend {backend}...")
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            try:
+                results[backend] = executor.submit(run_backend, args.model, backend, prompts, args.onnx_dir).result()
+            except Exception as e:
+                print(f"El backend {backend} falló: {str(e)}")
+                results[backend] = {"backend": backend, "error": str(e)}
+
+    reference = results["fp32"].get("outputs")
+    print(f"\n{'backend':<8}{'carga(s)':>10}{'lat.(s)':>10}{'tok/s':>10}{'RSS(MB)':>10}{'exacto':>10}{'simil.':>10}")
+    for backend, result in results.items():
+        if "error" in result:
+            print(f"{backend:<8} error: {result['error']}")
+            continue
+        if reference:
+            result["parity"] = parity(reference, result["outputs"])
+        quality = result.get("parity", {})
+        print(
+            f"{backend:<8}{result['load_time']:>10.2f}{result['avg_latency']:>10.2f}"
+            f"{result['tokens_per_second']:>10.1f}{result['peak_rss_mb']:>10.0f}"
+            f"{quality.get('exact_match', 0):>10.2f}{quality.get('avg_similarity', 0):>10.2f}"
+        )
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=4, ensure_ascii=False)
+    print(f"\nReporte guardado en {args.output}")
+
+
+if __name__ == "__main__":
+    main()
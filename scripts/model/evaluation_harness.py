@@ -0,0 +1,286 @@
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import faiss
+import numpy as np
+
+# Permite importar los helpers del proyecto al ejecutar el script directamente
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from infrastructure.helpers.bm25_retriever import BM25Retriever, tokenize
+from infrastructure.helpers.context_utils import build_contexts, corpus_contents, ensure_context
+from infrastructure.helpers.early_stopping import STOP_SEQUENCES
+from infrastructure.helpers.embedding_cache import EmbeddingCache
+from infrastructure.helpers.embedding_registry import default_registry
+from infrastructure.helpers.faiss_helper import search_with_faiss_batch
+from infrastructure.helpers.hybrid_search import hybrid_search_batch
+from infrastructure.helpers.response_formatter import (
+    DETERMINISTIC_GENERATION_KWARGS, GENERATION_KWARGS, generate_responses_batch
+)
+from infrastructure.helpers.retrieval_metrics import hit_rate_at_k, relevance_matrix
+from infrastructure.helpers.stub_generator import STUB_BACKEND, StubTextGenerationPipeline
+from infrastructure.helpers.tfidf_index import TfidfSectionIndex
+from scripts.benchmark.results import compare_with_baseline, latency_summary, save_results
+from scripts.question_sets import load_question_set
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Evalúa recuperación y generación sobre conjuntos de preguntas, en lotes y en paralelo."
+    )
+    parser.add_argument("--questions", nargs="*",
+                        default=["./data/test_questions.json", "./data/test_questions_categories.json"])
+    parser.add_argument("--limit", type=int, default=None, help="Evalúa solo las primeras N preguntas.")
+    parser.add_argument("--model", default="pdazad/fine_tuned_bloom_owasp")
+    parser.add_argument("--backend", default="fp32", help="fp32, int8, bf16, onnx o stub.")
+    parser.add_argument("--onnx-dir", default="./data/model/onnx")
+    parser.add_argument("--index", default="./data/model/indice_faiss.index")
+    parser.add_argument("--data", default="./data/model/owasp_cleaned_dataset.json")
+    parser.add_argument("--tfidf-index", default="./data/model/tfidf_index.pkl",
+                        help="Índice TF-IDF preconstruido para truncar el contexto de respaldo.")
+    parser.add_argument("--embedding-model", default="all-MiniLM-L12-v2")
+    parser.add_argument("--embedding-cache", default="./data/cache/embeddings.sqlite",
+                        help="Caché persistente de embeddings de las preguntas (vacío: sin caché).")
+    parser.add_argument("--retriever", choices=("dense", "hybrid"), default="hybrid")
+    parser.add_argument("--top-k", type=int, default=3, help="Pasajes que forman el contexto.")
+    parser.add_argument("--k", type=int, nargs="*", default=[1, 3, 5], help="k para hit-rate@k.")
+    parser.add_argument("--candidates", type=int, default=20)
+    parser.add_argument("--min-overlap", type=float, default=0.3,
+                        help="Fracción de términos de la respuesta esperada que debe contener un pasaje relevante.")
+    parser.add_argument("--batch-size", type=int, default=8, help="Prompts por lote de generación.")
+    parser.add_argument("--workers", type=int, default=1, help="Lotes de generación en paralelo.")
+    parser.add_argument("--sample", action="store_true",
+                        help="Decodificación por muestreo; por defecto es voraz para que las corridas sean comparables.")
+    parser.add_argument("--no-early-stop", action="store_true", help="Genera siempre hasta max_new_tokens.")
+    parser.add_argument("--skip-generation", action="store_true", help="Evalúa solo la recuperación.")
+    parser.add_argument("--stub-ms-per-token", type=float, default=20.0)
+    parser.add_argument("--output-dir", default="./scripts/reports/evaluations")
+    parser.add_argument("--baseline", default=None, help="Reporte anterior contra el que comparar.")
+    return parser.parse_args()
+
+
+def load_generator(args):
+    """
+    Carga tokenizer, modelo y pipeline una sola vez para toda la evaluación.
+    """
+    if args.backend == STUB_BACKEND:
+        print(f"Usando generador stub ({args.stub_ms_per_token}ms por token)")
+        return StubTextGenerationPipeline(args.stub_ms_per_token)
+
+    import torch
+    from transformers import AutoTokenizer, pipeline
+    from infrastructure.helpers.generation_backends import load_generation_model
+
+    # Cada worker genera su propio lote: se reparten los hilos de torch entre ellos
+    torch.set_num_threads(max(1, (os.cpu_count() or 1) // args.workers))
+    print(f"Cargando modelo {args.model} (backend {args.backend})...")
+    tokenizer = AutoTokenizer.from_pretrained(args.model)
+    tokenizer.padding_side = "left"
+    model = load_generation_model(args.model, args.backend, args.onnx_dir)
+    return pipeline("text-generation", model=model, tokenizer=tokenizer)
+
+
+def load_tfidf_index(path, contents, tokenizer):
+    """
+    Carga el índice TF-IDF igual que el servicio: reutiliza el guardado si
+    corresponde al corpus y al tokenizer, y si no lo reajusta y lo guarda.
+    """
+    if os.path.exists(path):
+        print(f"Cargando índice TF-IDF desde {path}...")
+        tfidf_index = TfidfSectionIndex.load(path)
+        if tfidf_index.matches(contents, tokenizer):
+            return tfidf_index
+        print("El índice TF-IDF no corresponde al corpus o tokenizer actual, se reconstruye.")
+
+    print("Ajustando índice TF-IDF sobre el corpus...")
+    tfidf_index = TfidfSectionIndex.fit([contents[i] for i in range(len(contents))], tokenizer)
+    tfidf_index.save(path)
+    return tfidf_index
+
+
+def retrieve(args, queries, index, bm25, max_k):
+    """
+    Codifica todas las preguntas de una vez y retorna la matriz de ids (len(queries), max_k).
+    """
+    embeddings = default_registry.encode(args.embedding_model, queries)
+    if args.retriever == "hybrid":
+        _, ids = hybrid_search_batch(
+            queries, index, bm25, args.embedding_model, max_k,
+            query_embeddings=embeddings, candidates=max(args.candidates, max_k)
+        )
+    else:
+        _, ids = search_with_faiss_batch(queries, index, args.embedding_model, max_k, query_embeddings=embeddings)
+    return np.asarray(ids)
+
+
+def generate(args, text_gen_pipeline, queries, contexts):
+    """
+    Reparte las preguntas en lotes de `batch_size` y ejecuta hasta `workers`
+    lotes a la vez. Retorna (respuestas, latencias); la latencia de cada
+    pregunta es la del lote en el que se generó. Las preguntas cuya
+    generación falló quedan con respuesta y latencia None.
+    """
+    generation_kwargs = dict(GENERATION_KWARGS if args.sample else DETERMINISTIC_GENERATION_KWARGS)
+    if not args.no_early_stop:
+        generation_kwargs["stop_sequences"] = STOP_SEQUENCES
+
+    chunks = [range(start, min(start + args.batch_size, len(queries)))
+              for start in range(0, len(queries), args.batch_size)]
+
+    def _run(chunk):
+        return generate_responses_batch(
+            [queries[i] for i in chunk], [contexts[i] for i in chunk], text_gen_pipeline,
+            args.batch_size, generation_kwargs
+        )
+
+    responses, latencies = [None] * len(queries), [None] * len(queries)
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        for chunk, outputs in zip(chunks, executor.map(_run, chunks)):
+            for position, output in zip(chunk, outputs):
+                if isinstance(output, Exception):
+                    print(f"Error en la pregunta {position}: {output}")
+                    continue
+                responses[position], latencies[position], _ = output
+    return responses, latencies
+
+
+def rouge_scores(predictions, references):
+    """
+    ROUGE-1 y ROUGE-L por pregunta, calculados en una sola llamada. Se
+    tokeniza igual que BM25 para no perder las palabras con tildes.
+    """
+    import evaluate
+
+    rouge = evaluate.load("rouge")
+    result = rouge.compute(
+        predictions=predictions, references=references, rouge_types=["rouge1", "rougeL"],
+        use_aggregator=False, tokenizer=tokenize
+    )
+    return np.asarray(result["rouge1"], dtype=np.float64), np.asarray(result["rougeL"], dtype=np.float64)
+
+
+def main():
+    args = parse_args()
+    if args.embedding_cache:
+        default_registry.set_cache(EmbeddingCache(args.embedding_cache))
+
+    questions = []
+    for path in args.questions:
+        questions.extend(load_question_set(path))
+    questions = questions[:args.limit]
+    queries = [item["question"] for item in questions]
+    categories = np.asarray([item["category"] for item in questions])
+    print(f"{len(queries)} preguntas a evaluar")
+
+    start_time = time.time()
+    with open(args.data, "r", encoding="utf-8") as f:
+        processed_data = json.load(f)
+    contents = corpus_contents(processed_data)
+    index = faiss.read_index(args.index)
+    bm25 = BM25Retriever(list(contents)) if args.retriever == "hybrid" else None
+    text_gen_pipeline = None if args.skip_generation else load_generator(args)
+    load_time = time.time() - start_time
+
+    # Recuperación: hit-rate@k vectorizado contra la relevancia por solapamiento de términos
+    max_k = max(args.k + [args.top_k])
+    retrieval_start = time.time()
+    ids = retrieve(args, queries, index, bm25, max_k)
+    retrieval_time = time.time() - retrieval_start
+    relevant = relevance_matrix([item["expected"] for item in questions], contents, args.min_overlap)
+    hits = {k: hit_rate_at_k(ids, relevant, k) for k in args.k}
+
+    results = {
+        "config": {key: value for key, value in vars(args).items() if key not in ("output_dir", "baseline")},
+        "questions": len(queries),
+        "load_time": load_time,
+        "retrieval_time": retrieval_time,
+        "retrieval": {f"hit_rate@{k}": float(hits[k].mean()) for k in args.k},
+    }
+
+    responses, latencies = [None] * len(queries), [None] * len(queries)
+    rouge1, rouge_l = np.full(len(queries), np.nan), np.full(len(queries), np.nan)
+    if text_gen_pipeline is not None:
+        tokenizer = getattr(text_gen_pipeline, "tokenizer", None)
+        tfidf_index = load_tfidf_index(args.tfidf_index, contents, tokenizer)
+        contexts = [
+            ensure_context(context, query, processed_data, tfidf_index=tfidf_index, tokenizer=tokenizer)
+            for query, context in zip(queries, build_contexts(ids[:, :args.top_k], contents))
+        ]
+        generation_start = time.time()
+        responses, latencies = generate(args, text_gen_pipeline, queries, contexts)
+        generation_time = time.time() - generation_start
+
+        # Las generaciones fallidas no se puntúan: un "" bajaría ROUGE sin medir al modelo
+        succeeded = [position for position, response in enumerate(responses) if response is not None]
+        failed = len(queries) - len(succeeded)
+        if failed:
+            print(f"{failed} de {len(queries)} generaciones fallaron y se excluyen de ROUGE")
+        if succeeded:
+            scored = rouge_scores(
+                [responses[position] for position in succeeded],
+                [questions[position]["expected"] for position in succeeded]
+            )
+            rouge1[succeeded], rouge_l[succeeded] = scored
+        measured = [latency for latency in latencies if latency is not None]
+        results["generation"] = {
+            "rouge1": None if not succeeded else float(np.nanmean(rouge1)),
+            "rougeL": None if not succeeded else float(np.nanmean(rouge_l)),
+            "failed": failed,
+            "time": generation_time,
+            "questions_per_second": len(queries) / generation_time if generation_time else 0.0,
+            "latency": latency_summary(measured),
+        }
+
+    results["by_category"] = {
+        category: {
+            "questions": int(mask.sum()),
+            **{f"hit_rate@{k}": float(hits[k][mask].mean()) for k in args.k},
+            "rougeL": None if np.isnan(rouge_l[mask]).all() else float(np.nanmean(rouge_l[mask])),
+        }
+        for category in sorted(set(categories))
+        for mask in [categories == category]
+    }
+    results["details"] = [
+        {
+            "question": item["question"],
+            "category": item["category"],
+            "expected": item["expected"],
+            "retrieved_ids": [int(doc_id) for doc_id in ids[position, :args.top_k]],
+            **{f"hit@{k}": bool(hits[k][position]) for k in args.k},
+            "generated": responses[position],
+            "rouge1": None if np.isnan(rouge1[position]) else float(rouge1[position]),
+            "rougeL": None if np.isnan(rouge_l[position]) else float(rouge_l[position]),
+            "latency": latencies[position],
+        }
+        for position, item in enumerate(questions)
+    ]
+    if default_registry.cache is not None:
+        results["embedding_cache"] = default_registry.cache.stats()
+
+    print(f"\n{'métrica':<16}{'valor':>10}")
+    for name, value in results["retrieval"].items():
+        print(f"{name:<16}{value:>10.3f}")
+    if "generation" in results:
+        generation = results["generation"]
+        if generation["rougeL"] is not None:
+            print(f"{'rouge1':<16}{generation['rouge1']:>10.3f}")
+            print(f"{'rougeL':<16}{generation['rougeL']:>10.3f}")
+        print(f"{'fallidas':<16}{generation['failed']:>10d}")
+        print(f"{'preguntas/s':<16}{generation['questions_per_second']:>10.2f}")
+        if generation["latency"]["count"]:
+            print(f"{'p95 lote (s)':<16}{generation['latency']['p95']:>10.2f}")
+
+    save_results(results, args.output_dir, "evaluation")
+    if args.baseline:
+        compare_with_baseline(
+            {"retrieval": results["retrieval"], "generation": results.get("generation")}, args.baseline,
+            metrics=[f"hit_rate@{k}" for k in args.k] + ["rougeL", "p50", "p95", "questions_per_second"]
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,24 @@
 import json
+import os
+import sys
 import time
 import faiss
 from transformers import AutoTokenizer, AutoModelForCausalLM, pipeline
-from sentence_transformers import SentenceTransformer
 from sklearn.feature_extraction.text import TfidfVectorizer
 import evaluate
 
+# Permite importar los helpers del proyecto al ejecutar el script directamente
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from infrastructure.helpers.embedding_cache import EmbeddingCache
+from infrastructure.helpers.embedding_registry import default_registry
+
 # Configuración global
 MODEL_PATH = "pdazad/fine_tuned_bloom_owasp"
 INDEX_FILE = "./indice_faiss.index"
 DATA_FILE = "./owasp_cleaned_dataset.json"
 EMBEDDING_MODEL_NAME = "all-MiniLM-L12-v2"
+EMBEDDING_CACHE_FILE = "./embeddings.sqlite"
 
 # Cargar métricas
 rouge_metric = evaluate.load("rouge")
@@ -29,9 +37,8 @@ def load_faiss_index(index_path):
 
 
 def generate_embeddings(query, embedding_model_name):
-    """Genera embeddings para una consulta."""
-    model = SentenceTransformer(embedding_model_name)
-    return model.encode([query], convert_to_numpy=True)
+    """Genera embeddings para una consulta reutilizando el modelo ya cargado."""
+    return default_registry.encode(embedding_model_name, [query])
 
 
 def search_with_faiss(query, index, data, top_k=3):
@@ -96,9 +103,8 @@ def truncate_context_with_tfidf(context, query, max_tokens=512):
     return "\n".join(truncated_context)
 
 
-def generate_response(query, context, tokenizer, model):
-    """Genera una respuesta usando el modelo fine-tuned."""
-    pipeline_gen = pipeline("text-generation", model=model, tokenizer=tokenizer)
+def generate_response(query, context, pipeline_gen):
+    """Genera una respuesta usando el pipeline del modelo fine-tuned, creado una sola vez."""
     prompt = (
         f"Pregunta: {query}\n"
         f"Contexto: {context}\n\n"
@@ -117,17 +123,21 @@ def generate_response(query, context, tokenizer, model):
 def evaluate_responses(predictions, references):
     """Evalúa las respuestas generadas usando Rouge-L."""
     result = rouge_metric.compute(predictions=predictions, references=references)
-    rouge_l_f1 = result["rougeL"].mid.fmeasure
-    return rouge_l_f1
+    # Las versiones actuales de `evaluate` retornan directamente el F1 agregado
+    return float(result["rougeL"])
 
 
 # Pruebas de inferencia
 
 
 def run_inference_tests(index, data, model_path):
-    """Ejecuta pruebas de inferencia con diferentes tipos de preguntas."""
+    """
+    Ejecuta pruebas de inferencia con diferentes tipos de preguntas.
+    Para evaluar conjuntos completos en lotes usar scripts/model/evaluation_harness.py.
+    """
     tokenizer = AutoTokenizer.from_pretrained(model_path)
     model = AutoModelForCausalLM.from_pretrained(model_path)
+    pipeline_gen = pipeline("text-generation", model=model, tokenizer=tokenizer)
 
     # Preguntas de prueba
     test_cases = [
@@ -150,7 +160,7 @@ def run_inference_tests(index, data, model_path):
         context = ensure_context(context, query, data)
 
         # Generar respuesta
-        response, response_time = generate_response(query, context, tokenizer, model)
+        response, response_time, _ = generate_response(query, context, pipeline_gen)
 
         # Guardar resultados
         predictions.append(response)
@@ -167,6 +177,9 @@ def run_inference_tests(index, data, model_path):
     # Evaluar métricas
     rouge_l_score = evaluate_responses(predictions, references)
     print(f"\nMétrica Rouge-L: {rouge_l_score:.4f}")
+    if default_registry.cache is not None:
+        cache = default_registry.cache.stats()
+        print(f"Caché de embeddings: {cache['hit_rate']:.0%} de aciertos, {cache['saved_seconds']:.2f}s ahorrados")
 
 
 # Ejecución principal
@@ -174,6 +187,7 @@ def run_inference_tests(index, data, model_path):
 
 if __name__ == "__main__":
     # Cargar datos y modelo
+    default_registry.set_cache(EmbeddingCache(EMBEDDING_CACHE_FILE))
     data = load_json(DATA_FILE)
     index = load_faiss_index(INDEX_FILE)
 
@@ -0,0 +1,29 @@
+import json
+
+
+def load_question_set(file_path):
+    """
+    Carga un archivo de preguntas de prueba y lo aplana a una lista de
+    {"question", "expected", "category"}. Acepta tanto el formato plano de
+    `test_questions.json` como el agrupado por categorías de
+    `test_questions_categories.json`.
+    """
+    with open(file_path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+
+    questions = []
+    for entry in data:
+        if "questions" in entry:
+            for item in entry["questions"]:
+                questions.append({
+                    "question": item["question"],
+                    "expected": item.get("expected", ""),
+                    "category": entry.get("category", "general"),
+                })
+        else:
+            questions.append({
+                "question": entry["question"],
+                "expected": entry.get("expected", ""),
+                "category": entry.get("category", "general"),
+            })
+    return questions